@@ -131,7 +131,7 @@ public class GrabSetUp2 : MonoBehaviour
 
         if (distance < DistanceForPhantomPosesMax && _emg.EMG)
         {
-            string timestamp = _emgRawReader.timestamp;
+            string timestamp = _emgRawReader.contextId;
 
             // Don't bother if the timestamp hasn't changed
             if (timestamp == last_timestamp)
@@ -18,6 +18,8 @@ public class EMGRawReader : MonoBehaviour
     private readonly int server_port = 12350;
 
     public string timestamp;
+    // Timestamp and sequence id of the prediction, echoed back in context messages
+    public string contextId;
 
     public int EMG_prediction;
     public float EMG_velocity;
@@ -128,6 +130,8 @@ public class EMGRawReader : MonoBehaviour
                 EMG_prediction = pred_to_pose[pred];
                 EMG_velocity = 1.0f;
                 timestamp = splitData[1];
+                // Older classifiers don't send the sequence id
+                contextId = splitData.Length > 2 ? timestamp + " #" + splitData[2] : timestamp;
 
                 Debug.Log(timestamp + " VrCID: " + EMG_prediction + " (" + pid_to_name[pred] + ")");
 
@@ -19,7 +19,7 @@ import matplotlib.pyplot as plt
 import time
 from scipy import stats
 
-from libemg.utils import get_windows
+from nfc_emg.filtering import StreamingFilter
 
 
 USER_ID = 2
@@ -77,6 +77,7 @@ class OnlineEMGClassifierUnity:
         self.window_increment = window_increment
         self.raw_data = online_data_handler.raw_data
         self.filters = online_data_handler.fi
+        self.streaming_filter = StreamingFilter(self.filters, 4 * window_size)
         self.features = features
         self.port = port
         self.ip = ip
@@ -122,23 +123,25 @@ class OnlineEMGClassifierUnity:
         # TODO: enable deep learning classifiers that don't operate on features
         fe = FeatureExtractor()
         self.raw_data.reset_emg()
+        self.streaming_filter.reset()
+        new_samples = 0
         while True:
-            data = self._get_data_helper()
-            if len(data) >= self.window_size:
+            new_samples += self._get_data_helper()
+            if self.streaming_filter.n_total >= self.window_size and new_samples >= self.window_increment:
+                new_samples = 0
                 # Extract window and predict sample
-                window = get_windows(data, self.window_size, self.window_size)
+                data = self.streaming_filter.get_latest(self.window_size)
+                window = data.T[np.newaxis]
 
                 # Dealing with the case for CNNs when no features are used
                 if self.features:
                     features = fe.extract_features(self.features, window, self.classifier.feature_params)
                     # If extracted features has an error - give error message
                     if (fe.check_features(features) != 0):
-                        self.raw_data.adjust_increment(self.window_size, self.window_increment)
                         continue
                     classifier_input = self._format_data_sample(features)
                 else:
                     classifier_input = window
-                self.raw_data.adjust_increment(self.window_size, self.window_increment)
                 prediction, probability = self.classifier._prediction_helper(self.classifier.classifier.predict_proba(classifier_input))
                 prediction = prediction[0]
                 probability = probability[0]
@@ -162,7 +165,7 @@ class OnlineEMGClassifierUnity:
                     if prediction >= 0:
                         calculated_velocity = " " + str(self.classifier._get_velocity(window, prediction))
 
-                mean_data = np.mean(np.absolute(self.raw_data.get_emg()), axis=0)
+                mean_data = np.mean(np.absolute(data), axis=0)
                 new_min = 10
                 new_max = 1200
                 old_min = np.min(mean_data)
@@ -199,10 +202,5 @@ class OnlineEMGClassifierUnity:
         return arr
 
     def _get_data_helper(self):
-        data = np.array(self.raw_data.get_emg())
-        if self.filters is not None:
-            try:
-                data = self.filters.filter(data)
-            except:
-                pass
-        return data
\ No newline at end of file
+        # Filter only the newly arrived samples, the window is read from the filtered ring buffer
+        return len(self.streaming_filter.update(self.raw_data))
\ No newline at end of file
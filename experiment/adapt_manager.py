@@ -1,19 +1,16 @@
-import socket
-from threading import Lock
 import time
 import logging
-import copy
 import csv
 
 import numpy as np
 from sklearn.metrics import accuracy_score
-from sklearn.semi_supervised import LabelSpreading
 
-from libemg.emg_classifier import OnlineEMGClassifier
-from libemg.feature_extractor import FeatureExtractor
-
-from nfc_emg.models import save_nn
+from nfc_emg.checkpoint import CheckpointWriter
 from nfc_emg import datasets, utils
+from nfc_emg.relabel import IncrementalLabelSpreading
+from nfc_emg.shared_weights import SharedStateDict
+from nfc_emg.tracing import Tracer, TraceStage
+from nfc_emg.bus import EventBus, AdaptationWaiting, MemorySegment, Stop
 
 from config import Config
 from memory import Memory
@@ -21,18 +18,25 @@ from memory import Memory
 
 def run_adaptation_manager(
     config: Config,
-    model_lock: Lock,
-    mem_manager_port: int,
-    oclassi: OnlineEMGClassifier,
+    bus: EventBus,
+    weights: SharedStateDict,
+    trace_path: str | None = None,
 ):
     """
-    The AdaptManager is responsible for doing the live adaptation of the model.
+    The AdaptManager is responsible for doing the live adaptation of the model. It is meant to be run in its own process,
+    so that training does not compete with the classifier for the GIL.
+
+    To do so, it sends `AdaptationWaiting` over `bus`, waits until MemoryManager hands a "Memory" over
+    (`MemorySegment`), then appends it to its own.
+
+    If the Memory is big enough, it does an adaptation pass on the model, and then queues the model to be saved by a
+    background `CheckpointWriter`.
 
-    To do so, it waits until MemoryManager writes a "Memory" to disk, then loads it in.
+    Finally, the new weights are published to `weights`, from which the classifier loads them between predictions.
 
-    If the Memory is big enough, it does an adaptation pass on the model, and then saves the model.
+    Memory loads, training and weight publishing are traced to `trace_path`.
 
-    Finally, the OnlineEMGClassifier and the config are updated with the new model.
+    It stops when it receives a `Stop` or after `config.game_time`, and then sends a `Stop` to every component.
     """
 
     save_dir = config.paths.get_experiment_dir()
@@ -48,29 +52,32 @@ def run_adaptation_manager(
     fs.setLevel(logging.INFO)
     logger.addHandler(fs)
 
-    # "adaptation model copy"
-    with model_lock:
-        model_to_adapt = copy.deepcopy(config.model)
+    # "adaptation model copy", this process has its own copy of the config
+    model_to_adapt = config.model
 
     # Create some initial memory data
     LOAD_INITIAL_DATA = False
+    # Bound the LabelSpreading dataset so that adaptation rounds don't slow down over the session
+    LS_MAX_LEN = 5000
 
-    ls_labels = np.ndarray((0,))
-    ls_features = np.ndarray(
-        (0, len(config.features) * np.prod(config.sensor.emg_shape))
+    ls_memory = Memory(max_len=LS_MAX_LEN, policy="balanced")
+    relabeler = IncrementalLabelSpreading(
+        len(config.gesture_ids), n_neighbors=50, alpha=0.2
     )
 
     if LOAD_INITIAL_DATA:
         data_dir = config.paths.get_train()
-        base_odh = datasets.get_offline_datahandler(
+        base_features, base_labels, _ = datasets.get_features(
             data_dir,
             utils.get_cid_from_gid(config.paths.gestures, data_dir, config.gesture_ids),
             utils.get_reps(data_dir),
+            config.sensor,
+            config.features,
+            backend=config.feature_backend,
         )
-
-        base_win, ls_labels = datasets.prepare_data(base_odh, config.sensor)
-        ls_features = FeatureExtractor().extract_features(
-            config.features, base_win, array=True
+        ls_memory.add_memories(
+            base_features,
+            np.eye(len(config.gesture_ids))[base_labels.astype(np.int32)],
         )
 
     memory = Memory()
@@ -80,9 +87,11 @@ def run_adaptation_manager(
     adapt_round = 0
 
     # comm with MemoryManager
-    mem_manager_addr = ("localhost", mem_manager_port)
-    manager_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    manager_sock.sendto("WAITING".encode("utf-8"), mem_manager_addr)
+    bus.send("memory_manager", AdaptationWaiting())
+
+    # Model and memory saves are written in the background, bursts of model saves are coalesced
+    checkpoints = CheckpointWriter()
+    tracer = Tracer(trace_path)
 
     csv_file = open(config.paths.get_results(), "w", newline="")
     csv_results = csv.writer(csv_file)
@@ -92,24 +101,33 @@ def run_adaptation_manager(
 
     while time.perf_counter() - start_time < config.game_time:
         try:
-            udp_pkt = manager_sock.recv(1024).decode()
-            if udp_pkt == "STOP":
-                logger.info("received STOP")
+            msg = bus.recv(
+                "adapt_manager", config.game_time - (time.perf_counter() - start_time)
+            )
+            if msg is None:
+                break
+            elif isinstance(msg, Stop):
+                logger.info(f"received {msg}")
                 break
-            elif udp_pkt != "WROTE":
+            elif not isinstance(msg, MemorySegment):
                 continue
+            logger.info(
+                f"memory {msg.memory_id} handoff in {1000*(time.perf_counter() - msg.t_sent):.2f} ms"
+            )
 
-            # new adaptation written, load it in
+            # new adaptation data handed over
             # append this data to our memory
 
             t1 = time.perf_counter()
-            memory += Memory().from_file(memory_dir, memory_id)
+            memory_id = msg.memory_id
+            memory += msg.memory
+            tracer.record(memory_id, TraceStage.MEMORY_LOADED)
             memory_id += 1
             del_t = time.perf_counter() - t1
 
             # print(f"Loaded memory #{memory_id} in {del_t:.3f} s")
             logger.info(
-                f"loaded memory {memory_id}, size {len(memory)}, load time: {del_t:.2f}s"
+                f"loaded memory {memory_id}, size {len(memory)}, merge time: {1000*del_t:.2f} ms"
             )
 
             if len(memory) < 2 / 0.05:
@@ -119,8 +137,8 @@ def run_adaptation_manager(
                 if config.relabel_method == "LabelSpreading":
                     t_ls = time.perf_counter()
 
-                    new_p = np.nonzero(np.array(memory.experience_outcome) == "P")
-                    new_n = np.nonzero(np.array(memory.experience_outcome) == "N")
+                    new_p = np.nonzero(memory.experience_outcome == "P")
+                    new_n = np.nonzero(memory.experience_outcome == "N")
 
                     logging.info(
                         f"Memory len {len(memory)} (P: {len(new_p[0])}, N: {len(new_n[0])})"
@@ -132,28 +150,36 @@ def run_adaptation_manager(
                         new_labels = np.argmax(memory.experience_targets, axis=1)
                         new_labels[new_n] = -1
 
-                        # Create new dataset with P+N
-                        adap_labels = np.append(ls_labels, new_labels)
-                        adap_features = np.vstack((ls_features, memory.experience_data))
+                        # Sync the graph with the P dataset, only new anchors get their neighbours computed
+                        if len(ls_memory) > 0:
+                            relabeler.set_anchors(
+                                ls_memory.experience_ids,
+                                ls_memory.experience_data,
+                                np.argmax(ls_memory.experience_targets, axis=1),
+                            )
+
+                        # Spread labels to P+N, warm-started from the previous round
+                        transduction = relabeler.fit_predict(
+                            memory.experience_data, new_labels
+                        )
+                        logger.info(f"LabelSpreading round: {relabeler.timings[-1]}")
 
                         # Extend P dataset
-                        ls_len = len(ls_labels)
-                        ls_labels = np.append(ls_labels, new_labels[new_p])
-                        ls_features = np.vstack(
-                            (ls_features, memory.experience_data[new_p])
+                        ls_memory.add_memories(
+                            memory.experience_data[new_p],
+                            memory.experience_targets[new_p],
+                        )
+                        logger.info(
+                            f"LabelSpreading memory: {ls_memory.eviction_stats()}"
                         )
-
-                        # Fit & predict LS
-                        ls = LabelSpreading(kernel="rbf", alpha=0.2, n_neighbors=50)
-                        ls.fit(adap_features, adap_labels)
 
                         # Only retrieve the new adap labels
                         memory.experience_targets = np.eye(len(config.gesture_ids))[
-                            ls.transduction_[ls_len:].astype(np.int32)
+                            transduction
                         ]
 
                         # Save transducted
-                        memory.write(memory_dir, f"ls_{memory_id}")
+                        memory.write(memory_dir, f"ls_{memory_id}", checkpoints)
 
                         del_t_ls = time.perf_counter() - t_ls
                         logger.info(f"LabelSpreading time: {del_t_ls:.2f} s")
@@ -163,7 +189,7 @@ def run_adaptation_manager(
                     memory.experience_targets,
                 )
 
-                correct = memory.experience_outcome.count("P")
+                correct = np.count_nonzero(memory.experience_outcome == "P")
                 pre_acc = correct / len(memory.experience_outcome)
                 logger.info(f"#{adapt_round+1} pre-acc: {pre_acc*100:.2f}%")
 
@@ -172,6 +198,7 @@ def run_adaptation_manager(
                 del_t = time.perf_counter() - t1
 
                 if rets:
+                    tracer.record(memory_id - 1, TraceStage.TRAINED)
                     adapt_round += 1
                     csv_results.writerow(
                         [adapt_round, len(memory), pre_acc] + list(rets.values())
@@ -179,28 +206,45 @@ def run_adaptation_manager(
                     csv_file.flush()
                     logger.info(f"#{adapt_round} adap time {del_t:.2f} s")
 
-                    new_model = copy.deepcopy(model_to_adapt)
-
-                    # after training, update the model
-                    with model_lock:
-                        oclassi.classifier.classifier = new_model
-                        config.model = new_model
+                    # after training, publish the weights for the classifier
+                    t1 = time.perf_counter()
+                    version = weights.publish(model_to_adapt.state_dict())
+                    tracer.record(version, TraceStage.WEIGHTS_PUBLISHED)
+                    del_t = time.perf_counter() - t1
+                    logger.info(
+                        f"#{adapt_round} published weights v{version} in {1000*del_t:.2f} ms"
+                    )
 
-                    save_nn(
+                    t1 = time.perf_counter()
+                    checkpoints.save_nn(
                         model_to_adapt,
                         model_path + f"model_{adapt_round}.pth",
                     )
+                    del_t = time.perf_counter() - t1
+                    logger.info(
+                        f"#{adapt_round} model snapshot in {1000*del_t:.2f} ms"
+                    )
                     memory = Memory()
                 else:
                     logger.warning("AM: no adaptation")
 
+            # let adaptation data accumulate, unless the game stops meanwhile
+            msg = bus.recv("adapt_manager", 5)
+            if isinstance(msg, Stop):
+                logger.info(f"received {msg}")
+                break
+
             # tell MemoryManager we are ready for more adaptation data
-            manager_sock.sendto("WAITING".encode(), mem_manager_addr)
+            bus.send("memory_manager", AdaptationWaiting())
             logger.info("waiting for data")
-            time.sleep(5)
         except Exception as e:
             logger.error(f"AM: {e}")
             break
-    manager_sock.sendto("STOP".encode(), mem_manager_addr)
-    memory.write(memory_dir, 1000)
+    bus.stop("AdaptManager is done")
+    memory.write(memory_dir, 1000, checkpoints)
+    checkpoints.close()
+    tracer.close()
+    logger.info(
+        f"checkpoints: {checkpoints.n_written} written, {checkpoints.n_coalesced} coalesced"
+    )
     logger.info("finished")
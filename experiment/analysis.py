@@ -14,9 +14,10 @@ from libemg.feature_extractor import FeatureExtractor
 from nfc_emg.schemas import OBJECT_TO_CONTEXT
 from nfc_emg.sensors import EmgSensorType
 from nfc_emg import utils
+from nfc_emg import predlog
 
 from experiment.config import Config, ExperimentStage
-from experiment.memory import Memory
+from experiment.memory import MemoryStore, MEMORY_STORE
 
 
 class SubjectResults:
@@ -30,6 +31,11 @@ class SubjectResults:
     ):
         log.info(f"Loading {subject=}, {adaptation=}, {stage=}, {sensor=}, {features=}")
 
+        self._memory_stores = {}
+        """
+        Memory stores already opened, keyed by path
+        """
+
         self.create_config(subject, sensor, features, stage, adaptation)
         self.set_stage(stage)
 
@@ -83,18 +89,28 @@ class SubjectResults:
                 d["CONF_MAT"] = np.array(d["CONF_MAT"])
             return d
 
-    def find_memory_ids(self):
+    def memory_store(self):
+        """Open the subject's segmented memory store. The first time, the memory log and pickled memories are migrated to it.
+
+        Returns:
+            MemoryStore: memory store.
+        """
         mem_dir = self.config.paths.get_memory()
-        files = os.listdir(mem_dir)
-        memories = list(
-            filter(
-                lambda x: x.startswith("classifier_memory") and "_ls_" not in x, files
-            )
-        )
-        return sorted([int(mem.split("_")[-1].split(".")[0]) for mem in memories])
+        path = mem_dir + MEMORY_STORE
+        if path not in self._memory_stores:
+            migrate = not os.path.exists(path)
+            store = MemoryStore(path)
+            if migrate:
+                imported = store.migrate(mem_dir)
+                log.info(f"Migrated memories {imported} to {path}")
+            self._memory_stores[path] = store
+        return self._memory_stores[path]
+
+    def find_memory_ids(self):
+        return self.memory_store().ids()
 
     def load_memory(self, mem_id: int):
-        """Load a memory file from the subject's memory directory.
+        """Load a memory from the subject's memory store. The memory is memory-mapped.
 
         Args:
             mem_id (int): Memory ID. For the latest one, use -1
@@ -103,7 +119,7 @@ class SubjectResults:
             mems = self.find_memory_ids()
             mem_id = max(mems)
 
-        return Memory().from_file(self.config.paths.get_memory(), mem_id)
+        return self.memory_store().load(mem_id)
 
     def load_concat_memories(self, ignore_0: bool = True):
         """Load and concatenate all memories. Ignores the memory ID 1000.
@@ -117,29 +133,34 @@ class SubjectResults:
         if ignore_0:
             mems.remove(0)
 
-        memory = Memory()
-        for mem in mems:
-            memory += self.load_memory(mem)
+        memory = self.memory_store().load_concat(mems)
 
         memory.experience_outcome = np.array(memory.experience_outcome)
         memory.experience_timestamps = np.array(memory.experience_timestamps)
         return memory
 
     def load_predictions(self):
-        """Load predictions from the subject's predictions file.
+        """Load predictions from the subject's binary prediction log.
+
+        Legacy `live_preds.csv` files are converted to a prediction log the first time they are loaded.
 
         Returns:
             tuple: timestamps, predictions, windows
         """
-        arr = np.loadtxt(self.config.paths.get_live() + "preds.csv", delimiter=",")
-        log.info(f"Predictions file has shape {arr.shape}")
-        timestamps = arr[:, 0]
-        preds = arr[:, 1]
-        data = arr[:, 2:].reshape(
-            len(arr),
-            np.prod(self.config.sensor.emg_shape),
-            -1,
-        )
+        log_path = self.config.paths.get_live() + "preds.bin"
+        csv_path = self.config.paths.get_live() + "preds.csv"
+        if not os.path.exists(log_path) and os.path.exists(csv_path):
+            log.info(f"Converting {csv_path} to {log_path}")
+            predlog.convert_csv(
+                csv_path, log_path, np.prod(self.config.sensor.emg_shape)
+            )
+
+        pred_log = predlog.PredictionLog(log_path)
+        log.info(f"Predictions log has {len(pred_log)} records")
+        # Timestamps and predictions are small and get modified by callers, windows stay memory-mapped
+        timestamps = np.array(pred_log.timestamps)
+        preds = np.array(pred_log.predictions)
+        data = pred_log.windows
 
         features = FeatureExtractor().extract_features(
             self.config.features, data, array=True
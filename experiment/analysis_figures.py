@@ -5,7 +5,6 @@ import matplotlib.colors as mcolors
 import logging as log
 import seaborn as sns
 
-from memory import Memory
 from nfc_emg.sensors import EmgSensorType
 from nfc_emg import utils
 
@@ -41,7 +40,7 @@ def get_avg_prediction_dt():
             )
             ts, _, _ = sr.load_predictions()
 
-            len0 = len(sr.load_memory(0).experience_outcome)
+            len0 = sr.memory_store().segments[0]["len"]
             mem = sr.load_memory(1000).experience_timestamps[len0:]
 
             dt[(subject, adaptation)] = (
@@ -80,18 +79,14 @@ def fix_memory_ts():
                 sensor,
                 features,
             )
-            mems = sr.find_memory_ids()
+            store = sr.memory_store()
+            mems = store.ids()
             mems.remove(0)
             mems.remove(1000)
 
             for i in range(len(mems) - 1):
-                mem_valid = sr.load_memory(mems[i])
-                mem_under_test = sr.load_memory(mems[i + 1])
-
-                dt = (
-                    mem_under_test.experience_timestamps[-1]
-                    - mem_valid.experience_timestamps[0]
-                )
+                # Timestamp ranges come from the store's manifest, no memory is loaded
+                dt = store.time_range(mems[i + 1])[1] - store.time_range(mems[i])[0]
 
                 if dt < 0:
                     print(
@@ -173,17 +168,19 @@ def pointplot_full(sensor=EmgSensorType.BioArmband, features="TDPSD"):
 
         for sr in srs:
             participants.append(sr.config.subject_id)
-            memory = Memory()
-            for mem in sr.find_memory_ids():
-                if mem == 0 or mem == 1000:
-                    continue
-                memory += sr.load_memory(mem)
+            memory = sr.memory_store().load_concat(
+                [m for m in sr.find_memory_ids() if m != 0 and m != 1000]
+            )
             outcomes = memory.experience_outcome
             try:
                 if not adap:
-                    within_acc_noadap.append(100 * outcomes.count("P") / len(outcomes))
+                    within_acc_noadap.append(
+                        100 * np.count_nonzero(outcomes == "P") / len(outcomes)
+                    )
                 else:
-                    within_acc_adap.append(100 * outcomes.count("P") / len(outcomes))
+                    within_acc_adap.append(
+                        100 * np.count_nonzero(outcomes == "P") / len(outcomes)
+                    )
             except:  # noqa: E722
                 print(f"Error in P{sr.config.subject_id}")
                 if not adap:
@@ -35,6 +35,7 @@ class Config:
         relabel_method="none",
         gesture_ids=(1, 2, 3, 4, 5, 8, 26, 30),
         finetune=False,
+        feature_backend="libemg",
     ):
         """Create the config experiment.
 
@@ -49,6 +50,7 @@ class Config:
             negative_method (str, optional): Method to handle negative labels. Can be "mixed" or "none". Defaults to "mixed".
             relabel_method (str, optional): Relabelling method. Can be "LabelSpreading" or "none". Defaults to "none".
             gesture_ids (Iterable, optional): List of gesture IDs. Defaults to (1, 2, 3, 4, 5, 8, 26, 30).
+            feature_backend (str, optional): Feature implementation, can be "libemg" or "numpy". Defaults to "libemg".
         """
         self.subject_id = subject_id
         self.sensor = EmgSensor(
@@ -68,6 +70,7 @@ class Config:
 
         self.adaptation = adaptation
         self.features = features  # Can be list of features OR feature group
+        self.feature_backend = feature_backend
 
         if self.relabel_method == "LabelSpreading":
             os.environ["OMP_NUM_THREADS"] = "1"
@@ -1,13 +1,20 @@
-from threading import Lock, Thread
+from threading import Event, Thread
+import multiprocessing
 import os
 
 import socket
 import time
+import numpy as np
 
 from libemg.emg_classifier import EMGClassifier, OnlineEMGClassifier
 
 from nfc_emg.utils import get_online_data_handler
 from nfc_emg import models
+from nfc_emg.model_slots import ModelSlots
+from nfc_emg.ringbuffer import PredictionRingBuffer, PredictionSink
+from nfc_emg.scheduling import DeadlineScheduler
+from nfc_emg.shared_weights import SharedStateDict
+from nfc_emg.bus import EventBus
 
 from config import Config
 import memory_manager
@@ -16,12 +23,22 @@ import super_classi
 
 
 class Game:
-    def __init__(self, config: Config):
+    def __init__(
+        self,
+        config: Config,
+        save_predictions: bool = True,
+        catch_up: str = "skip",
+        trace: bool = True,
+    ):
+        # Unity-facing UDP ports, the components talk over `self.bus`
         self.classifier_port = 12347
-        self.mem_manager_server_port = 12348
-        self.adap_manager_port = 12349
         self.unity_port = 12350
 
+        # The model is already on CUDA, which cannot be re-initialized in a forked process
+        self.mp_context = multiprocessing.get_context("spawn")
+        self.bus = EventBus(["memory_manager", "adapt_manager"], self.mp_context)
+        self.classifier_stop = Event()
+
         self.config = config
         self.paths = config.paths
         self.sensor = config.sensor
@@ -48,7 +65,34 @@ class Game:
             self.features,
             port=self.classifier_port,
         )
-        self.model_lock = Lock()
+        # The classifier predicts with the active model while adapted weights are loaded into the standby one.
+        # Predictions go through the folded inference graph of each slot, re-exported when weights are swapped in.
+        self.slots = ModelSlots(config.model, export=models.fold_model)
+
+        # Wakes the classifier when a window is expected, and tracks its deadline misses
+        self.sched = DeadlineScheduler(
+            self.sensor.window_size,
+            self.sensor.window_increment,
+            self.sensor.fs,
+            catch_up=catch_up,
+        )
+
+        # Adapted weights are published here by the adaptation process
+        self.weights = SharedStateDict(config.model.state_dict())
+
+        # Last second of predictions, shared by the classifier and the memory manager
+        self.preds = PredictionRingBuffer(
+            self.sensor.fs // self.sensor.window_increment,
+            (np.prod(self.sensor.emg_shape), self.sensor.window_size),
+        )
+        self.save_predictions = save_predictions
+        """
+        Persist the predictions to the `live_preds.bin` prediction log from a background thread
+        """
+        self.trace = trace
+        """
+        Trace the stages of every prediction to `live_trace_*.bin` files, see `nfc_emg.tracing`
+        """
 
         # Delete old data if applicable
         for f in os.listdir(self.paths.get_experiment_dir()):
@@ -56,6 +100,11 @@ class Game:
                 continue
             os.remove(f"{self.paths.get_experiment_dir()}{f}")
 
+    def get_trace_path(self, component: str):
+        if not self.trace:
+            return None
+        return self.paths.get_live() + f"trace_{component}.bin"
+
     def run(self):
         print("Waiting for Unity to send 'READY'...")
 
@@ -77,32 +126,64 @@ class Game:
 
         print("Starting the Python Game Stage!")
 
-        Thread(
+        sink = None
+        if self.save_predictions:
+            sink = PredictionSink(self.preds, self.paths.get_live() + "preds.bin")
+            sink.start()
+
+        classifier_thread = Thread(
             target=super_classi.run_classifier,
             args=(
                 self.oclassi,
-                self.paths.get_live() + "preds.csv",
-                self.model_lock,
+                self.preds,
+                self.slots,
+                self.sched,
+                self.weights,
             ),
-            daemon=True,
-        ).start()
+            kwargs={
+                "trace_path": self.get_trace_path("classifier"),
+                "stop": self.classifier_stop,
+                "feature_backend": self.config.feature_backend,
+            },
+        )
+        classifier_thread.start()
 
-        Thread(
+        mem_manager_thread = Thread(
             target=memory_manager.run_memory_manager,
             args=(
                 self.config,
                 self.unity_port,
-                self.mem_manager_server_port,
+                self.bus,
+                self.preds,
+                self.get_trace_path("memory_manager"),
             ),
-            daemon=True,
-        ).start()
-
-        adapt_manager.run_adaptation_manager(
-            self.config,
-            self.model_lock,
-            self.mem_manager_server_port,
-            self.oclassi,
         )
+        mem_manager_thread.start()
 
-        # because we are running daemon processes they die as main process dies
-        models.save_nn(self.config.model, self.paths.get_model())
+        adapt_process = self.mp_context.Process(
+            target=adapt_manager.run_adaptation_manager,
+            args=(
+                self.config,
+                self.bus,
+                self.weights,
+                self.get_trace_path("adapt_manager"),
+            ),
+        )
+        adapt_process.start()
+
+        # The AdaptationManager stops every component when it's done, or is stopped with them when Unity quits
+        adapt_process.join()
+        mem_manager_thread.join()
+        self.bus.close()
+        self.classifier_stop.set()
+        classifier_thread.join()
+
+        self.weights.load_into(self.slots.prepare())
+        self.slots.swap()
+        models.save_nn(self.slots.active, self.paths.get_model())
+
+        print(f"SuperClassifier timings: {self.sched.summary()}")
+        if sink is not None:
+            sink.stop()
+        self.preds.unlink()
+        self.weights.unlink()
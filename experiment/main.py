@@ -53,6 +53,7 @@ def main(
             config.paths.get_model(),
             config.reps,
             config.rep_time,
+            config.feature_backend,
         )
     elif config.stage == ExperimentStage.SG_PRE_TEST:
         results = models.main_test_nn(
@@ -63,6 +64,7 @@ def main(
             config.gesture_ids,
             config.paths.gestures,
             config.paths.get_test(),
+            config.feature_backend,
         )
         results_file = config.paths.get_results()
         utils.save_eval_results(results, results_file)
@@ -81,6 +83,7 @@ def main(
             config.gesture_ids,
             config.paths.gestures,
             config.paths.get_test(),
+            config.feature_backend,
         )
         results_file = config.paths.get_results()
         utils.save_eval_results(results, results_file)
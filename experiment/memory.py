@@ -1,76 +1,231 @@
+import os
+import re
+import json
+import time
+import queue
+import shutil
 import pickle
+import threading
+import logging as log
 import numpy as np
 import torch
 import random
 
+MEMORY_LOG = "memory_log.pkl"
+"""
+File name of the log of the memories handed over during the game, in the memory directory
+"""
+
+MEMORY_STORE = "store/"
+"""
+Directory of the segmented memory store, in the memory directory
+"""
+
 
 class Memory:
-    def __init__(self, max_len=None):
-        self.experience_targets = None
+    POLICIES = ["fifo", "reservoir", "balanced"]
+    """
+    Eviction policies of a bounded Memory:
+        - fifo: drop the oldest memories
+        - reservoir: keep a uniform random sample of every memory seen so far
+        - balanced: keep a uniform random sample per class (argmax of the target), with an equal share of `max_len` per class
+    """
+
+    def __init__(self, max_len=None, policy="fifo"):
+        """
+        Adaptation memory. Each field is stored in a preallocated column which doubles in capacity when full,
+        so appending is amortized O(1). The `experience_*` attributes are views of the stored rows.
+
+        Params:
+            - max_len: maximum number of memories kept, None for unbounded
+            - policy: eviction policy once `max_len` is reached, see `Memory.POLICIES`
+        """
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown eviction policy {policy}.")
+
+        self.max_len = max_len
+        self.policy = policy
+
+        self.memories_stored = 0
+        """
+        Number of adaptation samples stored
+        """
+
+        self.capacity = 0
+        """
+        Number of rows that can be stored before the columns are grown
+        """
+
+        self._columns = {}
+        """
+        Preallocated column arrays, keyed by field name. Only the first `memories_stored` rows are valid.
+        """
+
+        self.n_seen = 0
+        """
+        Number of memories ever added, including the evicted and rejected ones
+        """
+
+        self.n_evicted = 0
+        """
+        Number of stored memories which were evicted to make room for new ones
+        """
+
+        self.n_rejected = 0
+        """
+        Number of added memories which were never stored (reservoir and balanced policies)
+        """
+
+        self.evicted_per_class = np.zeros(0, dtype=np.int64)
+        """
+        Number of evicted memories per class (argmax of the target)
+        """
+
+        self._seen_per_class = np.zeros(0, dtype=np.int64)
+
+    # Fields in their pickled order, with the dtype of their column. None means the dtype of the first added data.
+    _FIELDS = {
+        "experience_targets": None,
+        "experience_data": None,
+        "experience_context": np.int64,
+        "experience_outcome": "<U1",
+        "experience_ids": np.int64,
+        "experience_timestamps": np.float64,
+    }
+
+    def _get(self, field):
+        if field not in self._columns:
+            return np.zeros((0,), dtype=self._FIELDS[field] or np.float64)
+        return self._columns[field][: self.memories_stored]
+
+    def _set(self, field, value):
+        value = np.asarray(value)
+        if len(value) != self.memories_stored:
+            raise ValueError(
+                f"{field} has {len(value)} rows, expected {self.memories_stored}."
+            )
+        if len(value) == 0:
+            return
+        col = self._columns.get(field)
+        dtype = self._FIELDS[field] or value.dtype
+        if col is None or col.shape[1:] != value.shape[1:] or col.dtype != dtype:
+            self.capacity = max(self.capacity, self.memories_stored)
+            self._columns[field] = np.zeros(
+                (self.capacity, *value.shape[1:]), dtype=dtype
+            )
+        self._columns[field][: self.memories_stored] = value
+
+    @property
+    def experience_targets(self):
         """
         Current targets for the model
         """
+        return self._get("experience_targets")
 
-        self.experience_data = None
+    @experience_targets.setter
+    def experience_targets(self, value):
+        self._set("experience_targets", value)
+
+    @property
+    def experience_data(self):
         """
         Inputs for the saved experience
         """
+        return self._get("experience_data")
+
+    @experience_data.setter
+    def experience_data(self, value):
+        self._set("experience_data", value)
 
-        self.experience_context = None
+    @property
+    def experience_context(self):
         """
         Correct options (given the context)
         """
+        return self._get("experience_context")
 
-        self.experience_outcome = None
+    @experience_context.setter
+    def experience_context(self, value):
+        self._set("experience_context", value)
+
+    @property
+    def experience_outcome(self):
         """
         Classifier vs context Outcome (P or N)
         """
+        return self._get("experience_outcome")
+
+    @experience_outcome.setter
+    def experience_outcome(self, value):
+        self._set("experience_outcome", value)
 
-        self.experience_ids = []
+    @property
+    def experience_ids(self):
         """
         ID of each experiment
         """
+        return self._get("experience_ids")
 
-        self.experience_timestamps = []
+    @experience_ids.setter
+    def experience_ids(self, value):
+        self._set("experience_ids", value)
+
+    @property
+    def experience_timestamps(self):
         """
-        List of time.time() timestamps
+        time.time() timestamps
         """
+        return self._get("experience_timestamps")
 
-        self.memories_stored = 0
+    @experience_timestamps.setter
+    def experience_timestamps(self, value):
+        self._set("experience_timestamps", value)
+
+    def _reserve(self, n_rows):
         """
-        Number of adaptation samples stored
+        Grow every column by doubling its capacity until `n_rows` fit.
         """
+        if n_rows <= self.capacity:
+            return
+        capacity = max(self.capacity, 16)
+        while capacity < n_rows:
+            capacity *= 2
+        for field, col in self._columns.items():
+            new_col = np.zeros((capacity, *col.shape[1:]), dtype=col.dtype)
+            new_col[: self.memories_stored] = col[: self.memories_stored]
+            self._columns[field] = new_col
+        self.capacity = capacity
 
     def __len__(self):
         return self.memories_stored
 
     def __add__(self, other_memory):
         if len(other_memory):
-            if not len(self):
+            if not len(self) and self.max_len is None:
                 return other_memory
             else:
-                self.experience_targets = np.vstack(
-                    (self.experience_targets, other_memory.experience_targets)
-                )
-                self.experience_data = np.vstack(
-                    (self.experience_data, other_memory.experience_data)
+                self.add_memories(
+                    other_memory.experience_data,
+                    other_memory.experience_targets,
+                    other_memory.experience_context,
+                    other_memory.experience_outcome,
+                    other_memory.experience_timestamps,
                 )
-                self.experience_context = np.concatenate(
-                    (self.experience_context, other_memory.experience_context)
-                )
-                self.experience_ids.extend(
-                    list(
-                        range(
-                            self.memories_stored,
-                            self.memories_stored + other_memory.memories_stored,
-                        )
-                    )
-                )
-                self.experience_outcome.extend(other_memory.experience_outcome)
-                self.experience_timestamps.extend(other_memory.experience_timestamps)
-                self.memories_stored += other_memory.memories_stored
         return self
 
+    def __getitem__(self, indices):
+        """
+        Select memories by index, slice or boolean mask. Returns a new Memory, also for a single integer index.
+        """
+        indices = np.atleast_1d(np.arange(len(self))[indices])
+        mem = Memory()
+        mem.memories_stored = len(indices)
+        mem.capacity = len(indices)
+        mem.n_seen = mem.memories_stored
+        for field, col in self._columns.items():
+            mem._columns[field] = col[: self.memories_stored][indices]
+        return mem
+
     def add_memories(
         self,
         experience_data,
@@ -79,96 +234,472 @@ class Memory:
         experience_outcome=[],
         experience_timestamps=[],
     ):
-        if len(experience_targets):
-            if not len(self):
-                self.experience_targets = experience_targets
-                self.experience_data = experience_data
-                self.experience_context = experience_context
-                self.experience_ids = list(range(len(experience_targets)))
-                self.experience_outcome = experience_outcome
-                self.experience_timestamps = experience_timestamps
-                self.memories_stored += len(experience_targets)
-            else:
-                self.experience_targets = np.vstack(
-                    (self.experience_targets, experience_targets)
-                )
-                self.experience_data = np.vstack(
-                    (self.experience_data, experience_data)
-                )
-                self.experience_context = np.vstack(
-                    (self.experience_context, experience_context)
-                )
-                self.experience_ids.extend(
-                    list(
-                        range(
-                            self.memories_stored,
-                            self.memories_stored + len(experience_targets),
-                        )
-                    )
-                )
-                self.experience_outcome.extend(experience_outcome)
-                self.experience_timestamps.extend(experience_timestamps)
-                self.memories_stored += len(experience_targets)
+        n_new = len(experience_targets)
+        if not n_new:
+            return self
+
+        new = {
+            "experience_targets": np.asarray(experience_targets),
+            "experience_data": np.asarray(experience_data),
+            "experience_context": np.asarray(experience_context),
+            "experience_outcome": np.asarray(experience_outcome),
+            "experience_ids": np.arange(self.n_seen, self.n_seen + n_new),
+            "experience_timestamps": np.asarray(experience_timestamps),
+        }
+        # SGT does not have context, outcome and timestamps
+        new = {k: v for k, v in new.items() if len(v)}
+
+        if self.max_len is not None:
+            return self._add_bounded(new, n_new)
+
+        self._append(new, slice(None))
+        self.n_seen += n_new
+        return self
+
+    def _add_bounded(self, new: dict, n_new: int):
+        """
+        Add memories while keeping at most `max_len` of them, according to `policy`.
+        """
+        labels = np.argmax(new["experience_targets"], axis=1)
+        n_classes = new["experience_targets"].shape[1]
+        if len(self._seen_per_class) < n_classes:
+            self._seen_per_class = np.pad(
+                self._seen_per_class, (0, n_classes - len(self._seen_per_class))
+            )
+            self.evicted_per_class = np.pad(
+                self.evicted_per_class, (0, n_classes - len(self.evicted_per_class))
+            )
+        if self.policy == "fifo":
+            np.add.at(self._seen_per_class, labels, 1)
+            self._append(new, slice(None))
+            self.n_seen += n_new
+            n_drop = self.memories_stored - self.max_len
+            if n_drop > 0:
+                dropped = np.argmax(self.experience_targets[:n_drop], axis=1)
+                np.add.at(self.evicted_per_class, dropped, 1)
+                self.n_evicted += n_drop
+                self._permute(np.arange(n_drop, self.memories_stored))
+                self.memories_stored -= n_drop
+            return self
+
+        stored_labels = np.zeros(0, dtype=np.int64)
+        if len(self):
+            stored_labels = np.argmax(self.experience_targets, axis=1)
+        for i in range(n_new):
+            # Count each memory as it arrives, so that the reservoir test only sees the memories before it
+            self.n_seen += 1
+            self._seen_per_class[labels[i]] += 1
+            if self.memories_stored < self.max_len:
+                self._append(new, slice(i, i + 1))
+                stored_labels = np.append(stored_labels, labels[i])
+                continue
+
+            slot = self._choose_slot(stored_labels, labels[i], n_classes)
+            if slot is None:
+                self.n_rejected += 1
+                continue
+            self.n_evicted += 1
+            self.evicted_per_class[stored_labels[slot]] += 1
+            for field, value in new.items():
+                self._columns[field][slot] = value[i]
+            stored_labels[slot] = labels[i]
         return self
 
+    def _choose_slot(self, stored_labels: np.ndarray, label: int, n_classes: int):
+        """
+        Choose which stored memory a new memory of class `label` replaces. Returns None if it is rejected.
+        """
+        if self.policy == "reservoir":
+            j = random.randrange(self.n_seen)
+            return j if j < self.max_len else None
+
+        counts = np.bincount(stored_labels, minlength=n_classes)
+        if counts[label] < self.max_len / n_classes:
+            # Under-represented class, evict from the largest one
+            victim = np.argmax(counts)
+        else:
+            # Reservoir sampling within the class
+            if random.randrange(self._seen_per_class[label]) >= counts[label]:
+                return None
+            victim = label
+        return random.choice(np.flatnonzero(stored_labels == victim))
+
+    def _append(self, new: dict, rows: slice):
+        start = self.memories_stored
+        n_new = len(new["experience_targets"][rows])
+        self._reserve(start + n_new)
+        for field, value in new.items():
+            if field not in self._columns:
+                self._columns[field] = np.zeros(
+                    (self.capacity, *value.shape[1:]),
+                    dtype=self._FIELDS[field] or value.dtype,
+                )
+            self._columns[field][start : start + n_new] = value[rows]
+        self.memories_stored += n_new
+
+    def eviction_stats(self):
+        """
+        Returns a dict of eviction statistics
+        """
+        return {
+            "stored": self.memories_stored,
+            "seen": self.n_seen,
+            "evicted": self.n_evicted,
+            "rejected": self.n_rejected,
+            "evicted_per_class": self.evicted_per_class.tolist(),
+        }
+
+    def _permute(self, indices):
+        for field, col in self._columns.items():
+            col[: len(indices)] = col[indices]
+
     def shuffle(self):
         if len(self):
             indices = list(range(len(self)))
             random.shuffle(indices)
-            # shuffle the keys
-            self.experience_targets = self.experience_targets[indices]
-            self.experience_data = self.experience_data[indices]
-            self.experience_ids = [self.experience_ids[i] for i in indices]
-            # SGT does not have these fields
-            if len(self.experience_context):
-                self.experience_context = self.experience_context[indices]
-                self.experience_outcome = [self.experience_outcome[i] for i in indices]
-                self.experience_timestamps = [
-                    self.experience_timestamps[i] for i in indices
-                ]
+            self._permute(indices)
 
     def unshuffle(self):
-        unshuffle_ids = [
-            i[0] for i in sorted(enumerate(self.experience_ids), key=lambda x: x[1])
-        ]
         if len(self):
-            self.experience_targets = self.experience_targets[unshuffle_ids]
-            self.experience_data = self.experience_data[unshuffle_ids]
-            # SGT does not have these fields
-            if len(self.experience_context):
-                self.experience_context = self.experience_context[unshuffle_ids]
-                self.experience_outcome = [
-                    self.experience_outcome[i] for i in unshuffle_ids
-                ]
-                self.experience_ids = [self.experience_ids[i] for i in unshuffle_ids]
-                self.experience_timestamps = [
-                    self.experience_timestamps[i] for i in unshuffle_ids
-                ]
-
-    def write(self, save_dir, num_written=""):
-        with open(save_dir + f"classifier_memory_{num_written}.pkl", "wb") as handle:
+            self._permute(np.argsort(self.experience_ids, kind="stable"))
+
+    def __getstate__(self):
+        # Pickle with the original list-based layout so that memories stay readable by older code
+        state = {
+            "experience_targets": None,
+            "experience_data": None,
+            "experience_context": None,
+            "experience_outcome": None,
+            "experience_ids": [],
+            "experience_timestamps": [],
+            "memories_stored": self.memories_stored,
+            "max_len": self.max_len,
+            "policy": self.policy,
+            "n_seen": self.n_seen,
+            "n_evicted": self.n_evicted,
+            "n_rejected": self.n_rejected,
+            "seen_per_class": self._seen_per_class.copy(),
+            "evicted_per_class": self.evicted_per_class.copy(),
+        }
+        if not len(self):
+            return state
+        for field in self._FIELDS:
+            value = self._get(field)
+            if field in ["experience_targets", "experience_data", "experience_context"]:
+                state[field] = value.copy()
+            else:
+                state[field] = value.tolist()
+        return state
+
+    def __setstate__(self, state):
+        self.__init__(state.get("max_len"), state.get("policy", "fifo"))
+        self.memories_stored = state["memories_stored"]
+        self.capacity = self.memories_stored
+        # Memories pickled before the counters were stored only know their length
+        self.n_seen = state.get("n_seen", self.memories_stored)
+        self.n_evicted = state.get("n_evicted", 0)
+        self.n_rejected = state.get("n_rejected", 0)
+        self._seen_per_class = np.asarray(
+            state.get("seen_per_class", self._seen_per_class), dtype=np.int64
+        )
+        self.evicted_per_class = np.asarray(
+            state.get("evicted_per_class", self.evicted_per_class), dtype=np.int64
+        )
+        for field in self._FIELDS:
+            value = state.get(field)
+            if value is not None and len(value):
+                self._set(field, value)
+
+    def write(self, save_dir, num_written="", writer=None):
+        """
+        Pickle the memory to `classifier_memory_{num_written}.pkl`.
+
+        If `writer` (a `CheckpointWriter`) is given, a copy of the memory is queued to be written in the background.
+        """
+        path = save_dir + f"classifier_memory_{num_written}.pkl"
+        if writer is not None:
+            writer.submit(path, path, self[:])
+            return
+        with open(path, "wb") as handle:
             pickle.dump(self, handle)
 
     def read(self, save_dir):
         with open(save_dir + "classifier_memory.pkl", "rb") as handle:
-            loaded_content = pickle.load(self, handle)
-            self.experience_targets = loaded_content.experience_targets
-            self.experience_data = loaded_content.experience_data
-            self.experience_context = loaded_content.experience_context
-            self.experience_outcome = loaded_content.experience_outcome
-            self.experience_ids = loaded_content.experience_ids
-            self.memories_stored = loaded_content.memories_stored
-            self.experience_timestamps = loaded_content.experience_timestamps
+            loaded_content = pickle.load(handle)
+        self.memories_stored = loaded_content.memories_stored
+        self.capacity = loaded_content.capacity
+        self._columns = loaded_content._columns
+        self.n_seen = loaded_content.n_seen
         return self
 
     def from_file(self, save_dir, memory_id):
         with open(save_dir + f"classifier_memory_{memory_id}.pkl", "rb") as handle:
             obj = pickle.load(handle)
-        self.experience_targets = obj.experience_targets
-        self.experience_data = obj.experience_data
-        self.experience_context = obj.experience_context
-        self.experience_outcome = obj.experience_outcome
-        self.experience_ids = obj.experience_ids
         self.memories_stored = obj.memories_stored
-        self.experience_timestamps = obj.experience_timestamps
+        self.capacity = obj.capacity
+        self._columns = obj._columns
+        self.n_seen = obj.n_seen
         return self
+
+    def columns(self):
+        """
+        Returns the valid rows of every stored column (field name -> array), without copying them. See `from_columns`.
+        """
+        return {field: self._get(field) for field in self._columns}
+
+    def from_columns(self, columns: dict):
+        """
+        Use `columns` (field name -> array with one row per memory) as the memory's columns, without copying them.
+        """
+        lengths = {len(v) for v in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"Columns have different lengths {lengths}.")
+        self.memories_stored = lengths.pop() if lengths else 0
+        self.capacity = self.memories_stored
+        self.n_seen = self.memories_stored
+        self._columns = {k: columns[k] for k in self._FIELDS if k in columns}
+        return self
+
+
+class MemoryLogWriter:
+    def __init__(self, path: str):
+        """
+        Append memory segments to a single log file from a background thread, so that callers don't pay for the pickling.
+
+        Each segment is pickled as a `(memory_id, Memory)` tuple after the previous one, see `read_memory_log`.
+
+        Params:
+            - path: log file, appended to if it exists
+        """
+        self.path = path
+        self._file = open(path, "ab")
+        self._queue = queue.Queue()
+
+        self.n_written = 0
+        self.write_times = []
+        """
+        Time to write each segment, in s
+        """
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def append(self, memory_id: int, memory: Memory):
+        """
+        Queue `memory` to be appended to the log. It must not be modified afterwards.
+        """
+        self._queue.put((memory_id, memory))
+
+    def close(self):
+        """
+        Write every queued segment, fsync the log and stop the writer thread.
+        """
+        self._queue.put(None)
+        self._thread.join()
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+    def _run(self):
+        while True:
+            segment = self._queue.get()
+            if segment is None:
+                return
+            try:
+                t1 = time.perf_counter()
+                pickle.dump(segment, self._file)
+                self._file.flush()
+                self.write_times.append(time.perf_counter() - t1)
+                self.n_written += 1
+            except Exception as e:
+                log.error(f"Failed to append memory {segment[0]} to {self.path}: {e}")
+
+
+def read_memory_log(path: str):
+    """
+    Read a log written by `MemoryLogWriter`. A partially written trailing segment is ignored.
+
+    Returns a dict of memory id -> Memory
+    """
+    memories = {}
+    with open(path, "rb") as f:
+        while True:
+            try:
+                memory_id, memory = pickle.load(f)
+            except (EOFError, pickle.UnpicklingError):
+                break
+            memories[memory_id] = memory
+    return memories
+
+
+class MemoryStore:
+    VERSION = 1
+
+    def __init__(self, root: str):
+        """
+        Append-only segmented memory store. Each memory is a segment directory holding one NPY file per field, and a
+        JSON manifest lists the segments with their length and timestamp range.
+
+        Segments are loaded lazily as copy-on-write memory maps, and time-range queries only read the segments which
+        overlap the range.
+
+        Params:
+            - root: store directory, created if it does not exist
+        """
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.manifest_path = os.path.join(root, "manifest.json")
+        self.segments = {}
+        """
+        memory id -> manifest entry {"dir", "len", "t_min", "t_max"}. `t_min` and `t_max` are None without timestamps
+        """
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, "r") as f:
+                manifest = json.load(f)
+            if manifest["version"] != self.VERSION:
+                raise ValueError(
+                    f"Unsupported memory store version {manifest['version']} in {root}."
+                )
+            self.segments = {int(k): v for k, v in manifest["segments"].items()}
+
+    def __len__(self):
+        return len(self.segments)
+
+    def __contains__(self, memory_id: int):
+        return memory_id in self.segments
+
+    def ids(self):
+        return sorted(self.segments.keys())
+
+    def append(self, memory_id: int, memory: Memory):
+        """
+        Write `memory` as a new segment. Segments are never overwritten.
+        """
+        if memory_id in self.segments:
+            raise ValueError(f"Memory {memory_id} is already in {self.root}.")
+
+        seg_dir = f"seg_{memory_id}"
+        tmp_dir = os.path.join(self.root, seg_dir + ".tmp")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        for field in memory._columns:
+            np.save(os.path.join(tmp_dir, field + ".npy"), memory._get(field))
+        os.replace(tmp_dir, os.path.join(self.root, seg_dir))
+
+        entry = {"dir": seg_dir, "len": len(memory), "t_min": None, "t_max": None}
+        timestamps = memory.experience_timestamps
+        if len(timestamps):
+            entry["t_min"] = float(np.min(timestamps))
+            entry["t_max"] = float(np.max(timestamps))
+        self.segments[memory_id] = entry
+        self._write_manifest()
+
+    def _write_manifest(self):
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {
+                    "version": self.VERSION,
+                    "segments": {str(k): v for k, v in sorted(self.segments.items())},
+                },
+                f,
+                indent=2,
+            )
+        os.replace(tmp_path, self.manifest_path)
+
+    def time_range(self, memory_id: int):
+        """
+        Returns (t_min, t_max) of the memory's timestamps from the manifest, without loading it
+        """
+        entry = self.segments[memory_id]
+        return entry["t_min"], entry["t_max"]
+
+    def load_columns(self, memory_id: int, fields=None):
+        """
+        Memory-map the columns of a segment.
+
+        Params:
+            - fields: fields to load, every stored field if None
+        """
+        seg_dir = os.path.join(self.root, self.segments[memory_id]["dir"])
+        columns = {}
+        for field in Memory._FIELDS:
+            path = os.path.join(seg_dir, field + ".npy")
+            if (fields is None or field in fields) and os.path.exists(path):
+                columns[field] = np.load(path, mmap_mode="c")
+        return columns
+
+    def load(self, memory_id: int):
+        """
+        Load a memory lazily. Its columns are copy-on-write memory maps, so modifying them does not change the store.
+        """
+        return Memory().from_columns(self.load_columns(memory_id))
+
+    def load_concat(self, memory_ids=None):
+        """
+        Load and concatenate memories in a single copy.
+
+        Params:
+            - memory_ids: memories to concatenate in order, every memory if None
+        """
+        if memory_ids is None:
+            memory_ids = self.ids()
+        return _concat_columns([self.load_columns(i) for i in memory_ids])
+
+    def query(self, t_start: float, t_end: float, memory_ids=None):
+        """
+        Get the memories with `t_start <= timestamp < t_end`. Only the segments overlapping the range are read.
+
+        Params:
+            - memory_ids: memories to search in order, every memory if None
+        """
+        if memory_ids is None:
+            memory_ids = self.ids()
+        segments = []
+        for i in memory_ids:
+            t_min, t_max = self.time_range(i)
+            if t_min is None or t_max < t_start or t_min >= t_end:
+                continue
+            columns = self.load_columns(i)
+            ts = columns["experience_timestamps"]
+            mask = (ts >= t_start) & (ts < t_end)
+            segments.append({k: v[mask] for k, v in columns.items()})
+        return _concat_columns(segments)
+
+    def migrate(self, memory_dir: str):
+        """
+        Import the memory log and the `classifier_memory_{id}.pkl` files of `memory_dir` which are not in the store yet.
+
+        Returns the imported memory ids
+        """
+        memories = {}
+        log_path = os.path.join(memory_dir, MEMORY_LOG)
+        if os.path.exists(log_path):
+            memories.update(read_memory_log(log_path))
+        for f in os.listdir(memory_dir):
+            match = re.fullmatch(r"classifier_memory_(\d+)\.pkl", f)
+            if match is None:
+                continue
+            memory_id = int(match.group(1))
+            if memory_id not in memories and memory_id not in self.segments:
+                memories[memory_id] = Memory().from_file(memory_dir, memory_id)
+
+        imported = []
+        for memory_id, memory in sorted(memories.items()):
+            if memory_id in self.segments:
+                continue
+            self.append(memory_id, memory)
+            imported.append(memory_id)
+        return imported
+
+
+def _concat_columns(segments: list):
+    """
+    Concatenate the non-empty segments' columns into a single Memory, keeping the fields every segment has.
+    """
+    segments = [s for s in segments if len(s) and len(next(iter(s.values())))]
+    if len(segments) == 0:
+        return Memory()
+    fields = [f for f in Memory._FIELDS if all(f in s for s in segments)]
+    return Memory().from_columns(
+        {f: np.concatenate([s[f] for s in segments]) for f in fields}
+    )
@@ -1,84 +1,56 @@
-import socket
-import select
+import asyncio
 import numpy as np
 import time
 import logging
 import os
-from collections import deque
-
-import threading
-from threading import Lock
-
-from libemg.feature_extractor import FeatureExtractor
+import shutil
 
+from nfc_emg.features import extract_batch
 from nfc_emg.schemas import POSE_TO_NAME
-from nfc_emg.utils import reverse_dict, map_cid_to_name
+from nfc_emg.utils import GestureCatalog
+from nfc_emg.ringbuffer import PredictionRingBuffer
+from nfc_emg.tracing import Tracer, TraceStage
+from nfc_emg.bus import EventBus, UdpEndpoint, AdaptationWaiting, MemorySegment, Stop
 
 
 from config import Config
-from memory import Memory
-
-
-def csv_reader(file_path: str, array: np.ndarray, lock: Lock):
-    """
-    This function is meant to be run in a separate thread.
-
-    TODO: could also be a udp reader which generates its own timestamps, but maybe a bit worse
-    for reproducibility afterwards.
-
-    It reads a CSV file and appends the data to a numpy array which is shared with the main thread.
-
-    Said numpy array is lock-protected.
-    """
-    array_len, array_width = array.shape
+from memory import Memory, MemoryLogWriter, MEMORY_LOG
 
-    window_queue = deque(maxlen=array_len)
-    lines_read = 0
-
-    # Wait for CSV file to be created
-    file_dir = "/".join(file_path.split("/")[:-1])
-    file_name = file_path.split("/")[-1]
-    while file_name not in os.listdir(file_dir):
-        time.sleep(0.1)
-
-    print(f"csv_reader: Starting read loop for {file_path}")
-
-    with open(file_path, "r") as c:
-        while True:
-            lines = c.readlines()
-            if len(lines) == 0:
-                continue
-            lines_read += len(lines)
-
-            new_array = np.fromstring("".join(lines).replace("\n", ","), sep=",")
-            # print(
-            #     f"({time.time():.4f}) csv_reader: Read {len(lines)} new lines (total {lines_read}) with shape: {new_array.shape}"
-            # )
-            new_array = new_array.reshape(-1, array_width)
-            window_queue.extend(new_array)
-
-            if len(window_queue) >= array_len:
-                # print("csv_reader: Wrote new values to array")
-                with lock:
-                    array[:] = np.array(window_queue)
+TIMESTAMP_TOLERANCE = 1e-4
+"""
+Tolerance when matching a context packet to a window by timestamp, which the classifier sends with 4 decimals
+"""
 
 
 def run_memory_manager(
     config: Config,
     unity_in_port: int,
-    server_port: int,
+    bus: EventBus,
+    preds: PredictionRingBuffer,
+    trace_path: str | None = None,
 ):
     """
-    The MemoryManager worker is a UDP server responsible for receiving context from Unity and receiving state from the AdaptationManager.
+    The MemoryManager worker receives context from Unity over UDP and messages from the AdaptationManager over `bus`.
 
-    It parses said Unity context, finds the corresponding data window and prediction and re-computes the features.
+    It parses said Unity context, finds the corresponding data window and prediction in `preds` (published by the classifier) and re-computes the features.
 
-    After generating new adaptation data, it is written to disk and a UDP message is sent via "out_port" to tell the AdaptationManager.
+    When the AdaptationManager is waiting (`AdaptationWaiting`), new adaptation data is handed over to it in a `MemorySegment`,
+    and appended to the memory log in the background.
 
-    The message is simply "WROTE"
+    If a "Q" is received from Unity, every component is sent a `Stop`. The worker returns once it receives a `Stop`.
 
-    If a "Q" is received from Unity, the worker will shut down.
+    Context packets and memory writes are traced to `trace_path`.
     """
+    asyncio.run(_run_memory_manager(config, unity_in_port, bus, preds, trace_path))
+
+
+async def _run_memory_manager(
+    config: Config,
+    unity_in_port: int,
+    bus: EventBus,
+    preds: PredictionRingBuffer,
+    trace_path: str | None,
+):
     save_dir = config.paths.get_experiment_dir()
     memory_dir = config.paths.get_memory()
 
@@ -91,187 +63,200 @@ def run_memory_manager(
     fs.setLevel(logging.INFO)
     logger.addHandler(fs)
 
-    manager_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    manager_sock.bind(("localhost", server_port))
-
-    adapt_manager_addr = None
-
     # receive context from unity
-    unity_in_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    unity_in_sock.bind(("localhost", unity_in_port))
+    unity = await UdpEndpoint.bind(("localhost", unity_in_port))
 
     # At this point, clear old memory data and models
     for f in os.listdir(memory_dir):
-        os.remove(memory_dir + f)
+        if os.path.isdir(memory_dir + f):
+            # memory store migrated by the analysis
+            shutil.rmtree(memory_dir + f)
+        else:
+            os.remove(memory_dir + f)
 
     for f in os.listdir(config.paths.get_models()):
         os.remove(config.paths.get_models() + f)
 
-    memory = Memory()
+    tracer = Tracer(trace_path)
+    memory_log = MemoryLogWriter(memory_dir + MEMORY_LOG)
 
     # runtime constants
-    name_to_cid = reverse_dict(map_cid_to_name(config.paths.get_train()))
+    name_to_cid = GestureCatalog.get(data_dir=config.paths.get_train()).name_to_cid
     unity_to_cid_map = {k: name_to_cid[v] for k, v in POSE_TO_NAME.items() if v != -1}
 
-    # Shared between worker and csv reader thread. CSV reader reads data from file and writes it to this array.
-    live_data = np.zeros(
-        (
-            config.sensor.fs // config.sensor.window_increment,
-            np.prod(config.sensor.emg_shape) * config.sensor.window_size + 2,
-        )
-    )
-    live_data_lock = Lock()
-
-    csv_t = threading.Thread(
-        target=csv_reader,
-        args=(
-            config.paths.get_live() + "preds.csv",
-            live_data,
-            live_data_lock,
-        ),
-        daemon=True,
-    )
-    csv_t.start()
-
     start_time = time.perf_counter()
 
     logger.info("MM: starting")
 
-    num_written = 0
-    total_samples_unfound = 0
-    is_adapt_mngr_waiting = False
-    done = False
-    while not done:
-        try:
-            if not csv_t.is_alive():
-                logger.error("MM: CSV reader thread dead")
-                raise Exception("CSV reader thread died")
-
-            ready_to_read, _, _ = select.select([manager_sock, unity_in_sock], [], [])
+    state = {
+        "memory": Memory(),
+        "num_written": 0,
+        "total_samples_unfound": 0,
+        "total_samples_dropped": 0,
+        "is_adapt_mngr_waiting": False,
+    }
+    match_stats = {"seq": 0, "timestamp": 0, "unfound": 0}
+    batch_sizes = []
+    """
+    Number of context packets decoded per wakeup, since the last write
+    """
+    batch_times = []
+    """
+    Decoding time of each batch of context packets in s, since the last write
+    """
 
-            if len(ready_to_read) == 0:
-                time.sleep(0.005)
-                continue
+    def write_memory():
+        memory = state["memory"]
+        if not state["is_adapt_mngr_waiting"] or len(memory) == 0:
+            # don't write empty memory
+            return
 
-            for sock in ready_to_read:
-                sock: socket.socket
-                udp_packet, address = sock.recvfrom(1024)
-                udp_packet = udp_packet.decode()
-                # logger.info(f"MM: received {udp_packet} from {address}")
-                if sock == unity_in_sock:
-                    # Unity sends "Q" when it shuts down / is done
-                    if udp_packet == "Q":
-                        done = True
-                        manager_sock.sendto(b"STOP", adapt_manager_addr)
-                        del_t = time.perf_counter() - start_time
-                        logger.info(f"MM: done flag at {del_t:.2f} s")
-                        continue
-                    # ensure context packet
-                    elif not (udp_packet.startswith("P") or udp_packet.startswith("N")):
-                        continue
-
-                    with live_data_lock:
-                        adap_data = live_data.copy()
-
-                    # Timestamp is only 0 if the array is not full [timestamp, prediction, *data]
-                    if 0 in adap_data[:, 0]:
-                        logger.info("MM: waiting for more CSV data")
-                        continue
-
-                    # logger.info(
-                    #     f"Average time between timestamps: {np.mean(np.diff(adap_timestamps))*1000:.3f} ms"
-                    # )
-
-                    result = decode_unity(
-                        udp_packet,
-                        adap_data,
-                        config.features,
-                        config.sensor.window_size,
-                        len(config.gesture_ids),
-                        unity_to_cid_map,
-                        config.negative_method,
-                    )
-
-                    if result is None:
-                        total_samples_unfound += 1
-                        logger.warning("MM: no matching window found")
-                        continue
-
-                    (
-                        adap_data,
-                        adap_label,
-                        adap_possibilities,
-                        adap_was_pred_good,
-                        timestamp,
-                    ) = result
-
-                    if len(adap_data) != len(adap_label):
-                        logger.error(
-                            "MM: Adaptation data and adaptation label length mismatch"
-                        )
-                        continue
-
-                    memory.add_memories(
-                        adap_data,
-                        adap_label,
-                        adap_possibilities,
-                        adap_was_pred_good,
-                        timestamp,
-                    )
-                    # logger.info(f"MM: memory len {len(memory)}")
-
-                if sock == manager_sock or is_adapt_mngr_waiting:
-                    if adapt_manager_addr is None:
-                        adapt_manager_addr = address
-                        logger.info(
-                            f"MM: Adaptation manager address set to {adapt_manager_addr}"
-                        )
-
-                    if udp_packet == "WAITING":
-                        # Training pass done so update model
-                        is_adapt_mngr_waiting = True
-                    elif udp_packet == "STOP":
-                        logger.info("MM: received STOP from AdaptManager")
-                        return
-
-                    if not is_adapt_mngr_waiting:
-                        continue
-
-                    if len(memory) == 0:
-                        # don't write empty memory
-                        continue
-
-                    t1 = time.perf_counter()
-                    memory.write(memory_dir, num_written)
-                    del_t = time.perf_counter() - t1
-                    num_written += 1
-
-                    logger.info(
-                        f"MM: write #{num_written} with len {len(memory)}, unfound: {total_samples_unfound}, WRITE TIME: {del_t:.2f} s"
-                    )
-                    memory = Memory()
-
-                    manager_sock.sendto(b"WROTE", adapt_manager_addr)
-                    is_adapt_mngr_waiting = False
+        num_written = state["num_written"]
+        t1 = time.perf_counter()
+        bus.send("adapt_manager", MemorySegment(num_written, memory))
+        memory_log.append(num_written, memory)
+        del_t = time.perf_counter() - t1
+        tracer.record(num_written, TraceStage.MEMORY_WRITTEN)
+        state["num_written"] = num_written + 1
+        state["memory"] = Memory()
+        state["is_adapt_mngr_waiting"] = False
+
+        n_contexts = sum(match_stats.values())
+        logger.info(
+            f"MM: handoff #{num_written + 1} with len {len(memory)}, unfound: {state['total_samples_unfound']}, dropped: {state['total_samples_dropped']}, HANDOFF TIME: {1000 * del_t:.2f} ms"
+        )
+        if len(memory_log.write_times) > 0:
+            logger.info(
+                f"MM: {memory_log.n_written} memories logged, last write time: {1000 * memory_log.write_times[-1]:.2f} ms"
+            )
+        logger.info(
+            f"MM: context matching: {match_stats['seq']} by sequence id, {match_stats['timestamp']} by timestamp, "
+            f"{match_stats['unfound']} windows not found ({100 * match_stats['unfound'] / max(n_contexts, 1):.2f}%)"
+        )
+        if len(batch_sizes) > 0:
+            logger.info(
+                f"MM: {len(batch_sizes)} batches, contexts per wakeup avg: {np.mean(batch_sizes):.2f} max: {np.max(batch_sizes)}, "
+                f"batch time avg: {1000 * np.mean(batch_times):.2f} ms max: {1000 * np.max(batch_times):.2f} ms"
+            )
+            batch_sizes.clear()
+            batch_times.clear()
+
+    async def handle_unity():
+        try:
+            await decode_contexts()
         except Exception as e:
             logger.error(f"MM: Error {e}")
-            manager_sock.sendto(b"STOP", adapt_manager_addr)
-            return
+            bus.stop(f"MemoryManager error: {e}")
+
+    async def decode_contexts():
+        while True:
+            # Drain every pending datagram
+            contexts = []
+            for udp_packet, _ in await unity.recv_batch():
+                udp_packet = udp_packet.decode()
+                # logger.info(f"MM: received {udp_packet}")
+                # Unity sends "Q" when it shuts down / is done
+                if udp_packet == "Q":
+                    del_t = time.perf_counter() - start_time
+                    logger.info(f"MM: done flag at {del_t:.2f} s")
+                    bus.stop("Unity is done")
+                    return
+                # ensure context packet
+                elif udp_packet.startswith("P") or udp_packet.startswith("N"):
+                    contexts.append(udp_packet)
+
+            if len(contexts) == 0:
+                continue
+
+            t1 = time.perf_counter()
+            n_unfound = match_stats["unfound"]
+            (
+                adap_data,
+                adap_label,
+                adap_possibilities,
+                adap_was_pred_good,
+                timestamp,
+            ) = decode_unity_batch(
+                contexts,
+                preds,
+                config.features,
+                len(config.gesture_ids),
+                unity_to_cid_map,
+                config.negative_method,
+                tracer,
+                match_stats,
+                config.feature_backend,
+            )
+            batch_sizes.append(len(contexts))
+            batch_times.append(time.perf_counter() - t1)
+
+            n_unfound = match_stats["unfound"] - n_unfound
+            if n_unfound > 0:
+                state["total_samples_unfound"] += n_unfound
+                logger.warning(
+                    f"MM: no matching window found for {n_unfound} contexts"
+                )
+            # Matched, but not used for adaptation or overwritten before being read
+            state["total_samples_dropped"] += len(contexts) - len(adap_data) - n_unfound
+
+            if len(adap_data) != len(adap_label):
+                logger.error("MM: Adaptation data and adaptation label length mismatch")
+            elif len(adap_data) > 0:
+                state["memory"].add_memories(
+                    adap_data,
+                    adap_label,
+                    adap_possibilities,
+                    adap_was_pred_good,
+                    timestamp,
+                )
+                # logger.info(f"MM: memory len {len(memory)}")
+            write_memory()
+
+    async def handle_bus():
+        while True:
+            msg = await bus.arecv("memory_manager")
+            if isinstance(msg, AdaptationWaiting):
+                # Training pass done so update model
+                state["is_adapt_mngr_waiting"] = True
+                write_memory()
+            elif isinstance(msg, Stop):
+                logger.info(f"MM: received {msg}")
+                return
+
+    unity_task = asyncio.create_task(handle_unity())
+    try:
+        # Every Stop goes through the bus, including the one sent when Unity is done
+        await handle_bus()
+    except Exception as e:
+        logger.error(f"MM: Error {e}")
+        bus.stop(f"MemoryManager error: {e}")
+    finally:
+        unity_task.cancel()
+        unity.close()
+        memory_log.close()
+        tracer.close()
+        if len(memory_log.write_times) > 0:
+            logger.info(
+                f"MM: {memory_log.n_written} memories logged, write time avg: {1000 * np.mean(memory_log.write_times):.2f} ms "
+                f"max: {1000 * np.max(memory_log.write_times):.2f} ms"
+            )
 
 
 def decode_unity(
     packet: str,
-    data: np.ndarray,
+    preds: PredictionRingBuffer,
     features: list,
-    window_size: int,
     num_classes: int,
     unity_to_cid_map: dict,
     negative_method: str,
+    tracer: Tracer | None = None,
+    match_stats: dict | None = None,
+    feature_backend: str = "libemg",
 ):
     """
-    Decode a context packet from Unity. Only 1 valid window should be found.
+    Decode a single context packet from Unity, see `decode_unity_batch`.
 
-    Returns None if no valid window is found.
+    Returns None if no valid window is found, if it was overwritten while being read, or if the context is not used for adaptation.
 
     Returns:
         - features: np.ndarray with shape (1, L) where L is the # of features
@@ -280,44 +265,140 @@ def decode_unity(
         - outcome: ["P"] if model prediction was within-context, else ["N"]
         - timestamp: [time.time()] of the window
     """
-    # Extract context...
-    message_parts = packet.split(" ")
-    outcome = message_parts[0]  # "P" for positive, "N" for negative
-    timestamp = float(message_parts[1])  # timestamp sent from classifier
-    possibilities = [
-        unity_to_cid_map[p] for p in message_parts[2:] if p in unity_to_cid_map
-    ]
-    # print(message_parts)
-
-    # Now extract corresponding prediction and data window...
-    pred_index = np.argwhere(data[:, 0] == timestamp)
-    if len(pred_index) == 0:
+    result = decode_unity_batch(
+        [packet],
+        preds,
+        features,
+        num_classes,
+        unity_to_cid_map,
+        negative_method,
+        tracer,
+        match_stats,
+        feature_backend,
+    )
+    if len(result[0]) == 0:
         return None
-    pred = int(data[pred_index, 1])
-    windows = data[pred_index, 2:].reshape(1, -1, window_size)
-    feats = FeatureExtractor().extract_features(features, windows, array=True)
-
-    adaptation_label = np.zeros((1, num_classes))
-    if outcome == "P":
-        if pred not in possibilities:
-            return None
-        # within-context, use the prediction as-is
-        adaptation_label[:, pred] = 1
-    elif outcome == "N":
-        if negative_method == "mixed":
-            adaptation_label[:, possibilities] = 1 / len(possibilities)
-        else:
-            return None
-        # dunno what happens if adaptation label left at zeros
+    return result
 
-    if len(possibilities) < 3:
+
+def decode_unity_batch(
+    packets: list,
+    preds: PredictionRingBuffer,
+    features: list,
+    num_classes: int,
+    unity_to_cid_map: dict,
+    negative_method: str,
+    tracer: Tracer | None = None,
+    match_stats: dict | None = None,
+    feature_backend: str = "libemg",
+):
+    """
+    Decode context packets from Unity, eg "P 123.4567 #42 H1 H2". Only 1 valid window should be found in `preds` per packet.
+
+    The window is found in O(1) from the sequence id ("#42") echoed back by Unity. Older Unity builds don't send it,
+    in which case the window is found from its timestamp, within `TIMESTAMP_TOLERANCE`.
+
+    The matched windows are copied out of `preds` at once, and their features are extracted in a single call with
+    `feature_backend`, see `features.extract_batch`.
+
+    If `tracer` is given, the reception and decoding of the packets are traced with the windows' sequence number.
+
+    If `match_stats` is given, its "seq", "timestamp" or "unfound" count is incremented depending on how each window was matched.
+
+    Packets are dropped if no valid window is found, if it was overwritten while being read, or if the context is not used for adaptation.
+
+    Returns, for the M packets which were kept:
+        - features: np.ndarray with shape (M, L) where L is the # of features
+        - label: np.ndarray with shape (M, n_classes), one-hot encoded label for adaptation
+        - possibilities: np.ndarray with shape (M, 3), eg [0, 3, -1]. Padded to 3 elements with -1
+        - outcome: list of "P" if model prediction was within-context, else "N"
+        - timestamp: list of time.time() of the windows
+    """
+    t_received = time.perf_counter()
+
+    seqs, outcomes, timestamps, possibilities = [], [], [], []
+    for packet in packets:
+        # Extract context...
+        message_parts = packet.split(" ")
+        outcome = message_parts[0]  # "P" for positive, "N" for negative
+        timestamp = float(message_parts[1])  # timestamp sent from classifier
+        seq = None
+        if len(message_parts) > 2 and message_parts[2].startswith("#"):
+            seq = int(message_parts[2][1:])  # sequence id sent from classifier
+        poss = [
+            unity_to_cid_map[p] for p in message_parts[2:] if p in unity_to_cid_map
+        ]
+        # print(message_parts)
+
+        # Now find the corresponding prediction and data window...
+        method = "seq"
+        record = preds.get(seq) if seq is not None else None
+        if record is None or abs(record[0] - timestamp) > TIMESTAMP_TOLERANCE:
+            # Old Unity build, window overwritten, or timestamp and sequence id not from the same prediction
+            seq = None
+        if seq is None:
+            method = "timestamp"
+            seq = preds.find_timestamp(timestamp, TIMESTAMP_TOLERANCE)
+        if seq is None:
+            method = "unfound"
+        if match_stats is not None:
+            match_stats[method] += 1
+        if seq is None:
+            continue
+
+        if outcome == "N" and (negative_method != "mixed" or len(poss) == 0):
+            continue
+
+        seqs.append(seq)
+        outcomes.append(outcome)
+        timestamps.append(timestamp)
         # pad to len 3 with -1
-        possibilities += [-1] * (3 - len(possibilities))
+        possibilities.append(poss + [-1] * (3 - len(poss)))
+
+    if len(seqs) == 0:
+        return (
+            np.zeros((0, 0)),
+            np.zeros((0, num_classes)),
+            np.zeros((0, 3), dtype=np.int64),
+            [],
+            [],
+        )
+
+    # Snapshot the matched records, then drop those which were overwritten meanwhile
+    seqs = np.array(seqs)
+    slots = seqs % preds.capacity
+    windows = preds.windows[slots]
+    pred = preds.predictions[slots].astype(np.int64)
+    valid = preds.seqs[slots] == seqs
+
+    outcomes = np.array(outcomes)
+    possibilities = np.array(possibilities)
+    is_p = outcomes == "P"
+    # within-context predictions are used as-is, out-of-context ones are useless
+    valid &= ~is_p | np.any(possibilities == pred[:, np.newaxis], axis=1)
+
+    seqs, windows, pred = seqs[valid], windows[valid], pred[valid]
+    outcomes, possibilities, is_p = outcomes[valid], possibilities[valid], is_p[valid]
+    timestamps = [t for t, v in zip(timestamps, valid) if v]
+
+    feats = extract_batch(features, windows, backend=feature_backend)
+
+    adaptation_label = np.zeros((len(seqs), num_classes))
+    adaptation_label[np.flatnonzero(is_p), pred[is_p]] = 1
+    # "mixed" negative method, spread the label over the possibilities
+    rows, cols = np.nonzero(~is_p[:, np.newaxis] & (possibilities >= 0))
+    n_poss = np.count_nonzero(possibilities >= 0, axis=1)
+    adaptation_label[rows, possibilities[rows, cols]] = 1 / n_poss[rows]
+
+    if tracer is not None:
+        for seq in seqs:
+            tracer.record(seq, TraceStage.CONTEXT_RECEIVED, t_received)
+            tracer.record(seq, TraceStage.CONTEXT_DECODED)
 
     return (
         feats,
         adaptation_label,
-        np.array([possibilities]),
-        [outcome],
-        [timestamp],
+        possibilities,
+        list(outcomes),
+        timestamps,
     )
@@ -1,15 +1,32 @@
-from threading import Lock
+from threading import Event
 import time
-import csv
 
 import numpy as np
 
 from libemg.emg_classifier import OnlineEMGClassifier
 from libemg.feature_extractor import FeatureExtractor
-from libemg.utils import get_windows
 
-
-def run_classifier(oclassi: OnlineEMGClassifier, save_path: str, lock: Lock):
+from nfc_emg.filtering import StreamingFilter
+from nfc_emg.features import IncrementalFeatureExtractor, extract_batch
+from nfc_emg.model_slots import ModelSlots
+from nfc_emg.ringbuffer import PredictionRingBuffer
+from nfc_emg.scheduling import DeadlineScheduler
+from nfc_emg.shared_weights import SharedStateDict
+from nfc_emg.tracing import Tracer, TraceStage
+
+
+def run_classifier(
+    oclassi: OnlineEMGClassifier,
+    preds: PredictionRingBuffer,
+    slots: ModelSlots,
+    sched: DeadlineScheduler,
+    weights: SharedStateDict | None = None,
+    report_every: float = 30.0,
+    trace_path: str | None = None,
+    stop: Event | None = None,
+    feature_backend: str = "libemg",
+    incremental: bool = True,
+):
     """
     Adapted copy-paste of OnlineEMGClassifier._run_helper.
 
@@ -17,57 +34,72 @@ def run_classifier(oclassi: OnlineEMGClassifier, save_path: str, lock: Lock):
 
     Essentially, it:
 
-    - Waits for enough new EMG data.
-    - Calculates the features.
-    - Does a prediction with the features.
-    - Saves the predictions to a file and sends it to its UDP socket.
+    - Waits for new EMG data with `sched`, filtering new samples once as they arrive.
+    - For every window scheduled by `sched`, calculates the features, incrementally if `incremental` and they are supported by `IncrementalFeatureExtractor`, else with `feature_backend` (see `features.extract_batch`).
+    - Does a prediction with the features, using the active model of `slots`.
+    - Publishes the predictions and windows to `preds` and sends it to its UDP socket.
+    - Between predictions, loads new weights into the standby model of `slots` when `weights` has a new version.
+    - Prints `sched`'s deadline misses and queueing delays every `report_every` seconds.
+    - Traces every stage of each window to `trace_path`, keyed by its sequence number in `preds`.
+
+    Returns once `stop` is set.
     """
     print("SuperClassifier is started!")
+    tracer = Tracer(trace_path)
     fe = FeatureExtractor()
+    # Keep enough samples to process the whole backlog
+    sf = StreamingFilter(
+        oclassi.filters,
+        max(
+            4 * oclassi.window_size,
+            oclassi.window_size + sched.max_backlog * oclassi.window_increment,
+        ),
+    )
+    ife = None
+    if incremental and IncrementalFeatureExtractor.supports(oclassi.features):
+        ife = IncrementalFeatureExtractor(
+            oclassi.features, oclassi.window_size, oclassi.classifier.feature_params
+        )
+    weights_version = weights.version if weights is not None else -1
     oclassi.raw_data.reset_emg()
-    with open(save_path, "w", newline="") as csvfile:
-        writer = csv.writer(csvfile, delimiter=",")
-        while True:
-            if oclassi.raw_data.get_emg() is None:
-                time.sleep(0.005)
-                continue
-            if len(oclassi.raw_data.get_emg()) < oclassi.window_size:
-                time.sleep(0.005)
-                continue
-
+    last_report = time.perf_counter()
+    while stop is None or not stop.is_set():
+        sched.wait()
+        filtered = sf.update(oclassi.raw_data)
+        sched.add_samples(len(filtered))
+        # Sample index of filtered[0]
+        first = sf.n_total - len(filtered)
+
+        for job in sched.jobs():
             time_stamp = f"{time.perf_counter():.4f}"
-            data = oclassi._get_data_helper()
 
             # Extract window and predict sample
             # (n_windows, n_emg_ch, ws)
-            window = get_windows(
-                data[-oclassi.window_size :][:],
-                oclassi.window_size,
-                oclassi.window_size,  # why???
-            )
-
-            # dict: {feature_name: np.array of shape (n_windows, n_features)}
-            features = fe.extract_features(
-                oclassi.features, window, oclassi.classifier.feature_params, array=True
-            )
+            window = sf.get_window(job.end, oclassi.window_size).T[np.newaxis]
+
+            # (n_windows, n_features)
+            if ife is not None:
+                ife.update(filtered[ife.n_total - first : job.end - first])
+                features = ife.extract()
+            else:
+                features = extract_batch(
+                    oclassi.features,
+                    window,
+                    oclassi.classifier.feature_params,
+                    feature_backend,
+                )
 
             # If extracted features has an error - give error message
             if fe.check_features(features) != 0:
-                oclassi.raw_data.adjust_increment(
-                    oclassi.window_size, oclassi.window_increment
-                )
+                sched.done(job, rejected=True)
                 continue
+            t_features = time.perf_counter()
             # classifier_input = oclassi._format_data_sample(features)
             classifier_input = features  # test
 
-            oclassi.raw_data.adjust_increment(
-                oclassi.window_size, oclassi.window_increment
-            )
-
-            with lock:
-                probabilities = oclassi.classifier.classifier.predict_proba(
-                    classifier_input
-                )
+            with slots.use() as model:
+                probabilities = model.predict_proba(classifier_input)
+            t_predicted = time.perf_counter()
 
             prediction, probability = oclassi.classifier._prediction_helper(
                 probabilities
@@ -75,14 +107,8 @@ def run_classifier(oclassi: OnlineEMGClassifier, save_path: str, lock: Lock):
             prediction = prediction[0]
             probability = probability[0]
 
-            # Don't take into account post-processing for csv
-            newline = [time_stamp, prediction] + window.flatten().tolist()
-            writer.writerow(newline)
-            csvfile.flush()
-
-            # print(
-            #     f"({time.time():.4f}) classifier: Wrote 1 new lines (total {preds_count})"
-            # )
+            # Don't take into account post-processing for the MemoryManager
+            seq = preds.publish(float(time_stamp), prediction, window[0])
 
             # Check for rejection
             if oclassi.classifier.rejection:
@@ -98,15 +124,31 @@ def run_classifier(oclassi: OnlineEMGClassifier, save_path: str, lock: Lock):
                     list(oclassi.previous_predictions), return_counts=True
                 )
                 prediction = values[np.argmax(counts)]
-            message = f"{prediction} {time_stamp}"
+            # The sequence id is echoed back by Unity in context packets
+            message = f"{prediction} {time_stamp} {seq}"
 
-            # print(message
-            time.sleep(0.003)
             oclassi.sock.sendto(message.encode(), (oclassi.ip, oclassi.port))
+            sched.done(job)
+
+            tracer.record(seq, TraceStage.WINDOW_READY, job.ready)
+            tracer.record(seq, TraceStage.FEATURES, t_features)
+            tracer.record(seq, TraceStage.PREDICTED, t_predicted)
+            tracer.record(seq, TraceStage.SENT)
 
             if oclassi.std_out:
                 print(message)
 
-            # print(
-            #     f"Classification time: {1000*(time.perf_counter() - float(time_stamp)):.3f} ms"
-            # )
+        # Samples past the last window
+        if ife is not None:
+            ife.update(filtered[ife.n_total - first :])
+
+        if weights is not None and weights.version != weights_version:
+            # Use the idle time to pick up adapted weights
+            weights_version = weights.load_into(slots.prepare())
+            slots.swap()
+            tracer.record(weights_version, TraceStage.WEIGHTS_LOADED)
+
+        if time.perf_counter() - last_report > report_every:
+            last_report = time.perf_counter()
+            print(f"SuperClassifier timings: {sched.summary()}")
+    tracer.close()
@@ -0,0 +1,202 @@
+import time
+import queue
+import weakref
+import asyncio
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class Message:
+    """
+    Base class of the messages exchanged between the Game stage components.
+    """
+
+    def __init__(self):
+        self.t_sent = time.perf_counter()
+        """
+        `time.perf_counter()` at which the message was created, to measure handoff latency
+        """
+
+    def __repr__(self):
+        fields = ", ".join(f"{k}={v!r}" for k, v in vars(self).items() if k != "t_sent")
+        return f"{self.__class__.__name__}({fields})"
+
+
+class Stop(Message):
+    def __init__(self, reason: str = ""):
+        """
+        Shut down the receiving component.
+        """
+        super().__init__()
+        self.reason = reason
+
+
+class AdaptationWaiting(Message):
+    """
+    The AdaptationManager is ready for new adaptation data.
+    """
+
+
+class MemorySegment(Message):
+    def __init__(self, memory_id: int, memory):
+        """
+        The MemoryManager hands memory `memory_id` over to the AdaptationManager. `memory` is owned by the receiver.
+
+        When sent through a process queue, the memory's columns are copied into a shared memory block and only the
+        block's name and layout are pickled. The receiver uses the block as its memory's columns without copying them,
+        and unlinks it right away, so the block is freed once the received memory is garbage collected.
+        """
+        super().__init__()
+        self.memory_id = memory_id
+        self.memory = memory
+
+    def __repr__(self):
+        return f"MemorySegment(memory_id={self.memory_id}, len={len(self.memory)})"
+
+    def __getstate__(self):
+        columns = self.memory.columns()
+
+        # Every column is 8-byte aligned in a single block
+        layout = []
+        offset = 0
+        for field, col in columns.items():
+            layout.append((field, col.dtype.str, col.shape, offset))
+            offset += (col.nbytes + 7) // 8 * 8
+
+        shm = shared_memory.SharedMemory(create=True, size=max(offset, 8))
+        for (field, dtype, shape, offset), col in zip(layout, columns.values()):
+            np.ndarray(shape, dtype, buffer=shm.buf, offset=offset)[...] = col
+        shm.close()
+
+        return {
+            "t_sent": self.t_sent,
+            "memory_id": self.memory_id,
+            "memory_type": type(self.memory),
+            "name": shm.name,
+            "layout": layout,
+        }
+
+    def __setstate__(self, state):
+        self.t_sent = state["t_sent"]
+        self.memory_id = state["memory_id"]
+
+        shm = shared_memory.SharedMemory(name=state["name"])
+        shm.unlink()
+        block = np.ndarray((shm.size,), np.uint8, buffer=shm.buf)
+        # Columns are views of `block`, which lives until the last of them is collected
+        weakref.finalize(block, shm.close)
+
+        columns = {}
+        for field, dtype, shape, offset in state["layout"]:
+            dtype = np.dtype(dtype)
+            n_bytes = int(np.prod(shape)) * dtype.itemsize
+            columns[field] = block[offset : offset + n_bytes].view(dtype).reshape(shape)
+        self.memory = state["memory_type"]().from_columns(columns)
+
+
+class EventBus:
+    def __init__(self, components: list, mp_context=None):
+        """
+        Typed message bus between the Game stage components. Every component has an inbox, which is a multiprocessing
+        queue so that components running in another process (eg the AdaptationManager) can be reached.
+
+        Blocking components receive with `recv`, asyncio components with `arecv`. A `Stop` sent to every inbox with
+        `stop` unblocks every receiver, so that shutdown does not depend on timeouts.
+
+        Params:
+            - components: names of the components, eg ["memory_manager", "adapt_manager"]
+            - mp_context: multiprocessing context of the processes which use the bus, defaults to the default context
+        """
+        if mp_context is None:
+            mp_context = multiprocessing.get_context()
+        self._inboxes = {c: mp_context.Queue() for c in components}
+
+    def send(self, to: str, msg: Message):
+        self._inboxes[to].put(msg)
+
+    def recv(self, name: str, timeout: float | None = None) -> Message | None:
+        """
+        Wait for the next message of `name`'s inbox.
+
+        Returns None if `timeout` (in s) expired
+        """
+        try:
+            return self._inboxes[name].get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    async def arecv(self, name: str) -> Message:
+        """
+        Wait for the next message of `name`'s inbox from an asyncio event loop, without blocking it.
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self._inboxes[name].get
+        )
+
+    def stop(self, reason: str = ""):
+        """
+        Send a `Stop` to every component.
+        """
+        for name in self._inboxes:
+            self.send(name, Stop(reason))
+
+    def close(self, timeout: float = 0.1):
+        """
+        Drain and close every inbox, once no component receives anymore.
+
+        A message left in an inbox, eg a `MemorySegment` sent after the AdaptationManager stopped, would otherwise
+        block the interpreter's exit on the queue's feeder thread, and would leak its shared memory block.
+
+        Params:
+            - timeout: time to wait for messages still being flushed into an inbox, in s
+        """
+        for inbox in self._inboxes.values():
+            try:
+                while True:
+                    inbox.get(timeout=timeout)
+            except queue.Empty:
+                pass
+            inbox.close()
+            inbox.cancel_join_thread()
+
+
+class UdpEndpoint(asyncio.DatagramProtocol):
+    def __init__(self):
+        """
+        asyncio adapter for a UDP socket on the edge of the bus, eg to receive context packets from Unity.
+
+        Datagrams are queued as they arrive, `recv_batch` waits for at least one and drains the others.
+        """
+        self.queue = asyncio.Queue()
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr):
+        self.queue.put_nowait((data, addr))
+
+    async def recv_batch(self) -> list:
+        """
+        Returns every pending (datagram, address), waiting for at least one
+        """
+        batch = [await self.queue.get()]
+        while not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        return batch
+
+    @staticmethod
+    async def bind(addr: tuple):
+        """
+        Bind a new endpoint to `addr`, eg ("localhost", 12350).
+        """
+        _, endpoint = await asyncio.get_running_loop().create_datagram_endpoint(
+            UdpEndpoint, local_addr=addr
+        )
+        return endpoint
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
@@ -0,0 +1,129 @@
+import os
+import copy
+import pickle
+import threading
+import logging as log
+from collections import OrderedDict
+
+import torch
+
+
+def snapshot_nn(model: torch.nn.Module):
+    """
+    Copy the model's state to CPU, in the checkpoint format of `models.save_nn`.
+
+    The snapshot does not share memory with the model, so the model can keep training while it is written.
+    """
+    return {
+        "model_state_dict": {
+            k: v.detach().to("cpu", copy=True) for k, v in model.state_dict().items()
+        },
+        "scaler": copy.deepcopy(model.scaler),
+    }
+
+
+class CheckpointWriter:
+    def __init__(self):
+        """
+        Write checkpoints from a background thread, so that callers only pay for the snapshot.
+
+        Pending checkpoints are keyed: submitting a checkpoint for a key which is still pending replaces it, so bursts
+        are coalesced into a single write of the latest one. Files are written to a temporary path then renamed, so
+        readers never see a partial checkpoint, and are fsync'ed on `close`.
+        """
+        self._pending = OrderedDict()
+        """
+        key -> (path, obj, dump) of the checkpoints waiting to be written
+        """
+        self._written = []
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._busy = False
+
+        self.n_submitted = 0
+        self.n_written = 0
+        self.n_coalesced = 0
+        """
+        Number of submitted checkpoints replaced by a newer one before being written
+        """
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, key, path: str, obj, dump=pickle.dump):
+        """
+        Queue `obj` to be written to `path` with `dump(obj, file)`.
+
+        `obj` must not be modified afterwards, pass a snapshot.
+
+        Params:
+            - key: checkpoints with the same key are coalesced, eg "model" for per-round model saves
+            - path: output file
+            - obj: object to write
+            - dump: serialization function, eg `pickle.dump` or `torch.save`
+        """
+        with self._cond:
+            if self._stopped:
+                raise RuntimeError("CheckpointWriter is closed.")
+            if key in self._pending:
+                log.info(f"Coalescing checkpoint {self._pending[key][0]} into {path}")
+                self.n_coalesced += 1
+                del self._pending[key]
+            self._pending[key] = (path, obj, dump)
+            self.n_submitted += 1
+            self._cond.notify()
+
+    def save_nn(self, model: torch.nn.Module, path: str, key="model"):
+        """
+        Asynchronous `models.save_nn`. Snapshots the model and queues it.
+        """
+        self.submit(key, path, snapshot_nn(model), torch.save)
+
+    def flush(self):
+        """
+        Wait until every pending checkpoint is written.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: not self._pending and not self._busy)
+
+    def close(self):
+        """
+        Write every pending checkpoint, fsync the written files and stop the writer thread.
+        """
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self._thread.join()
+
+        for path in dict.fromkeys(self._written):
+            if not os.path.exists(path):
+                continue
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        self._written = []
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._stopped)
+                if not self._pending:
+                    return
+                _, (path, obj, dump) = self._pending.popitem(last=False)
+                self._busy = True
+
+            try:
+                tmp_path = path + ".tmp"
+                with open(tmp_path, "wb") as f:
+                    dump(obj, f)
+                os.replace(tmp_path, path)
+                self._written.append(path)
+                self.n_written += 1
+            except Exception as e:
+                log.error(f"Failed to write checkpoint {path}: {e}")
+
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
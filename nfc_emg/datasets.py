@@ -1,3 +1,6 @@
+import os
+import logging as log
+
 import numpy as np
 import torch
 from torch.utils.data import DataLoader, TensorDataset
@@ -8,6 +11,7 @@ from libemg.utils import make_regex
 from emager_py import data_processing as dp
 
 from nfc_emg.sensors import EmgSensor, EmgSensorType
+from nfc_emg import recordings, windowing, feature_cache, parallel_features
 
 
 def process_data(data: np.ndarray):
@@ -72,6 +76,128 @@ def prepare_data(
     return windows, labels
 
 
+def use_recordings(data_dir: str):
+    """
+    Check whether `data_dir` is loaded from its binary recordings. Binary recordings which are out of date with their
+    CSV recordings are reconverted first. If that is not possible, the CSV recordings are used.
+    """
+    if not recordings.has_index(data_dir):
+        return False
+    try:
+        n_converted = recordings.update_index(data_dir)
+    except OSError as e:
+        log.warning(f"Could not update the recordings of {data_dir}, using CSV: {e}")
+        return False
+    if n_converted is None:
+        log.warning(f"Recordings index of {data_dir} is out of date, using CSV")
+        return False
+    if n_converted > 0:
+        log.info(f"Reconverted {n_converted} out of date recordings in {data_dir}")
+    return True
+
+
+def get_windows(
+    data_dir: str,
+    classes: list,
+    repetitions: list,
+    sensor: EmgSensor,
+) -> windowing.WindowedRecordings:
+    """
+    Window a pre-recorded dataset without materializing the windows, see `windowing.WindowedRecordings`.
+
+    If `data_dir` was converted to binary recordings (see `recordings.convert_csv_dir`), they are memory-mapped,
+    after reconverting the ones whose CSV changed (see `use_recordings`). Otherwise, the CSV recordings are loaded with
+    `get_offline_datahandler`.
+
+    Params:
+        - data_dir: directory where data is stored
+        - classes: Class IDs to load. Labels are their index in `classes`
+        - repetitions: list of repetitions to load
+    """
+    if use_recordings(data_dir):
+        return recordings.get_windows(data_dir, classes, repetitions, sensor)
+    odh = get_offline_datahandler(data_dir, classes, repetitions)
+    return windowing.from_offline_datahandler(
+        odh, sensor.window_size, sensor.window_increment, repetitions
+    )
+
+
+def get_recording_files(data_dir: str, classes: list, repetitions: list):
+    """
+    List the recording files `get_windows` loads: the binary recordings and their index if `data_dir` was converted,
+    otherwise the CSV recordings.
+    """
+    if use_recordings(data_dir):
+        files = [
+            os.path.join(data_dir, e["file"])
+            for e in recordings.read_index(data_dir)
+            if e["class"] in classes and e["rep"] in repetitions
+        ]
+        return sorted(files) + [os.path.join(data_dir, recordings.INDEX)]
+
+    files = []
+    for f in sorted(os.listdir(data_dir)):
+        match = recordings.CSV_PATTERN.fullmatch(f)
+        if match is None:
+            continue
+        if int(match.group(1)) in repetitions and int(match.group(2)) in classes:
+            files.append(os.path.join(data_dir, f))
+    return files
+
+
+def get_features(
+    data_dir: str,
+    classes: list,
+    repetitions: list,
+    sensor: EmgSensor,
+    features: list,
+    use_cache: bool = True,
+    n_workers: int = 1,
+    backend: str = "libemg",
+):
+    """
+    Window a pre-recorded dataset and extract its features, see `get_windows`.
+
+    If `use_cache`, the features are memory-mapped from the on-disk feature cache when the same recordings were already
+    featurized with the same parameters, and cached otherwise. See `feature_cache.FeatureCache`.
+
+    If `n_workers` is not 1, features are extracted by a process pool, see `parallel_features.extract_features`.
+
+    `backend` selects the feature implementation, see `features.extract_batch`.
+
+    Returns:
+        tuple of np.ndarray with shapes (N, F), (N,), (N,): float32 features, label and repetition of each window
+    """
+    if use_cache:
+        cache = feature_cache.get_default_cache()
+        key = cache.make_key(
+            get_recording_files(data_dir, classes, repetitions),
+            sensor.window_size,
+            sensor.window_increment,
+            features,
+            classes=list(classes),
+            repetitions=list(repetitions),
+            backend=backend,
+        )
+        cached = cache.get(key)
+        if cached is not None:
+            log.info(f"Feature cache hit for {data_dir}: {cache.stats()}")
+            return cached["features"], cached["labels"], cached["reps"]
+
+    windows = get_windows(data_dir, classes, repetitions, sensor)
+    if n_workers == 1:
+        data = windowing.extract_features(features, windows, backend=backend)
+    else:
+        data = parallel_features.extract_features(
+            features, windows, n_workers, backend=backend
+        )
+    data = data.astype(np.float32)
+    if use_cache:
+        cache.put(key, features=data, labels=windows.labels, reps=windows.reps)
+        log.info(f"Feature cache miss for {data_dir}: {cache.stats()}")
+    return data, windows.labels, windows.reps
+
+
 def get_triplet_dataloader(
     data: np.ndarray,
     labels: np.ndarray,
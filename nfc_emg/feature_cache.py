@@ -0,0 +1,142 @@
+import os
+import json
+import shutil
+import hashlib
+import logging as log
+
+import numpy as np
+
+DEFAULT_DIR = "data/feature_cache/"
+DEFAULT_MAX_BYTES = 4 * 1024**3
+
+_default_cache = None
+
+
+class FeatureCache:
+    def __init__(self, root: str = DEFAULT_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        On-disk cache of extracted features. Each entry is a directory of NPY arrays named by its key, see `make_key`.
+
+        Entries are memory-mapped when read. When the cache grows past `max_bytes`, the least recently used entries
+        are evicted.
+
+        Params:
+            - root: cache directory, created if it does not exist
+            - max_bytes: maximum size of the cache in bytes
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+
+        self.hits = 0
+        self.misses = 0
+        self.n_evicted = 0
+
+    @staticmethod
+    def make_key(
+        files: list,
+        window_size: int,
+        window_increment: int,
+        features: list,
+        **params,
+    ):
+        """
+        Hash the recordings (path, size and modification time) and the windowing and feature parameters.
+
+        Params:
+            - files: recordings the features are extracted from
+            - params: any other parameter the features depend on, eg classes or filter settings
+        """
+        stats = []
+        for f in files:
+            st = os.stat(f)
+            stats.append([os.path.abspath(f), st.st_size, st.st_mtime_ns])
+        desc = {
+            "files": stats,
+            "window_size": window_size,
+            "window_increment": window_increment,
+            "features": list(features),
+            "params": params,
+        }
+        return hashlib.sha256(
+            json.dumps(desc, sort_keys=True, default=str).encode()
+        ).hexdigest()[:32]
+
+    def _entry(self, key: str):
+        return os.path.join(self.root, key)
+
+    def get(self, key: str):
+        """
+        Returns a dict of array name -> read-only memory-mapped array, or None if `key` is not cached
+        """
+        entry = self._entry(key)
+        if not os.path.isdir(entry):
+            self.misses += 1
+            return None
+        arrays = {
+            f[: -len(".npy")]: np.load(os.path.join(entry, f), mmap_mode="r")
+            for f in os.listdir(entry)
+            if f.endswith(".npy")
+        }
+        # The entry's modification time is its last use
+        os.utime(entry)
+        self.hits += 1
+        return arrays
+
+    def put(self, key: str, **arrays):
+        """
+        Cache `arrays` (name -> array) under `key`, then evict entries if the cache is too big.
+        """
+        entry = self._entry(key)
+        tmp = entry + ".tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        for name, arr in arrays.items():
+            np.save(os.path.join(tmp, name + ".npy"), arr)
+        shutil.rmtree(entry, ignore_errors=True)
+        os.replace(tmp, entry)
+        self.evict(keep=key)
+
+    def size(self):
+        """
+        Returns a dict of key -> (size in bytes, last use time)
+        """
+        entries = {}
+        for key in os.listdir(self.root):
+            entry = self._entry(key)
+            if key.endswith(".tmp") or not os.path.isdir(entry):
+                continue
+            size = sum(
+                os.path.getsize(os.path.join(entry, f)) for f in os.listdir(entry)
+            )
+            entries[key] = (size, os.stat(entry).st_mtime)
+        return entries
+
+    def evict(self, keep: str | None = None):
+        """
+        Evict the least recently used entries until the cache fits in `max_bytes`. `keep` is never evicted.
+        """
+        entries = self.size()
+        total = sum(s for s, _ in entries.values())
+        for key, (size, _) in sorted(entries.items(), key=lambda e: e[1][1]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(self._entry(key), ignore_errors=True)
+            total -= size
+            self.n_evicted += 1
+            log.info(f"Evicted {key} from the feature cache")
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "evicted": self.n_evicted}
+
+
+def get_default_cache():
+    """
+    Returns the process-wide feature cache in `DEFAULT_DIR`
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = FeatureCache()
+    return _default_cache
@@ -0,0 +1,335 @@
+import numpy as np
+
+from libemg.feature_extractor import FeatureExtractor
+
+TDPSD = ["M0", "M2", "M4", "SPARSI", "IRF", "WLF"]
+"""
+LibEMG's TDPSD feature group, in LibEMG's order
+"""
+
+FEATURE_BACKENDS = ["libemg", "numpy"]
+
+
+def _tdpsd_closures(s0, s1, s2, a1, a2, n, xp=np):
+    """
+    LibEMG's TDPSD per-signal closures, computed from the window sums of squared samples (s0),
+    squared 1st and 2nd derivatives (s1, s2) and absolute 1st and 2nd derivatives (a1, a2).
+
+    Params:
+        - n: window size
+        - xp: array module of the sums, numpy or torch
+
+    Returns a dict of {feature: (..., C) closure value}
+    """
+    m0 = xp.sqrt(s0) / (n - 1)
+    m0 = m0**0.1 / 0.1
+    m2 = xp.sqrt(s1 / (n - 1))
+    m2 = m2**0.1 / 0.1
+    m4 = xp.sqrt(s2 / (n - 1))
+    m4 = m4**0.1 / 0.1
+    return {
+        "M0": xp.log(xp.abs(m0)),
+        "M2": xp.log(xp.abs(m0 - m2)),
+        "M4": xp.log(xp.abs(m0 - m4)),
+        "SPARSI": xp.log(xp.abs(xp.sqrt(xp.abs((m0 - m2) * (m0 - m4))) / m0)),
+        "IRF": xp.log(xp.abs(m2 / xp.sqrt(m0 * m4))),
+        "WLF": xp.log(xp.abs(xp.sqrt(a1 / a2))),
+    }
+
+
+def _tdpsd_sums(signal: np.ndarray):
+    """
+    Window sums needed by `_tdpsd_closures`, accumulated in float64.
+
+    Params:
+        - signal: (N, C, W) windows
+
+    Returns (s0, s1, s2, a1, a2), each (N, C)
+    """
+    d1 = np.diff(signal, axis=-1)
+    d2 = np.diff(d1, axis=-1)
+    return (
+        np.sum(np.square(signal), axis=-1, dtype=np.float64),
+        np.sum(np.square(d1), axis=-1, dtype=np.float64),
+        np.sum(np.square(d2), axis=-1, dtype=np.float64),
+        np.sum(np.abs(d1), axis=-1, dtype=np.float64),
+        np.sum(np.abs(d2), axis=-1, dtype=np.float64),
+    )
+
+
+def extract_tdpsd(windows: np.ndarray, features: list = TDPSD) -> np.ndarray:
+    """
+    Batched TDPSD feature extraction.
+
+    The signal and its log-power are differentiated once, and the window sums are shared by every TDPSD feature.
+    Element-wise work is done in float32 and sums are accumulated in float64.
+
+    Outputs match LibEMG's `FeatureExtractor().extract_features(features, windows, array=True)`.
+
+    Params:
+        - windows: (N, C, W) windows
+        - features: subset of `TDPSD` to extract
+
+    Returns the (N, len(features) * C) feature array
+    """
+    unsupported = [f for f in features if f not in TDPSD]
+    if len(unsupported) > 0:
+        raise ValueError(f"Unsupported TDPSD features: {unsupported}")
+
+    windows = np.asarray(windows, dtype=np.float32)
+    n = windows.shape[-1]
+    ebp = _tdpsd_closures(*_tdpsd_sums(windows), n)
+    log_windows = np.log(np.square(windows) + np.float32(np.spacing(1.0)))
+    efp = _tdpsd_closures(*_tdpsd_sums(log_windows), n)
+    return np.hstack(
+        [-2 * efp[f] * ebp[f] / (efp[f] ** 2 + ebp[f] ** 2) for f in features]
+    )
+
+
+def extract_batch(
+    features: list,
+    windows: np.ndarray,
+    feature_dic: dict = {},
+    backend: str = "libemg",
+) -> np.ndarray:
+    """
+    Extract features from a batch of windows.
+
+    Params:
+        - features: LibEMG features to extract
+        - windows: (N, C, W) windows
+        - feature_dic: LibEMG feature parameters
+        - backend: one of `FEATURE_BACKENDS`. With "numpy", TDPSD features are extracted by `extract_tdpsd`, other
+        features fall back to LibEMG.
+
+    Returns the (N, len(features) * C) feature array, in the same layout as LibEMG's `extract_features(..., array=True)`
+    """
+    if backend not in FEATURE_BACKENDS:
+        raise ValueError(
+            f"Unknown feature backend {backend}, expected one of {FEATURE_BACKENDS}."
+        )
+    if backend == "numpy" and all(f in TDPSD for f in features):
+        return extract_tdpsd(windows, features)
+    return FeatureExtractor().extract_features(
+        features, windows, feature_dic, array=True
+    )
+
+
+_TDPSD_TERMS = [
+    "sq",
+    "d1_sq",
+    "d2_sq",
+    "d1_abs",
+    "d2_abs",
+    "log_sq",
+    "log_d1_sq",
+    "log_d2_sq",
+    "log_d1_abs",
+    "log_d2_abs",
+]
+
+
+class IncrementalFeatureExtractor:
+    FEATURE_TERMS = {
+        "MAV": ["abs"],
+        "RMS": ["sq"],
+        "WL": ["d1_abs"],
+        "ZC": ["zc"],
+        "SSC": ["ssc"],
+        "M0": _TDPSD_TERMS,
+        "M2": _TDPSD_TERMS,
+        "M4": _TDPSD_TERMS,
+        "SPARSI": _TDPSD_TERMS,
+        "IRF": _TDPSD_TERMS,
+        "WLF": _TDPSD_TERMS,
+    }
+    """
+    Supported features and the per-sample terms they are computed from
+    """
+
+    # Per-sample terms. The window sum of a term with offset `o` skips the first `o` samples of the window
+    # since they depend on samples that are outside of it.
+    _TERMS = {
+        "abs": 0,
+        "sq": 0,
+        "d1_abs": 1,
+        "zc": 1,
+        "ssc": 2,
+        "d1_sq": 1,
+        "d2_sq": 2,
+        "d2_abs": 2,
+        "log_sq": 0,
+        "log_d1_sq": 1,
+        "log_d2_sq": 2,
+        "log_d1_abs": 1,
+        "log_d2_abs": 2,
+    }
+
+    def __init__(
+        self,
+        features: list,
+        window_size: int,
+        feature_dic: dict = {},
+        rebase_every: int = 1000,
+    ):
+        """
+        Sliding-window feature extractor which keeps running sums per channel, so that every update costs O(increment) instead of O(window).
+
+        Outputs match LibEMG's `FeatureExtractor().extract_features(features, window, feature_dic, array=True)` for the latest window.
+
+        Params:
+            - features: features to extract, see `IncrementalFeatureExtractor.FEATURE_TERMS`
+            - window_size: window size in samples
+            - feature_dic: LibEMG feature parameters, only `SSC_threshold` is used
+            - rebase_every: number of updates between re-centering the running sums, which bounds floating-point drift
+        """
+        unsupported = [f for f in features if f not in self.FEATURE_TERMS]
+        if len(unsupported) > 0:
+            raise ValueError(f"Unsupported incremental features: {unsupported}")
+
+        self.features = list(features)
+        self.terms = [
+            t for t in self._TERMS if any(t in self.FEATURE_TERMS[f] for f in features)
+        ]
+        self._offsets = np.array([self._TERMS[t] for t in self.terms])
+        self.window_size = window_size
+        self.ssc_threshold = feature_dic.get("SSC_threshold", 0.0)
+        self.rebase_every = rebase_every
+        self.reset()
+
+    @staticmethod
+    def supports(features: list):
+        return all(f in IncrementalFeatureExtractor.FEATURE_TERMS for f in features)
+
+    def reset(self):
+        self.n_total = 0
+        """
+        Total number of samples seen since the last reset
+        """
+        self._prev = None
+        self._prefix = None
+        self._n_updates = 0
+
+    def update(self, samples: np.ndarray):
+        """
+        Slide the window over newly arrived samples.
+
+        Params:
+            - samples: (N, C) new samples, in chronological order
+        """
+        samples = np.asarray(samples, dtype=np.float64)
+        if len(samples) == 0:
+            return self
+        if self._prefix is None:
+            # Prefix sums of every term, for the last window_size + 1 sample positions
+            self._prefix = np.zeros(
+                (self.window_size + 1, len(self.terms), samples.shape[1])
+            )
+            self._prev = np.zeros((0, samples.shape[1]))
+
+        terms = self._compute_terms(samples)
+        prefix = self._prefix[self.n_total % len(self._prefix)] + np.cumsum(
+            terms, axis=0
+        )
+
+        n_new = len(samples)
+        to_write = prefix[-len(self._prefix) :]
+        idx = np.arange(self.n_total + n_new - len(to_write), self.n_total + n_new) + 1
+        self._prefix[idx % len(self._prefix)] = to_write
+
+        self._prev = np.vstack((self._prev, samples))[-2:]
+        self.n_total += n_new
+
+        self._n_updates += 1
+        if self._n_updates % self.rebase_every == 0:
+            self._prefix -= self._prefix[(self.n_total + 1) % len(self._prefix)].copy()
+
+        return self
+
+    def _compute_terms(self, samples: np.ndarray):
+        n_prev = len(self._prev)
+        x = np.vstack((self._prev, samples))
+        signals = {"": x}
+        if "log_sq" in self.terms:
+            signals["log_"] = np.log(x**2 + np.spacing(1))
+        diffs = {}
+
+        terms = np.zeros((len(samples), len(self.terms), x.shape[1]))
+        for i, term in enumerate(self.terms):
+            # Terms of samples without enough history are left at 0, they never end up in a window sum
+            order = self._TERMS[term]
+            start = max(order, n_prev)
+            out = terms[start - n_prev :, i]
+
+            if term == "abs":
+                np.abs(x[start:], out=out)
+            elif term == "zc":
+                out[:] = np.abs(np.diff(np.sign(x[start - 1 :]), axis=0)) == 2
+            elif term == "ssc":
+                w = x[start - 2 :]
+                out[:] = (w[1:-1] - w[:-2]) * (w[1:-1] - w[2:]) >= self.ssc_threshold
+            else:
+                prefix = "log_" if term.startswith("log_") else ""
+                sig = signals[prefix]
+                if order == 0:
+                    np.square(sig[start:], out=out)
+                    continue
+                if (prefix, order) not in diffs:
+                    diffs[(prefix, order)] = np.diff(sig, n=order, axis=0)
+                d = diffs[(prefix, order)][start - order :]
+                if term.endswith("_sq"):
+                    np.square(d, out=out)
+                else:
+                    np.abs(d, out=out)
+        return terms
+
+    def _window_sums(self):
+        n_pos = len(self._prefix)
+        end = self._prefix[self.n_total % n_pos]
+        start = self._prefix[
+            (self.n_total - self.window_size + self._offsets) % n_pos,
+            np.arange(len(self.terms)),
+        ]
+        sums = np.maximum(end - start, 0)
+        return dict(zip(self.terms, sums))
+
+    def extract(self) -> np.ndarray:
+        """
+        Extract features from the latest window.
+
+        Returns the (1, len(features) * C) feature array, in the same layout as LibEMG's `extract_features(..., array=True)`
+        """
+        if self.n_total < self.window_size:
+            raise ValueError(
+                f"Need at least {self.window_size} samples, got {self.n_total}."
+            )
+        n = self.window_size
+        s = self._window_sums()
+
+        feats = {}
+        if "MAV" in self.features:
+            feats["MAV"] = s["abs"] / n
+        if "RMS" in self.features:
+            feats["RMS"] = np.sqrt(s["sq"] / n)
+        if "WL" in self.features:
+            feats["WL"] = s["d1_abs"]
+        if "ZC" in self.features:
+            feats["ZC"] = np.round(s["zc"])
+        if "SSC" in self.features:
+            feats["SSC"] = np.round(s["ssc"])
+        if "log_sq" in self.terms:
+            ebp = _tdpsd_closures(
+                s["sq"], s["d1_sq"], s["d2_sq"], s["d1_abs"], s["d2_abs"], n
+            )
+            efp = _tdpsd_closures(
+                s["log_sq"],
+                s["log_d1_sq"],
+                s["log_d2_sq"],
+                s["log_d1_abs"],
+                s["log_d2_abs"],
+                n,
+            )
+            for f in ebp.keys():
+                feats[f] = -2 * efp[f] * ebp[f] / (efp[f] ** 2 + ebp[f] ** 2)
+
+        return np.hstack([feats[f] for f in self.features])[np.newaxis]
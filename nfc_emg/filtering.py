@@ -0,0 +1,120 @@
+import sys
+
+import numpy as np
+from scipy import signal
+
+from libemg.filtering import Filter
+
+
+class StreamingFilter:
+    def __init__(self, fi: Filter | None, buffer_len: int):
+        """
+        Causal and stateful version of a LibEMG `Filter` for the online path.
+
+        Every installed filter is converted to second-order sections whose state is kept per channel,
+        so each sample is filtered exactly once when it arrives. Filtered samples are written to a ring buffer.
+
+        Params:
+            - fi: LibEMG filter, eg from `utils.get_filter`. If None, samples are buffered as-is
+            - buffer_len: number of filtered samples kept in the ring buffer
+        """
+        self.buffer_len = buffer_len
+        self.sos = None
+        if fi is not None and hasattr(fi, "filters"):
+            sos = [
+                signal.tf2sos(f["b"], f["a"])
+                for f in fi.filters
+                if f["name"] in ["lowpass", "highpass", "bandpass", "bandstop", "notch"]
+            ]
+            if len(sos) > 0:
+                self.sos = np.vstack(sos)
+        self.reset()
+
+    def reset(self):
+        """
+        Clear the filter state and the ring buffer.
+        """
+        self.zi = None
+        self.buffer = None
+        self.n_total = 0
+        """
+        Total number of samples filtered since the last reset
+        """
+
+    def _init_state(self, first_sample: np.ndarray):
+        num_channels = len(first_sample)
+        # Samples are written twice, at i and i + buffer_len, so any span is a contiguous view
+        self.buffer = np.zeros((2 * self.buffer_len, num_channels))
+        if self.sos is not None:
+            # Start in steady-state w.r.t. the first sample to avoid a step transient
+            self.zi = (
+                signal.sosfilt_zi(self.sos)[:, :, np.newaxis]
+                * first_sample[np.newaxis, np.newaxis, :]
+            )
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        """
+        Filter new samples and append them to the ring buffer.
+
+        Params:
+            - samples: (N, C) newly arrived samples
+
+        Returns the (N, C) filtered samples
+        """
+        samples = np.asarray(samples, dtype=np.float64)
+        if samples.ndim == 1:
+            samples = samples[:, np.newaxis]
+        if len(samples) == 0:
+            return samples
+        if self.buffer is None:
+            self._init_state(samples[0])
+
+        if self.sos is not None:
+            samples, self.zi = signal.sosfilt(self.sos, samples, axis=0, zi=self.zi)
+
+        to_write = samples[-self.buffer_len :]
+        idx = np.arange(
+            self.n_total + len(samples) - len(to_write), self.n_total + len(samples)
+        )
+        idx %= self.buffer_len
+        self.buffer[idx] = to_write
+        self.buffer[idx + self.buffer_len] = to_write
+        self.n_total += len(samples)
+        return samples
+
+    def update(self, raw_data) -> np.ndarray:
+        """
+        Filter every sample which arrived in a LibEMG `RawData` since the last call, then drop them from `raw_data`.
+
+        Returns the (N, C) filtered new samples
+        """
+        data = raw_data.get_emg()
+        if data is None or len(data) == 0:
+            return np.zeros((0, 0))
+        new_samples = np.array(data)
+        # `emg_data[-window:][increment:]`: only drop what was read, samples that arrived in-between are kept
+        raw_data.adjust_increment(sys.maxsize, len(new_samples))
+        return self.process(new_samples)
+
+    def get_latest(self, n: int) -> np.ndarray:
+        """
+        Get the `n` most recent filtered samples.
+
+        Returns a read-only (n, C) view of the ring buffer, oldest sample first
+        """
+        return self.get_window(self.n_total, n)
+
+    def get_window(self, end: int, n: int) -> np.ndarray:
+        """
+        Get the `n` filtered samples before sample index `end` (exclusive), counted since the last reset.
+
+        Returns a read-only (n, C) view of the ring buffer, oldest sample first
+        """
+        if end > self.n_total or n > min(end, self.buffer_len - (self.n_total - end)):
+            raise ValueError(
+                f"Requested {n} samples ending at {end} but only samples {max(self.n_total - self.buffer_len, 0)} to {self.n_total} are buffered."
+            )
+        end = end % self.buffer_len + self.buffer_len
+        view = self.buffer[end - n : end]
+        view.flags.writeable = False
+        return view
@@ -0,0 +1,84 @@
+import copy
+import time
+from contextlib import contextmanager
+
+import torch
+
+
+class ModelSlots:
+    def __init__(self, model: torch.nn.Module, export=None):
+        """
+        Double-buffered model for hot-swapping weights without a lock around predictions.
+
+        Two instances of the model are kept: the active one is used for predictions, and new weights are loaded into the
+        standby one, which is then swapped in. Swapping is a single attribute assignment, which is atomic.
+
+        There must be a single publisher and a single reader. The publisher waits for the reader to leave the standby
+        slot before loading weights into it.
+
+        Params:
+            - model: model to serve, used as the first slot. The second slot is a copy, allocated once here.
+            - export: function `export(model, out=None)` which returns the module to predict with from a slot's model,
+            eg `models.fold_model`. Each slot's module is exported once here, then re-exported in place with
+            `export(model, out=module)` when the slot is swapped in. Defaults to predicting with the model itself.
+        """
+        self.slots = [model, copy.deepcopy(model)]
+        self.export = export
+        self.exported = [m if export is None else export(m) for m in self.slots]
+        """
+        Module used for the predictions of each slot
+        """
+        self._active = 0
+        self._in_use = -1
+        """
+        Slot being read by the reader, -1 if none
+        """
+
+    @property
+    def active(self) -> torch.nn.Module:
+        return self.slots[self._active]
+
+    @contextmanager
+    def use(self):
+        """
+        Get the active model, or its exported module, for the duration of a prediction.
+
+        The publisher can swap slots meanwhile, but will not overwrite the one being used.
+        """
+        while True:
+            i = self._active
+            self._in_use = i
+            # A swap happened before we marked the slot, it may already be getting overwritten
+            if self._active == i:
+                break
+        try:
+            yield self.exported[i]
+        finally:
+            self._in_use = -1
+
+    def prepare(self) -> torch.nn.Module:
+        """
+        Wait until the standby model is not used anymore and return it, so that new weights can be loaded into it.
+
+        Call `swap` afterwards to make it active.
+        """
+        standby = 1 - self._active
+        while self._in_use == standby:
+            time.sleep(0)
+        return self.slots[standby]
+
+    def swap(self):
+        """
+        Make the standby model active, re-exporting it first if needed.
+        """
+        standby = 1 - self._active
+        if self.export is not None:
+            self.export(self.slots[standby], out=self.exported[standby])
+        self._active = standby
+
+    def publish(self, state_dict: dict):
+        """
+        Load `state_dict` into the standby model and make it active.
+        """
+        self.prepare().load_state_dict(state_dict)
+        self.swap()
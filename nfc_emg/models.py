@@ -1,3 +1,4 @@
+import copy
 import numpy as np
 import logging as log
 
@@ -18,12 +19,12 @@ from typing import Iterable
 
 from libemg.offline_metrics import OfflineMetrics
 from libemg.emg_classifier import EMGClassifier
-from libemg.feature_extractor import FeatureExtractor
 
 from emager_py.majority_vote import majority_vote
 
 from nfc_emg import datasets, utils
 from nfc_emg.sensors import EmgSensor
+from nfc_emg.torch_features import TorchFeatureExtractor
 
 
 class EmgCNN(L.LightningModule):
@@ -375,6 +376,240 @@ class EmgMLP(L.LightningModule):
         return {k: v / num_batches for k, v in rets.items()}
 
 
+class EmgWindowModel(nn.Module):
+    def __init__(
+        self, model: EmgCNN | EmgMLP, features: list, feature_dic: dict = {}
+    ):
+        """
+        Window-to-logits model: extracts the features of raw (N, C, W) windows with a `TorchFeatureExtractor`,
+        standardizes them like `model.scaler` and classifies them with `model`, all in one batched call which can be
+        traced or compiled.
+
+        Params:
+            - model: model trained on `features`
+            - features: features to extract, in the order `model` was trained with
+            - feature_dic: LibEMG feature parameters
+        """
+        super().__init__()
+        self.feature_layer = TorchFeatureExtractor(features, feature_dic)
+        self.model = model
+        self.register_buffer("mean", torch.zeros(1))
+        self.register_buffer("scale", torch.ones(1))
+        self.update_scaler()
+
+    def update_scaler(self):
+        """
+        Copy the mean and scale of `model.scaler`, must be called after it is fitted again.
+        """
+        scaler = self.model.scaler
+        mean = getattr(scaler, "mean_", None)
+        scale = getattr(scaler, "scale_", None)
+        self.mean = torch.as_tensor(
+            mean if mean is not None else np.zeros(1), dtype=torch.float32
+        ).to(self.mean.device)
+        self.scale = torch.as_tensor(
+            scale if scale is not None else np.ones(1), dtype=torch.float32
+        ).to(self.scale.device)
+
+    def fit_scaler(self, windows: torch.Tensor):
+        """
+        Fit `model.scaler` to the features of `windows`, see `update_scaler`.
+
+        Params:
+            - windows: (N, C, W) training windows
+        """
+        with torch.no_grad():
+            feats = self.feature_layer(windows)
+        self.model.scaler.fit(feats.cpu().numpy())
+        self.update_scaler()
+
+    def forward(self, x: torch.Tensor):
+        feats = self.feature_layer(x)
+        return self.model((feats - self.mean) / self.scale)
+
+    def predict_proba(self, x: np.ndarray) -> np.ndarray:
+        """
+        Params:
+            - x: (N, C, W) windows
+
+        Returns (N, n_classes) class probabilities
+        """
+        x = torch.as_tensor(x, dtype=torch.float32, device=self.mean.device)
+        with torch.no_grad():
+            return F.softmax(self(x), dim=1).cpu().numpy()
+
+    def predict(self, x: np.ndarray) -> np.ndarray:
+        return np.argmax(self.predict_proba(x), axis=1)
+
+
+class FoldedModel(nn.Module):
+    def __init__(
+        self,
+        layers: nn.Sequential,
+        input_shape: tuple,
+        in_scale: torch.Tensor | None = None,
+        in_shift: torch.Tensor | None = None,
+    ):
+        """
+        Compact eval-only model, see `fold_model`.
+
+        Params:
+            - layers: layers with the standardization and BatchNorm folded in
+            - input_shape: shape of a single sample, the (N, F) features are reshaped to (N, *input_shape)
+            - in_scale, in_shift: element-wise standardization of the (N, F) features which could not be folded into
+            `layers`, or None
+        """
+        super().__init__()
+        self.layers = layers
+        self.input_shape = tuple(input_shape)
+        self.register_buffer("in_scale", in_scale)
+        self.register_buffer("in_shift", in_shift)
+        self.requires_grad_(False)
+        self.eval()
+
+    @property
+    def device(self):
+        return next(self.parameters()).device
+
+    def forward(self, x: torch.Tensor):
+        if self.in_scale is not None:
+            x = torch.addcmul(self.in_shift, x, self.in_scale)
+        return self.layers(x.reshape(-1, *self.input_shape))
+
+    def predict_proba(self, x) -> np.ndarray:
+        x = torch.as_tensor(x, dtype=torch.float32, device=self.device)
+        with torch.no_grad():
+            return F.softmax(self(x), dim=1).cpu().numpy()
+
+    def predict(self, x) -> np.ndarray:
+        return np.argmax(self.predict_proba(x), axis=1)
+
+
+_FOLDABLE = (nn.Linear, nn.Conv1d, nn.Conv2d)
+
+
+def _fold_batchnorm(
+    weight: torch.Tensor, bias: torch.Tensor, bn: nn.BatchNorm1d | nn.BatchNorm2d
+):
+    """
+    Fold the eval-mode transform of `bn` into the float64 `weight` and `bias` of the layer which precedes it.
+
+    Returns the folded (weight, bias)
+    """
+    std = torch.sqrt(bn.running_var.double() + bn.eps)
+    factor = bn.weight.double() / std if bn.affine else 1 / std
+    shift = bn.bias.double() if bn.affine else torch.zeros_like(std)
+    weight_shape = (-1,) + (1,) * (weight.dim() - 1)
+    bias = (bias - bn.running_mean.double()) * factor + shift
+    return weight * factor.reshape(weight_shape), bias
+
+
+def _fold_scaler(
+    weight: torch.Tensor, bias: torch.Tensor, mean: torch.Tensor, scale: torch.Tensor
+):
+    """
+    Fold the standardization (x - mean) / scale of the input of a Linear layer into its float64 `weight` and `bias`.
+
+    Returns the folded (weight, bias)
+    """
+    weight = weight / scale
+    return weight, bias - weight @ mean
+
+
+def _fold_plan(model: EmgCNN | EmgMLP):
+    """
+    Returns the layers of `model` kept by `fold_model`, as a list of (layer, BatchNorm folded into it or None).
+    Dropout is dropped.
+    """
+    modules = [*model.feature_extractor, model.classifier]
+    plan = []
+    for i, m in enumerate(modules):
+        if isinstance(m, nn.Dropout):
+            continue
+        if (
+            isinstance(m, nn.modules.batchnorm._BatchNorm)
+            and isinstance(modules[i - 1], _FOLDABLE)
+            and plan[-1][0] is modules[i - 1]
+        ):
+            plan[-1] = (modules[i - 1], m)
+            continue
+        plan.append((m, None))
+    return plan
+
+
+def fold_model(model: EmgCNN | EmgMLP, out: FoldedModel | None = None) -> FoldedModel:
+    """
+    Export `model` to a `FoldedModel` for inference, with identical outputs up to float32 rounding:
+
+    - The BatchNorm layers are folded into the Linear or Conv layer which precedes them, and Dropout is dropped.
+    - The StandardScaler is folded into the first Linear layer of an MLP. The first Conv layer of a CNN is zero-padded
+    and the scaler is per feature and electrode, so it is kept as a single element-wise multiply-add instead.
+
+    Predictions take float features, without going through sklearn and float64.
+
+    `model` is not modified.
+
+    Params:
+        - out: `FoldedModel` previously exported from a model of the same architecture. If given, it is re-folded in
+        place from `model`'s current weights, without allocating new layers.
+    """
+    if isinstance(model, EmgCNN):
+        input_shape = (model.num_channels, *model.emg_shape)
+    elif isinstance(model, EmgMLP):
+        input_shape = (model.feature_extractor[1].in_features,)
+    else:
+        raise TypeError(f"Cannot fold {type(model).__name__}.")
+
+    plan = _fold_plan(model)
+    # The scaler is folded into the first layer if it is Linear, ie only flattening comes before it
+    first = next(i for i, (m, _) in enumerate(plan) if not isinstance(m, nn.Flatten))
+    fold_scaler = isinstance(plan[first][0], nn.Linear)
+    n_features = int(np.prod(input_shape))
+
+    if out is None:
+        layers = []
+        for m, _ in plan:
+            m = copy.deepcopy(m)
+            if isinstance(m, _FOLDABLE) and m.bias is None:
+                m.bias = nn.Parameter(m.weight.new_zeros(m.weight.shape[0]))
+            layers.append(m)
+        in_scale, in_shift = None, None
+        if not fold_scaler:
+            in_scale, in_shift = torch.ones(n_features), torch.zeros(n_features)
+        out = FoldedModel(nn.Sequential(*layers), input_shape, in_scale, in_shift)
+        out = out.to(model.device)
+
+    device = out.device
+    mean = getattr(model.scaler, "mean_", None)
+    scale = getattr(model.scaler, "scale_", None)
+    mean = torch.as_tensor(
+        np.zeros(n_features) if mean is None else mean, dtype=torch.float64
+    ).to(device)
+    scale = torch.as_tensor(
+        np.ones(n_features) if scale is None else scale, dtype=torch.float64
+    ).to(device)
+
+    with torch.no_grad():
+        for i, ((src, bn), dst) in enumerate(zip(plan, out.layers)):
+            if not isinstance(src, _FOLDABLE):
+                continue
+            weight = src.weight.double()
+            if src.bias is not None:
+                bias = src.bias.double()
+            else:
+                bias = weight.new_zeros(weight.shape[0])
+            if bn is not None:
+                weight, bias = _fold_batchnorm(weight, bias, bn)
+            if i == first and fold_scaler:
+                weight, bias = _fold_scaler(weight, bias, mean, scale)
+            dst.weight.copy_(weight)
+            dst.bias.copy_(bias)
+        if not fold_scaler:
+            out.in_scale.copy_(1 / scale)
+            out.in_shift.copy_(-mean / scale)
+    return out
+
+
 class EmgSCNN(L.LightningModule):
     def __init__(self, input_shape: tuple):
         """
@@ -624,9 +859,10 @@ def train_nn(
     train_reps: list,
     test_reps: list,
     finetune: bool = False,
+    feature_backend: str = "libemg",
 ):
     """
-    Train/finetune a NN model
+    Train/finetune a NN model, with features extracted by `feature_backend`, see `features.extract_batch`
 
     Returns the trained model
     """
@@ -635,16 +871,18 @@ def train_nn(
     if not isinstance(test_reps, Iterable):
         test_reps = [test_reps]
 
-    odh = datasets.get_offline_datahandler(data_dir, classes, train_reps + test_reps)
-    train_odh = odh.isolate_data("reps", train_reps)
-    val_odh = odh.isolate_data("reps", test_reps)
-
-    # fi = utils.get_filter(sensor.fs, sensor.bandpass_freqs)
-    # fi.filter(train_odh)
-    # fi.filter(test_odh)
+    data, labels, reps = datasets.get_features(
+        data_dir,
+        classes,
+        train_reps + test_reps,
+        sensor,
+        features,
+        backend=feature_backend,
+    )
+    is_train = np.isin(reps, train_reps)
 
-    train_win, train_labels = datasets.prepare_data(train_odh, sensor)
-    train_data = FeatureExtractor().extract_features(features, train_win, array=True)
+    train_labels = labels[is_train]
+    train_data = data[is_train]
     train_data = (
         model.scaler.fit_transform(train_data)
         if not finetune
@@ -656,8 +894,8 @@ def train_nn(
 
     val_loader = None
     if len(test_reps) > 0:
-        val_win, val_labels = datasets.prepare_data(val_odh, sensor)
-        val_data = FeatureExtractor().extract_features(features, val_win, array=True)
+        val_labels = labels[~is_train]
+        val_data = data[~is_train]
         val_data = model.scaler.transform(val_data)
         val_loader = datasets.get_dataloader(
             val_data.astype(np.float32), val_labels, 256, False
@@ -682,6 +920,7 @@ def main_train_nn(
     model_out_path: str,
     num_reps: int,
     rep_time: int,
+    feature_backend: str = "libemg",
 ):
     if sample_data:
         utils.do_sgt(sensor, gestures_list, gestures_dir, data_dir, num_reps, rep_time)
@@ -704,6 +943,7 @@ def main_train_nn(
         train_reps,
         test_reps,
         True if num_reps < 3 else False,
+        feature_backend,
     )
     save_nn(model, model_out_path)
     return model
@@ -717,17 +957,19 @@ def main_test_nn(
     gestures_list: list,
     gestures_dir: str,
     data_dir: str,
+    feature_backend: str = "libemg",
 ):
     if sample_data:
         utils.do_sgt(sensor, gestures_list, gestures_dir, data_dir, 2, 3)
 
-    classes = utils.get_cid_from_gid(gestures_dir, data_dir, gestures_list)
+    catalog = utils.GestureCatalog.get(gestures_dir, data_dir)
+    classes = catalog.get_cids(gestures_list)
     reps = utils.get_reps(data_dir)
-    idle_cid = utils.map_gid_to_cid(gestures_dir, data_dir)[1]
+    idle_cid = catalog.gid_to_cid[1]
 
-    odh = datasets.get_offline_datahandler(data_dir, classes, reps)
-    data, labels = datasets.prepare_data(odh, sensor)
-    data = FeatureExtractor().extract_features(features, data, array=True)
+    data, labels, _ = datasets.get_features(
+        data_dir, classes, reps, sensor, features, backend=feature_backend
+    )
 
     classifier = EMGClassifier()
     classifier.classifier = model.eval()
@@ -766,24 +1008,19 @@ def train_scnn(
     if not isinstance(val_reps, Iterable):
         val_reps = [val_reps]
 
-    odh = datasets.get_offline_datahandler(data_dir, classes, train_reps + val_reps)
-    train_odh = odh.isolate_data("reps", train_reps)
-    val_odh = odh.isolate_data("reps", val_reps)
-
-    # fi = utils.get_filter(sensor.fs, sensor.bandpass_freqs, sensor.notch_freq)
-    # fi.filter(train_odh)
-    # fi.filter(val_odh)
+    data, labels, reps = datasets.get_features(
+        data_dir, classes, train_reps + val_reps, sensor, ["MAV"]
+    )
+    is_train = np.isin(reps, train_reps)
 
     # Generate triplets and train
 
-    train_windows, train_labels = datasets.prepare_data(train_odh, sensor)
-    train_data = FeatureExtractor().getMAVfeat(train_windows)
+    train_data, train_labels = data[is_train], labels[is_train]
     fit_data = np.copy(train_data)
     train_data = mw.scaler.fit_transform(train_data)
     train_data = np.reshape(train_data, (-1, 1, *sensor.emg_shape))
 
-    val_windows, val_labels = datasets.prepare_data(val_odh, sensor)
-    val_data = FeatureExtractor().getMAVfeat(val_windows)
+    val_data, val_labels = data[~is_train], labels[~is_train]
     val_data = mw.scaler.transform(val_data)
     val_data = np.reshape(val_data, (-1, 1, *sensor.emg_shape))
 
@@ -855,11 +1092,7 @@ def main_finetune_scnn(
     classes = utils.get_cid_from_gid(gestures_dir, data_dir, gestures_list)
     reps = utils.get_reps(data_dir)
 
-    fe = FeatureExtractor()
-
-    odh = datasets.get_offline_datahandler(data_dir, classes, reps)
-    data_windows, labels = datasets.prepare_data(odh, sensor)
-    data = fe.getMAVfeat(data_windows)
+    data, labels, _ = datasets.get_features(data_dir, classes, reps, sensor, ["MAV"])
     data = np.reshape(data, (-1, 1, *sensor.emg_shape))
 
     # Fit classifier
@@ -878,17 +1111,14 @@ def main_test_scnn(
     if sample_data:
         utils.do_sgt(sensor, gestures_list, gestures_dir, data_dir, 2, 3)
 
-    classes = utils.get_cid_from_gid(gestures_dir, data_dir, gestures_list)
-    idle_id = utils.map_gid_to_cid(gestures_dir, data_dir)[1]
+    catalog = utils.GestureCatalog.get(gestures_dir, data_dir)
+    classes = catalog.get_cids(gestures_list)
+    idle_id = catalog.gid_to_cid[1]
     reps = utils.get_reps(data_dir)
 
-    odh = datasets.get_offline_datahandler(data_dir, classes, reps)
-    # fi = utils.get_filter(sensor.fs, sensor.bandpass_freqs, sensor.notch_freq)
-    # fi.filter(odh)
-
-    data_windows, test_labels = datasets.prepare_data(odh, sensor)
-    # data = FeatureExtractor().getMEANfeat(data_windows)
-    data = FeatureExtractor().getMAVfeat(data_windows)
+    data, test_labels, _ = datasets.get_features(
+        data_dir, classes, reps, sensor, ["MAV"]
+    )
 
     mw.model.eval()
 
@@ -0,0 +1,180 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from nfc_emg.features import extract_batch
+from nfc_emg.windowing import WindowedRecordings
+
+# Shared state of a worker process, see `_init_worker`
+_worker = {}
+
+
+def _init_worker(
+    in_name: str,
+    in_shape: tuple,
+    in_dtype: str,
+    out_name: str,
+    out_shape: tuple,
+    out_dtype: str,
+    features: list,
+    window_size: int,
+    window_increment: int,
+    backend: str,
+):
+    in_shm = shared_memory.SharedMemory(name=in_name)
+    out_shm = shared_memory.SharedMemory(name=out_name)
+    _worker.update(
+        in_shm=in_shm,
+        out_shm=out_shm,
+        src=np.ndarray(in_shape, dtype=in_dtype, buffer=in_shm.buf),
+        out=np.ndarray(out_shape, dtype=out_dtype, buffer=out_shm.buf),
+        features=features,
+        window_size=window_size,
+        window_increment=window_increment,
+        backend=backend,
+    )
+
+
+def _extract_chunk(task: tuple):
+    """
+    Extract the features of a chunk of windows and write them to the shared output, at the chunk's position.
+
+    A task is either (out_start, start, end) for windows of a shared (N, C, W) array, or
+    (out_start, sample_start, sample_end, start, end) for windows of a shared recording.
+    """
+    src = _worker["src"]
+    if len(task) == 3:
+        out_start, start, end = task
+        windows = src[start:end]
+    else:
+        out_start, sample_start, sample_end, start, end = task
+        recording = src[sample_start:sample_end]
+        windows = sliding_window_view(recording, _worker["window_size"], axis=0)[
+            :: _worker["window_increment"]
+        ][start:end]
+    feats = extract_batch(_worker["features"], windows, backend=_worker["backend"])
+    _worker["out"][out_start : out_start + len(feats)] = feats
+    return len(feats)
+
+
+def _make_tasks(windows, chunk_size: int):
+    """
+    Split `windows` into chunks of at most `chunk_size` windows.
+
+    Returns (list of source arrays to share, one after the other, list of tasks), see `_extract_chunk`
+    """
+    if isinstance(windows, np.ndarray):
+        tasks = [
+            (start, start, min(start + chunk_size, len(windows)))
+            for start in range(0, len(windows), chunk_size)
+        ]
+        return [windows], tasks
+
+    # Share the recordings rather than the windows, which are ~W/window_increment times bigger
+    sample_offsets = np.concatenate(
+        [[0], np.cumsum([len(r) for r in windows.recordings])]
+    )
+    tasks = []
+    for i, view in enumerate(windows.views):
+        for start in range(0, len(view), chunk_size):
+            tasks.append(
+                (
+                    int(windows.offsets[i]) + start,
+                    int(sample_offsets[i]),
+                    int(sample_offsets[i + 1]),
+                    start,
+                    min(start + chunk_size, len(view)),
+                )
+            )
+    return windows.recordings, tasks
+
+
+def extract_features(
+    features: list,
+    windows: np.ndarray | WindowedRecordings,
+    n_workers: int | None = None,
+    chunk_size: int = 2048,
+    backend: str = "libemg",
+):
+    """
+    Extract features with a pool of worker processes.
+
+    The windows (or the recordings of a `WindowedRecordings`) and the output are passed to the workers through shared
+    memory instead of being pickled. Each worker writes its chunk's features at the chunk's position, so the output
+    order does not depend on scheduling.
+
+    Params:
+        - features: LibEMG features to extract
+        - windows: (N, C, W) windows, or `WindowedRecordings`
+        - n_workers: number of worker processes, defaults to the number of CPUs
+        - chunk_size: number of windows per task
+        - backend: feature backend, see `features.extract_batch`
+
+    Returns the (N, len(features) * C) feature array, in the same layout as LibEMG's `extract_features(..., array=True)`
+    """
+    if n_workers is None:
+        n_workers = os.cpu_count()
+    n_windows = len(windows)
+    n_channels = windows.shape[1]
+    if n_windows == 0:
+        return np.zeros((0, len(features) * n_channels))
+
+    sources, tasks = _make_tasks(windows, chunk_size)
+    src_dtype = np.result_type(*sources)
+    src_shape = (sum(len(s) for s in sources), *sources[0].shape[1:])
+
+    # Probe the output width and dtype on a single window
+    if isinstance(windows, np.ndarray):
+        first = windows[:1]
+    else:
+        first = next(windows.chunks(1))
+    probe = extract_batch(features, first, backend=backend)
+    out_shape = (n_windows, probe.shape[1])
+
+    in_shm = shared_memory.SharedMemory(
+        create=True, size=max(int(np.prod(src_shape)) * src_dtype.itemsize, 1)
+    )
+    out_shm = shared_memory.SharedMemory(
+        create=True, size=max(int(np.prod(out_shape)) * probe.dtype.itemsize, 1)
+    )
+    try:
+        # Write each source straight into its slice, so memory-mapped recordings are read once and never concatenated
+        shared_src = np.ndarray(src_shape, dtype=src_dtype, buffer=in_shm.buf)
+        start = 0
+        for s in sources:
+            shared_src[start : start + len(s)] = s
+            start += len(s)
+        del shared_src
+
+        window_increment = 1
+        if isinstance(windows, WindowedRecordings):
+            window_increment = windows.window_increment
+        with ProcessPoolExecutor(
+            n_workers,
+            initializer=_init_worker,
+            initargs=(
+                in_shm.name,
+                src_shape,
+                src_dtype.str,
+                out_shm.name,
+                out_shape,
+                probe.dtype.str,
+                features,
+                windows.shape[2],
+                window_increment,
+                backend,
+            ),
+        ) as pool:
+            n_done = sum(pool.map(_extract_chunk, tasks))
+        if n_done != n_windows:
+            raise RuntimeError(f"Extracted {n_done} windows, expected {n_windows}.")
+
+        return np.ndarray(out_shape, dtype=probe.dtype, buffer=out_shm.buf).copy()
+    finally:
+        in_shm.close()
+        in_shm.unlink()
+        out_shm.close()
+        out_shm.unlink()
@@ -0,0 +1,196 @@
+import os
+import struct
+
+import numpy as np
+
+MAGIC = b"NFCPRED\x00"
+VERSION = 1
+
+# magic, version, n_channels, window_size, reserved
+_HEADER = struct.Struct("<8sIII44x")
+HEADER_SIZE = _HEADER.size
+"""
+Size in bytes of the fixed header which starts every prediction log
+"""
+
+
+def record_dtype(window_shape: tuple):
+    """
+    Record layout of a prediction log.
+
+    Timestamps are kept in float64 since they are matched against the ones echoed back by Unity.
+
+    Params:
+        - window_shape: shape of a single window, (C, W)
+    """
+    return np.dtype(
+        [
+            ("timestamp", "<f8"),
+            ("prediction", "<i4"),
+            ("window", "<f4", tuple(int(s) for s in window_shape)),
+        ]
+    )
+
+
+def read_header(path: str):
+    """
+    Read and validate the header of a prediction log.
+
+    Returns the window shape (C, W)
+    """
+    with open(path, "rb") as f:
+        raw = f.read(HEADER_SIZE)
+    if len(raw) < HEADER_SIZE:
+        raise ValueError(f"{path} is too short to be a prediction log.")
+    magic, version, n_channels, window_size = _HEADER.unpack(raw)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a prediction log.")
+    if version != VERSION:
+        raise ValueError(f"Unsupported prediction log version {version} in {path}.")
+    return (n_channels, window_size)
+
+
+class PredictionLogWriter:
+    def __init__(self, path: str, window_shape: tuple, batch_size: int = 64):
+        """
+        Append-only binary prediction log. Records are buffered and written `batch_size` at a time.
+
+        Params:
+            - path: output path, overwritten if it exists
+            - window_shape: shape of a single window, (C, W)
+            - batch_size: number of records buffered before being written to disk
+        """
+        self.path = path
+        self.window_shape = tuple(int(s) for s in window_shape)
+        self.dtype = record_dtype(self.window_shape)
+
+        self._batch = np.zeros(batch_size, dtype=self.dtype)
+        self._n_batch = 0
+        self.n_written = 0
+
+        self._file = open(path, "wb")
+        self._file.write(_HEADER.pack(MAGIC, VERSION, *self.window_shape))
+
+    def append(self, timestamp: float, prediction: int, window: np.ndarray):
+        """
+        Append a single record.
+        """
+        rec = self._batch[self._n_batch]
+        rec["timestamp"] = timestamp
+        rec["prediction"] = prediction
+        rec["window"] = window
+        self._n_batch += 1
+        if self._n_batch == len(self._batch):
+            self.flush()
+
+    def extend(self, timestamps, predictions, windows):
+        """
+        Append many records at once, bypassing the batch buffer.
+
+        Params:
+            - timestamps: (N,) timestamps
+            - predictions: (N,) predictions
+            - windows: (N, C, W) windows
+        """
+        self.flush()
+        records = np.empty(len(timestamps), dtype=self.dtype)
+        records["timestamp"] = timestamps
+        records["prediction"] = predictions
+        records["window"] = windows
+        self._file.write(records.tobytes())
+        self._file.flush()
+        self.n_written += len(records)
+
+    def flush(self):
+        if self._n_batch == 0:
+            return
+        self._file.write(self._batch[: self._n_batch].tobytes())
+        self._file.flush()
+        self.n_written += self._n_batch
+        self._n_batch = 0
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class PredictionLog:
+    def __init__(self, path: str):
+        """
+        Memory-mapped reader of a binary prediction log. `timestamps`, `predictions` and `windows` are zero-copy views.
+
+        A partially written trailing record (eg if the experiment crashed) is ignored.
+
+        Params:
+            - path: path to the prediction log
+        """
+        self.path = path
+        self.window_shape = read_header(path)
+        self.dtype = record_dtype(self.window_shape)
+
+        n_records = (os.path.getsize(path) - HEADER_SIZE) // self.dtype.itemsize
+        if n_records == 0:
+            self.records = np.zeros(0, dtype=self.dtype)
+        else:
+            self.records = np.memmap(
+                path, self.dtype, mode="r", offset=HEADER_SIZE, shape=(n_records,)
+            )
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        return self.records["timestamp"]
+
+    @property
+    def predictions(self) -> np.ndarray:
+        return self.records["prediction"]
+
+    @property
+    def windows(self) -> np.ndarray:
+        """
+        (N, C, W) float32 windows
+        """
+        return self.records["window"]
+
+
+def convert_csv(csv_path: str, log_path: str, n_channels: int, chunk_size=1000):
+    """
+    Convert a legacy `preds.csv` file, where each row is [timestamp, prediction, *window.flatten()], to a binary prediction log.
+
+    Params:
+        - csv_path: legacy CSV predictions file
+        - log_path: output prediction log
+        - n_channels: number of EMG channels of the windows
+        - chunk_size: number of rows converted at a time
+
+    Returns the number of converted records
+    """
+    writer = None
+    with open(csv_path, "r") as f:
+        while True:
+            lines = [line for _, line in zip(range(chunk_size), f) if line.strip()]
+            if len(lines) == 0:
+                break
+            arr = np.fromstring("".join(lines).replace("\n", ","), sep=",")
+            arr = arr.reshape(len(lines), -1)
+            if writer is None:
+                window_size = (arr.shape[1] - 2) // n_channels
+                writer = PredictionLogWriter(log_path, (n_channels, window_size))
+            writer.extend(
+                arr[:, 0],
+                arr[:, 1],
+                arr[:, 2:].reshape(len(arr), *writer.window_shape),
+            )
+
+    if writer is None:
+        raise ValueError(f"{csv_path} is empty.")
+    writer.close()
+    return writer.n_written
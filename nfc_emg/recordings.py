@@ -0,0 +1,318 @@
+import os
+import re
+import json
+import struct
+
+import numpy as np
+
+from nfc_emg.sensors import EmgSensor
+from nfc_emg.windowing import WindowedRecordings
+
+MAGIC = b"NFCREC\x00\x00"
+VERSION = 1
+
+# magic, version, fs, n_channels, class, rep, sample dtype, scale, n_samples, reserved
+_HEADER = struct.Struct("<8sIdIiiIdQ12x")
+HEADER_SIZE = _HEADER.size
+"""
+Size in bytes of the fixed header which starts every recording
+"""
+
+SAMPLE_DTYPES = {0: np.dtype("<f4"), 1: np.dtype("<i2")}
+"""
+Sample dtype code -> dtype. int16 samples are multiplied by the header's scale factor when read.
+"""
+
+INDEX = "index.json"
+"""
+File name of the recordings index of a data directory
+"""
+
+CSV_PATTERN = re.compile(r"R_(\d+)_C_(\d+)_EMG\.csv")
+
+
+def get_recording_name(rep: int, class_id: int):
+    return f"R_{rep}_C_{class_id}_EMG.bin"
+
+
+def write_recording(
+    path: str,
+    data: np.ndarray,
+    fs: float,
+    class_id: int,
+    rep: int,
+    dtype: str = "float32",
+):
+    """
+    Write a recording.
+
+    Params:
+        - data: (N, C) samples
+        - fs: sampling rate in Hz
+        - class_id: ODH Class ID (CID) of the recording
+        - rep: repetition number of the recording
+        - dtype: "float32", or "int16" to quantize the samples with a per-file scale factor. Integer samples which fit
+        in int16 are stored losslessly.
+    """
+    data = np.asarray(data, dtype=np.float64)
+    if data.ndim != 2:
+        raise ValueError(f"Expected (N, C) samples, got shape {data.shape}.")
+
+    scale = 1.0
+    if dtype == "float32":
+        code = 0
+        samples = data.astype("<f4")
+    elif dtype == "int16":
+        code = 1
+        peak = np.max(np.abs(data)) if data.size else 0.0
+        if peak > np.iinfo(np.int16).max or np.any(data != np.round(data)):
+            scale = peak / np.iinfo(np.int16).max
+        samples = np.round(data / scale).astype("<i2")
+    else:
+        raise ValueError(f"Unsupported sample dtype {dtype}.")
+
+    with open(path, "wb") as f:
+        f.write(
+            _HEADER.pack(
+                MAGIC, VERSION, fs, data.shape[1], class_id, rep, code, scale, len(data)
+            )
+        )
+        f.write(np.ascontiguousarray(samples).tobytes())
+
+
+def read_header(path: str):
+    """
+    Read and validate the header of a recording.
+
+    Returns a dict with keys "fs", "n_channels", "class", "rep", "dtype", "scale" and "n_samples"
+    """
+    with open(path, "rb") as f:
+        raw = f.read(HEADER_SIZE)
+    if len(raw) < HEADER_SIZE:
+        raise ValueError(f"{path} is too short to be a recording.")
+    magic, version, fs, n_channels, class_id, rep, code, scale, n_samples = (
+        _HEADER.unpack(raw)
+    )
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a recording.")
+    if version != VERSION:
+        raise ValueError(f"Unsupported recording version {version} in {path}.")
+    return {
+        "fs": fs,
+        "n_channels": n_channels,
+        "class": class_id,
+        "rep": rep,
+        "dtype": SAMPLE_DTYPES[code],
+        "scale": scale,
+        "n_samples": n_samples,
+    }
+
+
+def read_recording(path: str):
+    """
+    Memory-map a recording.
+
+    Returns:
+        - (N, C) samples, read-only. int16 samples are returned as-is, multiply them by the header's "scale"
+        - header, see `read_header`
+    """
+    header = read_header(path)
+    shape = (header["n_samples"], header["n_channels"])
+    if header["n_samples"] == 0:
+        return np.zeros(shape, dtype=header["dtype"]), header
+    samples = np.memmap(
+        path, header["dtype"], mode="r", offset=HEADER_SIZE, shape=shape
+    )
+    return samples, header
+
+
+def load_recording(path: str, dtype=np.float64):
+    """
+    Load a recording's samples in physical units.
+
+    Returns (N, C) samples
+    """
+    samples, header = read_recording(path)
+    data = samples.astype(dtype)
+    if header["scale"] != 1.0:
+        data *= header["scale"]
+    return data
+
+
+def read_index(data_dir: str):
+    """
+    Read the recordings index of `data_dir`.
+
+    Returns a list of dicts with keys "file", "class", "rep", "n_samples", "n_channels", "fs", "dtype" and "source_mtime"
+    """
+    with open(os.path.join(data_dir, INDEX), "r") as f:
+        index = json.load(f)
+    if index["version"] != VERSION:
+        raise ValueError(
+            f"Unsupported recordings index version {index['version']} in {data_dir}."
+        )
+    return index["files"]
+
+
+def write_index(data_dir: str, files: list):
+    """
+    Write the recordings index of `data_dir`, see `read_index` for the entries.
+    """
+    tmp_path = os.path.join(data_dir, INDEX + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump({"version": VERSION, "files": files}, f, indent=2)
+    os.replace(tmp_path, os.path.join(data_dir, INDEX))
+
+
+def has_index(data_dir: str):
+    return os.path.exists(os.path.join(data_dir, INDEX))
+
+
+def is_index_current(data_dir: str):
+    """
+    Check that the index of `data_dir` matches its CSV recordings: every CSV was converted after its last modification,
+    and no CSV was added or removed since. A directory without CSV recordings is current if it has an index.
+    """
+    if not has_index(data_dir):
+        return False
+    converted = {e["file"]: e for e in read_index(data_dir)}
+    sources = {}
+    for f in os.listdir(data_dir):
+        match = CSV_PATTERN.fullmatch(f)
+        if match is not None:
+            name = get_recording_name(int(match.group(1)), int(match.group(2)))
+            sources[name] = os.stat(os.path.join(data_dir, f)).st_mtime_ns
+    if not sources:
+        return True
+    if sources.keys() != converted.keys():
+        return False
+    return all(
+        converted[name]["source_mtime"] == mtime
+        and os.path.exists(os.path.join(data_dir, name))
+        for name, mtime in sources.items()
+    )
+
+
+def convert_csv_dir(data_dir: str, fs: float, dtype: str = "float32"):
+    """
+    Convert the `R_<REP>_C_<ID>_EMG.csv` recordings of `data_dir` to binary recordings next to them, and write the
+    directory's index. Recordings whose CSV did not change since the last conversion, with the same `fs` and
+    `dtype`, are skipped.
+
+    Params:
+        - fs: sampling rate of the recordings in Hz, which the CSV files don't store
+        - dtype: sample dtype, see `write_recording`
+
+    Returns the number of converted recordings
+    """
+    previous = {}
+    if has_index(data_dir):
+        previous = {e["file"]: e for e in read_index(data_dir)}
+
+    files = []
+    n_converted = 0
+    for f in sorted(os.listdir(data_dir)):
+        match = CSV_PATTERN.fullmatch(f)
+        if match is None:
+            continue
+        rep, class_id = int(match.group(1)), int(match.group(2))
+        csv_path = os.path.join(data_dir, f)
+        name = get_recording_name(rep, class_id)
+        mtime = os.stat(csv_path).st_mtime_ns
+
+        entry = previous.get(name)
+        if (
+            entry is None
+            or entry["source_mtime"] != mtime
+            or entry["dtype"] != dtype
+            or entry["fs"] != fs
+            or not os.path.exists(os.path.join(data_dir, name))
+        ):
+            data = np.loadtxt(csv_path, delimiter=",", ndmin=2)
+            write_recording(
+                os.path.join(data_dir, name), data, fs, class_id, rep, dtype
+            )
+            entry = {
+                "file": name,
+                "class": class_id,
+                "rep": rep,
+                "n_samples": len(data),
+                "n_channels": data.shape[1],
+                "fs": fs,
+                "dtype": dtype,
+                "source_mtime": mtime,
+            }
+            n_converted += 1
+        files.append(entry)
+
+    write_index(data_dir, files)
+    return n_converted
+
+
+def update_index(data_dir: str):
+    """
+    Reconvert the CSV recordings of `data_dir` if its index is not current (see `is_index_current`), with the sampling
+    rate and dtype of the previous conversion.
+
+    Returns the number of converted recordings, or None if the index has no previous conversion to reuse
+    """
+    if is_index_current(data_dir):
+        return 0
+    index = read_index(data_dir)
+    if len(index) == 0:
+        return None
+    return convert_csv_dir(data_dir, index[0]["fs"], index[0]["dtype"])
+
+
+def get_windows(data_dir: str, classes: list, repetitions: list, sensor: EmgSensor):
+    """
+    Window the binary recordings of `data_dir` without loading them. The recordings are selected from the index.
+
+    float32 recordings are memory-mapped, int16 recordings are converted to float32 in memory.
+
+    Like LibEMG, labels are the index of each recording's class in `classes`. Recordings are ordered by
+    (repetition, class).
+
+    Returns a `WindowedRecordings`
+    """
+    entries = [
+        e
+        for e in read_index(data_dir)
+        if e["class"] in classes and e["rep"] in repetitions
+    ]
+    entries.sort(key=lambda e: (e["rep"], e["class"]))
+
+    data = []
+    for e in entries:
+        samples, header = read_recording(os.path.join(data_dir, e["file"]))
+        if header["dtype"] != np.float32 or header["scale"] != 1.0:
+            samples = load_recording(os.path.join(data_dir, e["file"]), np.float32)
+        data.append(samples)
+    return WindowedRecordings(
+        data,
+        [classes.index(e["class"]) for e in entries],
+        [e["rep"] for e in entries],
+        sensor.window_size,
+        sensor.window_increment,
+    )
+
+
+def prepare_data(
+    data_dir: str,
+    classes: list,
+    repetitions: list,
+    sensor: EmgSensor,
+    dtype=np.float64,
+):
+    """
+    Load and window the binary recordings of `data_dir`, like `datasets.prepare_data` does with an
+    OfflineDataHandler from `datasets.get_offline_datahandler`. The recordings are selected from the index.
+
+    Like LibEMG, labels are the index of each recording's class in `classes`. Recordings are ordered by
+    (repetition, class).
+
+    Returns:
+        tuple of np.ndarray with shapes (N, C, W), (N,), where C is the # channels and W is window size
+    """
+    windows = get_windows(data_dir, classes, repetitions, sensor)
+    return windows.materialize().astype(dtype), windows.labels
@@ -0,0 +1,193 @@
+import time
+
+import numpy as np
+from scipy import sparse
+
+
+def knn(query: np.ndarray, ref: np.ndarray, k: int, self_offset: int | None = None):
+    """
+    Brute-force k nearest neighbours.
+
+    Params:
+        - query: (N, F) query points
+        - ref: (M, F) reference points
+        - k: number of neighbours
+        - self_offset: if query[i] is ref[self_offset + i], exclude it from its own neighbours
+
+    Returns the (N, min(k, M)) indices into `ref`
+    """
+    d2 = (
+        np.sum(query**2, axis=1)[:, np.newaxis]
+        + np.sum(ref**2, axis=1)[np.newaxis]
+        - 2 * query @ ref.T
+    )
+    if self_offset is not None:
+        d2[np.arange(len(query)), self_offset + np.arange(len(query))] = np.inf
+        k = min(k, len(ref) - 1)
+    k = min(k, len(ref))
+    if k <= 0:
+        return np.zeros((len(query), 0), dtype=np.int64)
+    return np.argpartition(d2, k - 1, axis=1)[:, :k]
+
+
+class IncrementalLabelSpreading:
+    def __init__(
+        self,
+        n_classes: int,
+        n_neighbors: int = 10,
+        alpha: float = 0.2,
+        max_iter: int = 30,
+        tol: float = 1e-3,
+    ):
+        """
+        Label spreading over a sparse kNN graph, made for repeated relabeling rounds.
+
+        Anchors are the labeled samples kept between rounds. Their neighbour lists are only computed when they are added,
+        and the label distribution of the previous round is used to warm-start propagation.
+
+        Params:
+            - n_classes: number of classes
+            - n_neighbors: number of neighbours of each sample in the kNN graph
+            - alpha: clamping factor, same as sklearn's `LabelSpreading`
+            - max_iter: maximum number of propagation iterations per round
+            - tol: convergence tolerance on the label distributions
+        """
+        self.n_classes = n_classes
+        self.n_neighbors = n_neighbors
+        self.alpha = alpha
+        self.max_iter = max_iter
+        self.tol = tol
+
+        self.timings = []
+        """
+        Per-round dicts of {graph, propagate: time in s, n_iter, n_anchors, n_new}
+        """
+
+        self.reset()
+
+    def reset(self):
+        self.ids = np.zeros(0, dtype=np.int64)
+        """
+        Unique ID of each anchor
+        """
+        self._features = None
+        self._labels = np.zeros((0, self.n_classes))
+        self._dist = np.zeros((0, self.n_classes))
+        # Neighbours of each anchor, by ID. -1 if the neighbour was evicted
+        self._neighbors = np.zeros((0, self.n_neighbors), dtype=np.int64)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def set_anchors(self, ids: np.ndarray, features: np.ndarray, labels: np.ndarray):
+        """
+        Synchronize the anchor set. Anchors whose ID is not in `ids` are removed, new IDs are added to the graph.
+
+        Params:
+            - ids: (N,) unique sample IDs, eg `Memory.experience_ids`
+            - features: (N, F) features
+            - labels: (N,) class labels
+        """
+        ids = np.asarray(ids)
+        keep = np.isin(self.ids, ids)
+        is_new = ~np.isin(ids, self.ids)
+
+        self.ids = np.concatenate((self.ids[keep], ids[is_new]))
+        new_labels = np.eye(self.n_classes)[np.asarray(labels)[is_new].astype(int)]
+        self._labels = np.vstack((self._labels[keep], new_labels))
+        self._dist = np.vstack((self._dist[keep], new_labels))
+        if self._features is None:
+            self._features = np.zeros((0, features.shape[1]))
+        self._features = np.vstack((self._features[keep], np.asarray(features)[is_new]))
+
+        neighbors = self._neighbors[keep]
+        neighbors[~np.isin(neighbors, self.ids)] = -1
+        n_new = np.count_nonzero(is_new)
+        new_neighbors = np.full((n_new, self.n_neighbors), -1, dtype=np.int64)
+        if n_new > 0:
+            idx = knn(
+                self._features[-n_new:],
+                self._features,
+                self.n_neighbors,
+                self_offset=len(self.ids) - n_new,
+            )
+            new_neighbors[:, : idx.shape[1]] = self.ids[idx]
+        self._neighbors = np.vstack((neighbors, new_neighbors))
+        return self
+
+    def _graph(self, features: np.ndarray):
+        """
+        Symmetric normalized adjacency of the anchors followed by `features`.
+        """
+        n_anchors = len(self.ids)
+        n_total = n_anchors + len(features)
+
+        # Anchor edges, mapping neighbour IDs to rows
+        order = np.argsort(self.ids)
+        valid = self._neighbors >= 0
+        rows = [np.nonzero(valid)[0]]
+        cols = [order[np.searchsorted(self.ids, self._neighbors[valid], sorter=order)]]
+
+        # New sample edges, to anchors and to each other
+        if len(features) > 0:
+            ref = features
+            if n_anchors > 0:
+                ref = np.vstack((self._features, features))
+            idx = knn(features, ref, self.n_neighbors, self_offset=n_anchors)
+            rows.append(np.repeat(np.arange(n_anchors, n_total), idx.shape[1]))
+            cols.append(idx.flatten())
+
+        rows = np.concatenate(rows)
+        cols = np.concatenate(cols)
+        w = sparse.csr_matrix(
+            (np.ones(len(rows)), (rows, cols)), shape=(n_total, n_total)
+        )
+        w = w.maximum(w.T)
+        deg = np.asarray(w.sum(axis=1)).flatten()
+        deg[deg == 0] = 1
+        d = sparse.diags(1 / np.sqrt(deg))
+        return (d @ w @ d).tocsr()
+
+    def fit_predict(self, features: np.ndarray, labels: np.ndarray):
+        """
+        Spread labels to a new batch of samples, like sklearn's `LabelSpreading.fit` on the anchors + `features`.
+
+        Params:
+            - features: (N, F) new samples
+            - labels: (N,) their labels, -1 for unlabeled samples
+
+        Returns the (N,) transduction of the new samples
+        """
+        features = np.asarray(features)
+        labels = np.asarray(labels).astype(int)
+
+        t0 = time.perf_counter()
+        s = self._graph(features)
+        t_graph = time.perf_counter() - t0
+
+        y_new = np.zeros((len(labels), self.n_classes))
+        y_new[labels >= 0, labels[labels >= 0]] = 1
+        y = np.vstack((self._labels, y_new))
+
+        t0 = time.perf_counter()
+        f = np.vstack((self._dist, y_new))
+        n_iter = 0
+        for n_iter in range(1, self.max_iter + 1):
+            f_next = self.alpha * (s @ f) + (1 - self.alpha) * y
+            delta = np.abs(f_next - f).sum()
+            f = f_next
+            if delta < self.tol:
+                break
+        t_propagate = time.perf_counter() - t0
+
+        self._dist = f[: len(self.ids)]
+        self.timings.append(
+            {
+                "graph": t_graph,
+                "propagate": t_propagate,
+                "n_iter": n_iter,
+                "n_anchors": len(self.ids),
+                "n_new": len(features),
+            }
+        )
+        return np.argmax(f[len(self.ids) :], axis=1)
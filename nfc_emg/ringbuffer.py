@@ -0,0 +1,222 @@
+import csv
+import threading
+import logging as log
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from nfc_emg.predlog import PredictionLogWriter
+
+
+class PredictionRingBuffer:
+    def __init__(
+        self,
+        capacity: int,
+        window_shape: tuple,
+        name: str | None = None,
+        create: bool = True,
+    ):
+        """
+        Fixed-size ring buffer of (timestamp, prediction, window) records, stored in shared memory.
+
+        There must be a single writer. Readers get zero-copy views and can check with `is_valid`
+        that a record was not overwritten while they were reading it.
+
+        Params:
+            - capacity: number of records kept
+            - window_shape: shape of a single window, eg (C, W)
+            - name: shared memory block name. Use it with `create=False` to attach from another process
+            - create: create the shared memory block, otherwise attach to an existing one
+        """
+        self.capacity = capacity
+        self.window_shape = tuple(int(s) for s in window_shape)
+
+        window_len = int(np.prod(self.window_shape))
+        # header: [head], then seq, timestamps, predictions, windows. All 8-byte aligned.
+        sizes = [1, capacity, capacity, capacity, capacity * window_len]
+        offsets = np.cumsum([0] + sizes) * 8
+
+        self.shm = shared_memory.SharedMemory(
+            name=name, create=create, size=int(offsets[-1])
+        )
+        self.name = self.shm.name
+        self.is_owner = create
+
+        def view(i, dtype, shape):
+            return np.ndarray(shape, dtype, buffer=self.shm.buf, offset=offsets[i])
+
+        self._header = view(0, np.int64, (1,))
+        self.seqs = view(1, np.int64, (capacity,))
+        """
+        Sequence number of the record held by each slot, -1 if empty or being written
+        """
+        self.timestamps = view(2, np.float64, (capacity,))
+        self.predictions = view(3, np.int64, (capacity,))
+        self.windows = view(4, np.float64, (capacity, *self.window_shape))
+
+        if create:
+            self._header[:] = 0
+            self.seqs[:] = -1
+            self.timestamps[:] = 0
+
+    @property
+    def head(self) -> int:
+        """
+        Number of records published so far, which is also the next sequence number
+        """
+        return int(self._header[0])
+
+    def __len__(self):
+        return min(self.head, self.capacity)
+
+    def publish(self, timestamp: float, prediction: int, window: np.ndarray) -> int:
+        """
+        Write a new record, overwriting the oldest one if the buffer is full.
+
+        Returns the sequence number of the record
+        """
+        seq = self.head
+        slot = seq % self.capacity
+        self.seqs[slot] = -1
+        self.timestamps[slot] = timestamp
+        self.predictions[slot] = prediction
+        self.windows[slot] = window
+        self.seqs[slot] = seq
+        self._header[0] = seq + 1
+        return seq
+
+    def is_valid(self, seq: int) -> bool:
+        """
+        Check if record `seq` is still held by the buffer
+        """
+        return seq >= 0 and self.seqs[seq % self.capacity] == seq
+
+    def get(self, seq: int):
+        """
+        Get a record from its sequence number.
+
+        Returns (timestamp, prediction, window view) or None if the record is not in the buffer anymore
+        """
+        if not self.is_valid(seq):
+            return None
+        slot = seq % self.capacity
+        return self.timestamps[slot], self.predictions[slot], self.windows[slot]
+
+    def find_timestamp(self, timestamp: float, tolerance: float = 0.0) -> int | None:
+        """
+        Find the sequence number of the record closest to `timestamp`, within `tolerance`, or None if there is none.
+
+        This is a linear scan, prefer `get` with the sequence number when it is known.
+        """
+        diff = np.abs(self.timestamps - timestamp)
+        slot = int(np.argmin(diff))
+        if diff[slot] > tolerance:
+            return None
+        seq = int(self.seqs[slot])
+        if seq < 0:
+            return None
+        return seq
+
+    def unlink(self):
+        """
+        Release the shared memory block once every process is done with it. Only the owner can unlink.
+        """
+        if self.is_owner:
+            self.shm.unlink()
+
+
+class PredictionSink:
+    def __init__(
+        self,
+        preds: PredictionRingBuffer,
+        path: str,
+        flush_period: float = 0.2,
+    ):
+        """
+        Optional persistence of a `PredictionRingBuffer` to disk. Records are written in batches from a background thread.
+
+        If `path` ends with ".bin", records are written to a binary prediction log (see `nfc_emg.predlog`).
+        Otherwise, each CSV row is [timestamp, prediction, *window.flatten()].
+
+        Params:
+            - preds: ring buffer to persist
+            - path: output path
+            - flush_period: time in seconds between batches. Must be short enough for the ring buffer not to wrap around
+        """
+        self.preds = preds
+        self.path = path
+        self.flush_period = flush_period
+
+        self.read_pos = 0
+        self.n_written = 0
+        self.n_lost = 0
+
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        if self.path.endswith(".bin"):
+            self._log = PredictionLogWriter(self.path, self.preds.window_shape)
+        else:
+            self._log = None
+            self._file = open(self.path, "w", newline="")
+            self._writer = csv.writer(self._file, delimiter=",")
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Write the remaining records and close the file.
+        """
+        self._stop.set()
+        self._thread.join()
+        self.flush()
+        if self._log is not None:
+            self._log.close()
+        else:
+            self._file.close()
+        if self.n_lost > 0:
+            log.warning(
+                f"PredictionSink: {self.n_lost} predictions were overwritten before being saved"
+            )
+
+    def _run(self):
+        while not self._stop.wait(self.flush_period):
+            self.flush()
+
+    def flush(self):
+        """
+        Write every record published since the last flush.
+        """
+        head = self.preds.head
+        if head - self.read_pos > self.preds.capacity:
+            self.n_lost += head - self.read_pos - self.preds.capacity
+            self.read_pos = head - self.preds.capacity
+
+        records = []
+        for seq in range(self.read_pos, head):
+            record = self.preds.get(seq)
+            if record is None:
+                self.n_lost += 1
+                continue
+            ts, pred, window = record
+            record = (float(ts), int(pred), window.copy())
+            # The writer may have wrapped around while we were copying
+            if not self.preds.is_valid(seq):
+                self.n_lost += 1
+                continue
+            records.append(record)
+        self.read_pos = head
+
+        if len(records) == 0:
+            return
+        if self._log is not None:
+            ts, preds, windows = zip(*records)
+            self._log.extend(ts, preds, np.stack(windows))
+        else:
+            self._writer.writerows(
+                [f"{ts:.4f}", pred] + window.flatten().tolist()
+                for ts, pred, window in records
+            )
+            self._file.flush()
+        self.n_written += len(records)
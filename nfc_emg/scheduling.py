@@ -0,0 +1,177 @@
+import time
+import threading
+from collections import deque
+
+import numpy as np
+
+
+class WindowJob:
+    def __init__(self, end: int, ready: float, deadline: float):
+        """
+        A window waiting to be processed by the online classifier.
+
+        Params:
+            - end: sample index (exclusive) at which the window ends
+            - ready: `time.perf_counter()` at which the window's last sample was seen
+            - deadline: `time.perf_counter()` before which the prediction should be sent
+        """
+        self.end = end
+        self.ready = ready
+        self.deadline = deadline
+        self.start = 0.0
+        """
+        `time.perf_counter()` at which processing started
+        """
+
+
+class DeadlineScheduler:
+    CATCH_UP = ["skip", "all"]
+    """
+    What to do with windows which became ready while the previous one was being processed:
+        - skip: only process the latest window, the stale ones are counted as skipped
+        - all: process every window in order, up to `max_backlog`
+    """
+
+    def __init__(
+        self,
+        window_size: int,
+        window_increment: int,
+        fs: int,
+        catch_up: str = "skip",
+        deadline: float | None = None,
+        max_backlog: int = 8,
+        min_wait: float = 0.001,
+        history: int = 1000,
+    ):
+        """
+        Schedule the online classifier's windows as samples arrive, instead of polling on a fixed sleep.
+
+        A window is ready every `window_increment` samples once `window_size` samples were seen. Between windows,
+        `wait` sleeps until the next one is expected from the sampling rate, and wakes up early on `notify`.
+
+        Params:
+            - window_size: window size in samples
+            - window_increment: window increment in samples
+            - fs: sampling rate in Hz
+            - catch_up: catch-up behaviour, see `DeadlineScheduler.CATCH_UP`
+            - deadline: time budget of a window from the moment it is ready, in s. Defaults to one increment
+            - max_backlog: maximum number of windows kept with `catch_up="all"`, older ones are skipped
+            - min_wait: shortest wait in s, when a window is late
+            - history: number of latest windows kept for the timing statistics
+        """
+        if catch_up not in self.CATCH_UP:
+            raise ValueError(f"Unknown catch-up behaviour {catch_up}.")
+
+        self.window_size = window_size
+        self.window_increment = window_increment
+        self.fs = fs
+        self.catch_up = catch_up
+        self.period = window_increment / fs
+        self.deadline = deadline if deadline is not None else self.period
+        self.max_backlog = max_backlog
+        self.min_wait = min_wait
+
+        self._event = threading.Event()
+        self._pending = deque()
+        self._expected = None
+
+        self.n_total = 0
+        """
+        Total number of samples seen
+        """
+        self.next_end = window_size
+        """
+        Sample index at which the next window will be ready
+        """
+
+        self.n_processed = 0
+        self.n_skipped = 0
+        self.n_rejected = 0
+        """
+        Number of processed windows whose features were invalid, so no prediction was made
+        """
+        self.n_missed = 0
+        """
+        Number of processed windows which finished after their deadline
+        """
+        self.queue_delays = deque(maxlen=history)
+        """
+        Time between a window being ready and its processing starting, in s
+        """
+        self.latencies = deque(maxlen=history)
+        """
+        Time between a window being ready and its processing being done, in s
+        """
+
+    def notify(self):
+        """
+        Signal that new samples arrived. Can be called from any thread.
+        """
+        self._event.set()
+
+    def wait(self):
+        """
+        Block until the next window is expected or until `notify` is called.
+        """
+        timeout = self.min_wait
+        if self._expected is not None:
+            timeout = max(self._expected - time.perf_counter(), self.min_wait)
+        if self._event.wait(timeout):
+            self._event.clear()
+
+    def add_samples(self, n: int):
+        """
+        Account for `n` newly arrived samples, queueing the windows they complete.
+        """
+        now = time.perf_counter()
+        self.n_total += n
+        while self.next_end <= self.n_total:
+            self._pending.append(WindowJob(self.next_end, now, now + self.deadline))
+            self.next_end += self.window_increment
+        # Samples keep arriving at fs, so this is when the next window should be complete
+        self._expected = now + (self.next_end - self.n_total) / self.fs
+
+    def jobs(self):
+        """
+        Yield the ready windows according to the catch-up behaviour. Call `done` after processing each of them.
+        """
+        if self.catch_up == "skip":
+            max_pending = 1
+        else:
+            max_pending = self.max_backlog
+        while len(self._pending) > max_pending:
+            self._pending.popleft()
+            self.n_skipped += 1
+
+        while len(self._pending) > 0:
+            job = self._pending.popleft()
+            job.start = time.perf_counter()
+            self.queue_delays.append(job.start - job.ready)
+            yield job
+
+    def done(self, job: WindowJob, rejected: bool = False):
+        """
+        Mark `job` as processed. If `rejected`, it was processed without producing a prediction.
+        """
+        now = time.perf_counter()
+        self.n_processed += 1
+        if rejected:
+            self.n_rejected += 1
+        self.latencies.append(now - job.ready)
+        if now > job.deadline:
+            self.n_missed += 1
+
+    def summary(self):
+        """
+        Timing statistics of the latest windows, as a string.
+        """
+        if len(self.latencies) == 0:
+            return "no window processed"
+        queue = 1000 * np.array(self.queue_delays)
+        lat = 1000 * np.array(self.latencies)
+        return (
+            f"processed: {self.n_processed}, skipped: {self.n_skipped}, rejected: {self.n_rejected}, "
+            f"deadline misses: {self.n_missed} | "
+            f"queue delay p50: {np.percentile(queue, 50):.2f} ms, p99: {np.percentile(queue, 99):.2f} ms | "
+            f"latency p50: {np.percentile(lat, 50):.2f} ms, p99: {np.percentile(lat, 99):.2f} ms"
+        )
@@ -66,6 +66,12 @@ class EmgSensor:
 
         return self.p
 
+    def __getstate__(self):
+        # The streamer handle belongs to the process which started it
+        state = self.__dict__.copy()
+        state["p"] = None
+        return state
+
     def stop_streamer(self):
         """Stop the streamer for the device"""
         if self.p is not None:
@@ -0,0 +1,114 @@
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+import torch
+
+
+class SharedStateDict:
+    def __init__(
+        self,
+        state_dict: dict | None = None,
+        name: str | None = None,
+        layout: list | None = None,
+    ):
+        """
+        A model's state_dict stored in shared memory, with a version counter, so that a process can publish new weights
+        and another process can load them in place.
+
+        The version is odd while weights are being written, and is bumped by 2 for every publish.
+
+        Create it from a `state_dict`, then send it to other processes: it is pickled as its shared memory name and layout.
+
+        Params:
+            - state_dict: initial weights, eg `model.state_dict()`
+            - name: shared memory block name to attach to, used when unpickling
+            - layout: list of (key, dtype, shape), used when unpickling
+        """
+        create = name is None
+        if create:
+            layout = [
+                (k, v.detach().cpu().numpy().dtype.str, tuple(v.shape))
+                for k, v in state_dict.items()
+            ]
+        self.layout = layout
+
+        # Header: [version], then every tensor, all 8-byte aligned
+        offsets = [8]
+        for _, dtype, shape in layout:
+            size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+            offsets.append(offsets[-1] + (size + 7) // 8 * 8)
+
+        self.shm = shared_memory.SharedMemory(
+            name=name, create=create, size=max(offsets[-1], 8)
+        )
+        self.name = self.shm.name
+        self.is_owner = create
+
+        self._version = np.ndarray((1,), np.int64, buffer=self.shm.buf)
+        self.arrays = {
+            k: np.ndarray(shape, dtype, buffer=self.shm.buf, offset=offsets[i])
+            for i, (k, dtype, shape) in enumerate(layout)
+        }
+        """
+        Shared numpy view of each tensor
+        """
+
+        if create:
+            self._version[0] = 0
+            self.publish(state_dict)
+
+    def __getstate__(self):
+        return {"name": self.name, "layout": self.layout}
+
+    def __setstate__(self, state):
+        self.__init__(name=state["name"], layout=state["layout"])
+
+    @property
+    def version(self) -> int:
+        return int(self._version[0])
+
+    def publish(self, state_dict: dict):
+        """
+        Write new weights. There must be a single publisher.
+
+        Returns the new version
+        """
+        version = self.version
+        self._version[0] = version + 1
+        for k, v in state_dict.items():
+            self.arrays[k][...] = v.detach().cpu().numpy()
+        self._version[0] = version + 2
+        return version + 2
+
+    def load_into(self, model: torch.nn.Module, known_version: int = -1):
+        """
+        Copy the shared weights into `model`'s tensors in place, retrying if a publish happens during the copy.
+
+        Params:
+            - model: model with the same state_dict layout
+            - known_version: version already loaded by `model`, nothing is copied if it is still current
+
+        Returns the loaded version
+        """
+        while True:
+            version = self.version
+            if version == known_version:
+                return version
+            if version % 2 == 1:
+                time.sleep(0)
+                continue
+
+            state_dict = model.state_dict()
+            with torch.no_grad():
+                for k, arr in self.arrays.items():
+                    state_dict[k].copy_(torch.from_numpy(arr))
+            if self.version == version:
+                return version
+
+    def unlink(self):
+        """
+        Release the shared memory block once every process is done with it. Only the owner can unlink.
+        """
+        if self.is_owner:
+            self.shm.unlink()
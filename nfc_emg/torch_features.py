@@ -0,0 +1,90 @@
+import numpy as np
+import torch
+import torch.nn as nn
+
+from nfc_emg.features import TDPSD, _tdpsd_closures
+
+BASIC = ["MAV", "RMS", "WL", "ZC", "SSC"]
+
+# Same epsilon as LibEMG's log-power signal, regardless of the input's dtype
+_EPS = float(np.spacing(1.0))
+
+
+def _tdpsd_sums(signal: torch.Tensor):
+    """
+    Torch version of `features._tdpsd_sums`, sums are accumulated in float64.
+    """
+    d1 = torch.diff(signal, dim=-1)
+    d2 = torch.diff(d1, dim=-1)
+    return (
+        torch.sum(signal**2, dim=-1, dtype=torch.float64),
+        torch.sum(d1**2, dim=-1, dtype=torch.float64),
+        torch.sum(d2**2, dim=-1, dtype=torch.float64),
+        torch.sum(torch.abs(d1), dim=-1, dtype=torch.float64),
+        torch.sum(torch.abs(d2), dim=-1, dtype=torch.float64),
+    )
+
+
+class TorchFeatureExtractor(nn.Module):
+    FEATURES = BASIC + TDPSD
+    """
+    Supported features
+    """
+
+    def __init__(self, features: list, feature_dic: dict = {}):
+        """
+        Feature extraction as a torch module, so that it can run batched on the model's device, and be traced or
+        compiled along with the model.
+
+        Outputs match `features.extract_batch(features, windows, feature_dic)`. ZC and SSC are counts, so no gradient
+        flows through them.
+
+        Params:
+            - features: features to extract, see `TorchFeatureExtractor.FEATURES`
+            - feature_dic: LibEMG feature parameters, only `SSC_threshold` is used
+        """
+        super().__init__()
+        unsupported = [f for f in features if f not in self.FEATURES]
+        if len(unsupported) > 0:
+            raise ValueError(f"Unsupported torch features: {unsupported}")
+
+        self.features = list(features)
+        self.ssc_threshold = feature_dic.get("SSC_threshold", 0.0)
+        self.use_tdpsd = any(f in TDPSD for f in features)
+
+    @staticmethod
+    def supports(features: list):
+        return all(f in TorchFeatureExtractor.FEATURES for f in features)
+
+    def forward(self, x: torch.Tensor):
+        """
+        Params:
+            - x: (N, C, W) windows
+
+        Returns the (N, len(features) * C) features, in the same layout as LibEMG's `extract_features(..., array=True)`
+        """
+        n = x.shape[-1]
+        feats = {}
+        if "MAV" in self.features:
+            feats["MAV"] = torch.mean(torch.abs(x), dim=-1)
+        if "RMS" in self.features:
+            feats["RMS"] = torch.sqrt(torch.mean(x**2, dim=-1))
+        if "WL" in self.features:
+            feats["WL"] = torch.sum(torch.abs(torch.diff(x, dim=-1)), dim=-1)
+        if "ZC" in self.features:
+            zc = torch.abs(torch.diff(torch.sign(x), dim=-1)) == 2
+            feats["ZC"] = torch.sum(zc, dim=-1).to(x.dtype)
+        if "SSC" in self.features:
+            ssc = (x[..., 1:-1] - x[..., :-2]) * (
+                x[..., 1:-1] - x[..., 2:]
+            ) >= self.ssc_threshold
+            feats["SSC"] = torch.sum(ssc, dim=-1).to(x.dtype)
+        if self.use_tdpsd:
+            ebp = _tdpsd_closures(*_tdpsd_sums(x), n, xp=torch)
+            log_x = torch.log(x**2 + _EPS)
+            efp = _tdpsd_closures(*_tdpsd_sums(log_x), n, xp=torch)
+            for f in TDPSD:
+                feat = -2 * efp[f] * ebp[f] / (efp[f] ** 2 + ebp[f] ** 2)
+                feats[f] = feat.to(x.dtype)
+
+        return torch.cat([feats[f] for f in self.features], dim=-1)
@@ -0,0 +1,200 @@
+import os
+import glob
+import time
+import struct
+from enum import IntEnum
+
+import numpy as np
+
+MAGIC = b"NFCTRACE"
+VERSION = 1
+
+# magic, version, reserved
+_HEADER = struct.Struct("<8sI20x")
+HEADER_SIZE = _HEADER.size
+
+RECORD_DTYPE = np.dtype([("seq", "<i8"), ("t", "<f8"), ("stage", "<i4")])
+"""
+Record layout of a trace file. `t` is `time.perf_counter()`, which is monotonic and shared by every process.
+"""
+
+
+class TraceStage(IntEnum):
+    # Per window, keyed by the prediction's sequence number in the PredictionRingBuffer
+    WINDOW_READY = 0
+    FEATURES = 1
+    PREDICTED = 2
+    SENT = 3
+    CONTEXT_RECEIVED = 4
+    CONTEXT_DECODED = 5
+
+    # Per memory, keyed by the memory id
+    MEMORY_WRITTEN = 10
+    MEMORY_LOADED = 11
+    TRAINED = 12
+
+    # Per weights update, keyed by the weights version
+    WEIGHTS_PUBLISHED = 20
+    WEIGHTS_LOADED = 21
+
+
+TRACE_GROUPS = {
+    "window": [
+        TraceStage.WINDOW_READY,
+        TraceStage.FEATURES,
+        TraceStage.PREDICTED,
+        TraceStage.SENT,
+        TraceStage.CONTEXT_RECEIVED,
+        TraceStage.CONTEXT_DECODED,
+    ],
+    "memory": [
+        TraceStage.MEMORY_WRITTEN,
+        TraceStage.MEMORY_LOADED,
+        TraceStage.TRAINED,
+    ],
+    "weights": [
+        TraceStage.WEIGHTS_PUBLISHED,
+        TraceStage.WEIGHTS_LOADED,
+    ],
+}
+"""
+Stages sharing the same sequence numbers, in the order they happen
+"""
+
+
+class Tracer:
+    def __init__(
+        self, path: str | None, batch_size: int = 4096, flush_period: float = 1.0
+    ):
+        """
+        Append-only binary trace of (seq, stage, timestamp) records. Records are buffered and written when `batch_size`
+        records are buffered or `flush_period` seconds have passed, so that tracing can be left on during sessions.
+
+        A Tracer must only be used by a single thread. Use one trace file per component, `load_traces` merges them.
+
+        Params:
+            - path: output path, overwritten if it exists. If None, tracing is disabled and `record` does nothing
+            - batch_size: number of records buffered before being written to disk
+            - flush_period: maximum time in s between writes, which bounds what is lost if the process is killed
+        """
+        self.path = path
+        self.enabled = path is not None
+        self._batch = np.zeros(batch_size, dtype=RECORD_DTYPE)
+        self._n_batch = 0
+        self.n_written = 0
+        self.flush_period = flush_period
+        self._last_flush = time.perf_counter()
+
+        self._file = None
+        if self.enabled:
+            self._file = open(path, "wb")
+            self._file.write(_HEADER.pack(MAGIC, VERSION))
+
+    def record(self, seq: int, stage: TraceStage, t: float | None = None):
+        """
+        Record that `seq` reached `stage` at time `t`, now if None.
+        """
+        if not self.enabled:
+            return
+        if t is None:
+            t = time.perf_counter()
+        self._batch[self._n_batch] = (seq, t, stage)
+        self._n_batch += 1
+        if (
+            self._n_batch == len(self._batch)
+            or t - self._last_flush > self.flush_period
+        ):
+            self.flush()
+
+    def flush(self):
+        self._last_flush = time.perf_counter()
+        if self._n_batch == 0:
+            return
+        self._file.write(self._batch[: self._n_batch].tobytes())
+        self._file.flush()
+        self.n_written += self._n_batch
+        self._n_batch = 0
+
+    def close(self):
+        if not self.enabled:
+            return
+        self.flush()
+        self._file.close()
+
+
+def read_trace(path: str) -> np.ndarray:
+    """
+    Memory-map a trace file. A partially written trailing record is ignored.
+
+    Returns the records, see `RECORD_DTYPE`
+    """
+    with open(path, "rb") as f:
+        raw = f.read(HEADER_SIZE)
+    if len(raw) < HEADER_SIZE:
+        raise ValueError(f"{path} is too short to be a trace file.")
+    magic, version = _HEADER.unpack(raw)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a trace file.")
+    if version != VERSION:
+        raise ValueError(f"Unsupported trace version {version} in {path}.")
+
+    n_records = (os.path.getsize(path) - HEADER_SIZE) // RECORD_DTYPE.itemsize
+    if n_records == 0:
+        return np.zeros(0, dtype=RECORD_DTYPE)
+    return np.memmap(
+        path, RECORD_DTYPE, mode="r", offset=HEADER_SIZE, shape=(n_records,)
+    )
+
+
+def load_traces(paths: str | list) -> np.ndarray:
+    """
+    Load and merge trace files.
+
+    Params:
+        - paths: list of trace files, or a glob pattern such as `"data/.../live_trace_*.bin"`
+    """
+    if isinstance(paths, str):
+        paths = sorted(glob.glob(paths))
+    if len(paths) == 0:
+        return np.zeros(0, dtype=RECORD_DTYPE)
+    return np.concatenate([read_trace(p) for p in paths])
+
+
+def stage_durations(records: np.ndarray) -> dict:
+    """
+    Compute, for every stage, the time since the previous stage of its group for the same sequence number.
+
+    Sequences which did not reach the previous stage are ignored for that stage.
+
+    Returns a dict of stage name -> durations in s
+    """
+    durations = {}
+    for stages in TRACE_GROUPS.values():
+        prev_seqs, prev_t = None, None
+        for stage in stages:
+            rec = records[records["stage"] == stage]
+            # Keep the first time each sequence reached the stage
+            seqs, first = np.unique(rec["seq"], return_index=True)
+            t = rec["t"][first]
+            if prev_seqs is not None:
+                _, i_prev, i_cur = np.intersect1d(
+                    prev_seqs, seqs, assume_unique=True, return_indices=True
+                )
+                durations[stage.name] = t[i_cur] - prev_t[i_prev]
+            prev_seqs, prev_t = seqs, t
+    return durations
+
+
+def summarize(records: np.ndarray, percentiles=(50, 95, 99)) -> dict:
+    """
+    Summarize the per-stage durations of a trace.
+
+    Returns a dict of stage name -> {"n": count, "p50": ..., "p95": ..., "p99": ...} with durations in ms
+    """
+    summary = {}
+    for stage, dt in stage_durations(records).items():
+        stats = {"n": len(dt)}
+        for p in percentiles:
+            stats[f"p{p}"] = 1000 * np.percentile(dt, p) if len(dt) > 0 else np.nan
+        summary[stage] = stats
+    return summary
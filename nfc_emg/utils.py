@@ -2,6 +2,7 @@ import os
 from typing import Iterable
 import json
 import shutil
+import threading
 import matplotlib.pyplot as plt
 from sklearn.metrics import ConfusionMatrixDisplay
 
@@ -50,6 +51,122 @@ def reverse_dict(d: dict):
     return {v: k for k, v in d.items()}
 
 
+class GestureCatalog:
+    _cache = {}
+    _lock = threading.Lock()
+
+    def __init__(self, gesture_img_dir: str | None = None, data_dir: str | None = None):
+        """
+        Lookup tables between LibEMG Gesture IDs (GID), ODH Class IDs (CID) and human-readable gesture names.
+
+        `gesture_list.json` and `metadata.json` are only parsed once, use `GestureCatalog.get` to share catalogs.
+
+        Params:
+            - gesture_img_dir: path to LibEMG gestures, None if GIDs are not needed
+            - data_dir: path to the directory where data is stored, None if CIDs are not needed
+        """
+        self.gesture_img_dir = gesture_img_dir
+        self.data_dir = data_dir
+        self._mtimes = self._get_mtimes()
+
+        self.gid_to_name = {}
+        if gesture_img_dir is not None:
+            with open(gesture_img_dir + "gesture_list.json", "r") as f:
+                gid_to_name: dict = json.load(f)
+            gid_to_name["17"] = "Wrist_Down"
+            gid_to_name["18"] = "Wrist_Up"
+            for k, v in gid_to_name.items():
+                if isinstance(v, str):
+                    self.gid_to_name[int(k)] = v
+
+        self.cid_to_name = {}
+        if data_dir is not None:
+            with open(data_dir + "metadata.json", "r") as f:
+                metadata: dict = json.load(f)
+            for val in metadata.values():
+                if not isinstance(val, dict):
+                    continue
+                if "class_idx" not in val and "class_name" not in val:
+                    continue
+                name = val["class_name"]
+                if name == "OK":
+                    name = "Wrist_Down"
+                if name == "Stop":
+                    name = "Wrist_Up"
+                self.cid_to_name[val["class_idx"]] = name
+
+        self.name_to_gid = reverse_dict(self.gid_to_name)
+        self.name_to_cid = reverse_dict(self.cid_to_name)
+
+        self.gid_to_cid = self._match_cids(self.name_to_gid)
+        """
+        GID -> CID of the gestures found in both, in CID order of `metadata.json`
+        """
+        self.cid_to_gid = reverse_dict(self.gid_to_cid)
+
+    def _match_cids(self, name_to_gid: dict):
+        """
+        Returns a dict GID -> CID of the gestures of `name_to_gid` found in `metadata.json`, in CID order
+        """
+        return {
+            name_to_gid[n]: c for c, n in self.cid_to_name.items() if n in name_to_gid
+        }
+
+    def _get_mtimes(self):
+        paths = []
+        if self.gesture_img_dir is not None:
+            paths.append(self.gesture_img_dir + "gesture_list.json")
+        if self.data_dir is not None:
+            paths.append(self.data_dir + "metadata.json")
+        return [os.stat(p).st_mtime_ns for p in paths]
+
+    def is_stale(self):
+        """
+        Returns True if a JSON file changed since the catalog was loaded
+        """
+        try:
+            return self._get_mtimes() != self._mtimes
+        except FileNotFoundError:
+            return True
+
+    @classmethod
+    def get(cls, gesture_img_dir: str | None = None, data_dir: str | None = None):
+        """
+        Get the cached catalog of (`gesture_img_dir`, `data_dir`), reloading it if its JSON files changed.
+        """
+        key = (gesture_img_dir, data_dir)
+        with cls._lock:
+            catalog = cls._cache.get(key)
+            if catalog is None or catalog.is_stale():
+                catalog = cls(gesture_img_dir, data_dir)
+                cls._cache[key] = catalog
+            return catalog
+
+    def get_gid_to_cid(self, gids=None):
+        """
+        Returns a dict GID -> CID, only for `gids` if not None.
+
+        Several GIDs can share a gesture name, so names are resolved among `gids` only.
+        """
+        if gids is None:
+            return dict(self.gid_to_cid)
+        return self._match_cids(
+            reverse_dict({g: n for g, n in self.gid_to_name.items() if g in gids})
+        )
+
+    def get_cids(self, gids=None):
+        """
+        Returns the list of CIDs of `gids`, in CID order of `metadata.json`
+        """
+        return list(self.get_gid_to_cid(gids).values())
+
+    def get_names(self, gids=None):
+        """
+        Returns the gesture names of `gids`, ordered by CID
+        """
+        return [self.cid_to_name[c] for c in sorted(self.get_cids(gids))]
+
+
 def map_gid_to_name(gesture_img_dir: str, gids=None):
     """Map all gesture IDs (GID) to their human-readable name
 
@@ -60,17 +177,8 @@ def map_gid_to_name(gesture_img_dir: str, gids=None):
     Returns a dictionary mapping the gesture ID to the human-readable gesture name
 
     """
-    with open(gesture_img_dir + "gesture_list.json", "r") as f:
-        gid_to_name: dict = json.load(f)
-    ret = {}
-    gid_to_name["17"] = "Wrist_Down"
-    gid_to_name["18"] = "Wrist_Up"
-    for k, v in gid_to_name.items():
-        if not isinstance(v, str):
-            continue
-        if gids is None or int(k) in gids:
-            ret[int(k)] = v
-    return ret
+    gid_to_name = GestureCatalog.get(gesture_img_dir).gid_to_name
+    return {k: v for k, v in gid_to_name.items() if gids is None or k in gids}
 
 
 def map_cid_to_name(data_dir: str, cids=None):
@@ -82,21 +190,8 @@ def map_cid_to_name(data_dir: str, cids=None):
         - cids: only map these CIDs. If None, map all CIDs
     Returns a dictionary mapping the class index to the human-readable gesture name
     """
-    with open(data_dir + "metadata.json", "r") as f:
-        metadata: dict = json.load(f)
-    class_to_name = {}
-    for val in metadata.values():
-        if not isinstance(val, dict):
-            continue
-        if "class_idx" not in val and "class_name" not in val:
-            continue
-        if cids is None or val["class_idx"] in cids:
-            if val["class_name"] == "OK":
-                val["class_name"] = "Wrist_Down"
-            if val["class_name"] == "Stop":
-                val["class_name"] = "Wrist_Up"
-            class_to_name[val["class_idx"]] = val["class_name"]
-    return class_to_name
+    cid_to_name = GestureCatalog.get(data_dir=data_dir).cid_to_name
+    return {k: v for k, v in cid_to_name.items() if cids is None or k in cids}
 
 
 def map_gid_to_cid(gesture_img_dir: str, data_dir: str, gids=None):
@@ -110,21 +205,7 @@ def map_gid_to_cid(gesture_img_dir: str, data_dir: str, gids=None):
 
     Returns a dictionary mapping the gesture ID to the class ID
     """
-    gid_to_name = map_gid_to_name(gesture_img_dir, gids)
-    name_to_gid = {}
-    for g, n in gid_to_name.items():
-        if not isinstance(n, str):
-            continue
-        name_to_gid[n] = g
-
-    cid_to_name = map_cid_to_name(data_dir)
-    gid_to_cid = {}
-    for c, n in cid_to_name.items():
-        if n not in gid_to_name.values():
-            continue
-        gid_to_cid[name_to_gid[n]] = c
-
-    return gid_to_cid
+    return GestureCatalog.get(gesture_img_dir, data_dir).get_gid_to_cid(gids)
 
 
 def map_cid_to_ordered_name(gesture_img_dir: str, data_dir: str, gids=None):
@@ -165,7 +246,7 @@ def get_cid_from_gid(gesture_img_dir: str, data_dir: str, gestures: list):
         - gids: only map these GIDs. If None, map all GIDs
     Returns a list of class indices
     """
-    return list(map_gid_to_cid(gesture_img_dir, data_dir, gestures).values())
+    return GestureCatalog.get(gesture_img_dir, data_dir).get_cids(gestures)
 
 
 def get_name_from_gid(gestures_img_dir: str, data_dir: str, gestures: list):
@@ -180,10 +261,7 @@ def get_name_from_gid(gestures_img_dir: str, data_dir: str, gestures: list):
     Hand Close
     ...
     """
-    return [
-        map_cid_to_name(data_dir)[i]
-        for i in sorted(get_cid_from_gid(gestures_img_dir, data_dir, gestures))
-    ]
+    return GestureCatalog.get(gestures_img_dir, data_dir).get_names(gestures)
 
 
 def get_filter(
@@ -0,0 +1,147 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from nfc_emg.features import extract_batch
+
+
+class WindowedRecordings:
+    def __init__(
+        self,
+        recordings: list,
+        classes: list,
+        reps: list,
+        window_size: int,
+        window_increment: int,
+    ):
+        """
+        Overlapping windows of a set of recordings, like LibEMG's `OfflineDataHandler.parse_windows`, but as
+        read-only strided views of the recordings instead of a new (N, C, W) array.
+
+        The recordings are not copied, so memory-mapped recordings are only read when their windows are.
+
+        Params:
+            - recordings: list of (N, C) sample arrays, eg memory-mapped binary recordings
+            - classes: class label of each recording
+            - reps: repetition of each recording
+            - window_size: window size in samples
+            - window_increment: window increment in samples
+        """
+        self.window_size = window_size
+        self.window_increment = window_increment
+        self.recordings = recordings
+        self.recording_classes = list(classes)
+        self.recording_reps = list(reps)
+
+        self.views = []
+        """
+        Read-only (n, C, W) window views of each recording
+        """
+        for data in recordings:
+            if len(data) < window_size:
+                view = np.zeros((0, data.shape[1], window_size), dtype=data.dtype)
+            else:
+                view = sliding_window_view(data, window_size, axis=0)[
+                    ::window_increment
+                ]
+            self.views.append(view)
+
+        n_windows = [len(v) for v in self.views]
+        self.offsets = np.concatenate([[0], np.cumsum(n_windows)]).astype(np.int64)
+        """
+        Index of the first window of each recording, and total number of windows
+        """
+        self.labels = np.repeat(np.asarray(classes), n_windows)
+        self.reps = np.repeat(np.asarray(reps), n_windows)
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def isolate_reps(self, reps: list):
+        """
+        Returns the windows of the recordings of repetitions `reps`, like LibEMG's `isolate_data("reps", ...)`
+        """
+        keep = [i for i, r in enumerate(self.recording_reps) if r in reps]
+        return WindowedRecordings(
+            [self.recordings[i] for i in keep],
+            [self.recording_classes[i] for i in keep],
+            [self.recording_reps[i] for i in keep],
+            self.window_size,
+            self.window_increment,
+        )
+
+    @property
+    def shape(self):
+        n_channels = self.views[0].shape[1] if len(self.views) else 0
+        return (len(self), n_channels, self.window_size)
+
+    def chunks(self, chunk_size: int = 2048):
+        """
+        Yield consecutive (n, C, W) window arrays of at most `chunk_size` windows, so that only a chunk of windows is
+        materialized at a time.
+        """
+        chunk = []
+        n_chunk = 0
+        for view in self.views:
+            start = 0
+            while start < len(view):
+                n = min(chunk_size - n_chunk, len(view) - start)
+                chunk.append(view[start : start + n])
+                n_chunk += n
+                start += n
+                if n_chunk == chunk_size:
+                    yield np.concatenate(chunk)
+                    chunk, n_chunk = [], 0
+        if n_chunk > 0:
+            yield np.concatenate(chunk)
+
+    def materialize(self):
+        """
+        Returns every window as a single (N, C, W) array
+        """
+        if len(self) == 0:
+            return np.zeros(self.shape)
+        return np.concatenate(self.views)
+
+
+def from_offline_datahandler(
+    odh, window_size: int, window_increment: int, repetitions: list | None = None
+):
+    """
+    Window the recordings of a LibEMG OfflineDataHandler, see `WindowedRecordings`.
+
+    Params:
+        - repetitions: repetitions the odh was loaded with, to map LibEMG's repetition indices back to repetitions
+    """
+    reps = [r[0, 0] for r in odh.reps]
+    if repetitions is not None:
+        reps = [repetitions[r] for r in reps]
+    return WindowedRecordings(
+        odh.data,
+        [c[0, 0] for c in odh.classes],
+        reps,
+        window_size,
+        window_increment,
+    )
+
+
+def extract_features(
+    features: list,
+    windows: WindowedRecordings,
+    chunk_size: int = 2048,
+    backend: str = "libemg",
+):
+    """
+    Extract features from `windows`, `chunk_size` windows at a time, with `backend`, see `features.extract_batch`.
+
+    Returns the (N, len(features) * C) feature array, in the same layout as LibEMG's `extract_features(..., array=True)`
+    """
+    out = None
+    for i, chunk in enumerate(windows.chunks(chunk_size)):
+        feats = extract_batch(features, chunk, backend=backend)
+        if out is None:
+            out = np.zeros((len(windows), feats.shape[1]), dtype=feats.dtype)
+        start = i * chunk_size
+        out[start : start + len(feats)] = feats
+    if out is None:
+        return np.zeros((0, len(features) * windows.shape[1]))
+    return out
@@ -0,0 +1,104 @@
+import copy
+import time
+import multiprocessing
+from threading import Lock, Thread
+
+import numpy as np
+
+from nfc_emg import models
+from nfc_emg.shared_weights import SharedStateDict
+
+N_FEATURES = 6  # TDPSD
+EMG_SHAPE = (8,)
+N_CLASSES = 8
+N_ADAP = 2000  # samples per adaptation round
+
+
+def make_model():
+    model = models.EmgCNN(N_FEATURES, EMG_SHAPE, N_CLASSES)
+    model.scaler.fit(np.random.randn(100, N_FEATURES * np.prod(EMG_SHAPE)))
+    return model.eval()
+
+
+def make_adap_data():
+    data = np.random.randn(N_ADAP, N_FEATURES * np.prod(EMG_SHAPE))
+    labels = np.eye(N_CLASSES)[np.random.randint(0, N_CLASSES, N_ADAP)]
+    return data, labels.astype(np.float32)
+
+
+def adapt_thread(model_holder: dict, lock: Lock, stop):
+    """
+    Previous behaviour: train in a thread of the classifier's process, then swap a deep copy in.
+    """
+    model_to_adapt = copy.deepcopy(model_holder["model"])
+    data, labels = make_adap_data()
+    while not stop.is_set():
+        model_to_adapt.fit(data, labels)
+        new_model = copy.deepcopy(model_to_adapt)
+        with lock:
+            model_holder["model"] = new_model
+
+
+def adapt_process(weights: SharedStateDict, stop):
+    """
+    Train in a separate process and publish the weights to shared memory.
+    """
+    model_to_adapt = make_model()
+    data, labels = make_adap_data()
+    while not stop.is_set():
+        model_to_adapt.fit(data, labels)
+        weights.publish(model_to_adapt.state_dict())
+
+
+def bench(mode: str, n_preds: int, period: float):
+    """
+    Run the prediction loop while adaptation runs in `mode` ("off", "thread" or "process").
+
+    Returns the per-prediction latencies in seconds
+    """
+    model = make_model()
+    holder = {"model": model}
+    lock = Lock()
+    weights = SharedStateDict(model.state_dict())
+    weights_version = weights.version
+
+    # Like the Game, the adaptation process is spawned rather than forked
+    ctx = multiprocessing.get_context("spawn")
+    stop = ctx.Event()
+    worker = None
+    if mode == "thread":
+        worker = Thread(target=adapt_thread, args=(holder, lock, stop), daemon=True)
+    elif mode == "process":
+        worker = ctx.Process(target=adapt_process, args=(weights, stop), daemon=True)
+    if worker is not None:
+        worker.start()
+        time.sleep(2)
+
+    features = np.random.randn(n_preds, 1, N_FEATURES * np.prod(EMG_SHAPE))
+    latencies = np.zeros(n_preds)
+    for i in range(n_preds):
+        if mode == "process" and weights.version != weights_version:
+            weights_version = weights.load_into(model, weights_version)
+
+        t0 = time.perf_counter()
+        with lock:
+            holder["model"].predict_proba(features[i])
+        latencies[i] = time.perf_counter() - t0
+        time.sleep(period)
+
+    stop.set()
+    if worker is not None:
+        worker.join()
+    weights.unlink()
+    return latencies
+
+
+if __name__ == "__main__":
+    N_PREDS = 2000
+    PERIOD = 0.005
+
+    for mode in ["off", "thread", "process"]:
+        lat = 1000 * bench(mode, N_PREDS, PERIOD)
+        print(
+            f"adaptation {mode:>7} | p50: {np.percentile(lat, 50):.3f} ms | p99: {np.percentile(lat, 99):.3f} ms | max: {np.max(lat):.3f} ms"
+        )
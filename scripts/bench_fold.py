@@ -0,0 +1,67 @@
+import time
+
+import numpy as np
+import torch
+
+from nfc_emg.features import TDPSD
+from nfc_emg.models import EmgCNN, EmgMLP, fold_model
+from nfc_emg.sensors import EmgSensor, EmgSensorType
+
+
+def make_model(model_type: str, sensor: EmgSensor, n_classes: int = 8):
+    """
+    Untrained model with a fitted scaler and non-trivial BatchNorm statistics.
+    """
+    n_features = len(TDPSD) * int(np.prod(sensor.emg_shape))
+    if model_type == "CNN":
+        model = EmgCNN(len(TDPSD), sensor.emg_shape, n_classes)
+    else:
+        model = EmgMLP(n_features, n_classes)
+    model.scaler.fit(3 + 2 * np.random.randn(1024, n_features))
+    for m in model.modules():
+        if isinstance(m, torch.nn.modules.batchnorm._BatchNorm):
+            m.running_mean.normal_()
+            m.running_var.uniform_(0.5, 2)
+            m.weight.data.normal_()
+            m.bias.data.normal_()
+    return model.eval()
+
+
+def latency(model, x: np.ndarray, repeats: int = 1000):
+    """
+    Returns the median `predict_proba` latency in ms
+    """
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        model.predict_proba(x)
+        times.append(time.perf_counter() - t0)
+    return 1000 * np.median(times)
+
+
+if __name__ == "__main__":
+    for sensor_type in [
+        EmgSensorType.BioArmband,
+        EmgSensorType.MyoArmband,
+        EmgSensorType.Emager,
+    ]:
+        sensor = EmgSensor(sensor_type)
+        for model_type in ["CNN", "MLP"]:
+            model = make_model(model_type, sensor)
+            folded = fold_model(model)
+
+            x = 3 + 2 * np.random.randn(1, len(model.scaler.mean_))
+
+            # The live classifier predicts one window at a time
+            t_model = latency(model, x)
+            t_folded = latency(folded, x)
+
+            # Re-folding happens on the classifier thread whenever adapted weights are picked up
+            t0 = time.perf_counter()
+            for _ in range(100):
+                fold_model(model, out=folded)
+            t_refold = 10 * (time.perf_counter() - t0)
+            print(
+                f"{sensor_type.name} {sensor.emg_shape} {model_type}: model {t_model:.3f} ms | "
+                f"folded {t_folded:.3f} ms, speedup {t_model / t_folded:.2f}x | re-fold {t_refold:.3f} ms"
+            )
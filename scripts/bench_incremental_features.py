@@ -0,0 +1,81 @@
+import time
+
+import numpy as np
+
+from libemg.feature_extractor import FeatureExtractor
+
+from nfc_emg.features import IncrementalFeatureExtractor
+from nfc_emg.sensors import EmgSensor, EmgSensorType
+
+
+def check_parity(features: list, sensor: EmgSensor, n_preds: int, rtol=1e-6):
+    """
+    Slide over random data and compare every incremental window against LibEMG.
+
+    Returns the maximum relative error
+    """
+    fe = FeatureExtractor()
+    ife = IncrementalFeatureExtractor(features, sensor.window_size)
+    n_samples = sensor.window_size + n_preds * sensor.window_increment
+    data = np.random.randn(n_samples, np.prod(sensor.emg_shape)) * 1e-4
+
+    max_err = 0
+    for i in range(0, n_samples, sensor.window_increment):
+        ife.update(data[i : i + sensor.window_increment])
+        if ife.n_total < sensor.window_size:
+            continue
+        window = data[ife.n_total - sensor.window_size : ife.n_total].T[np.newaxis]
+        ref = fe.extract_features(features, window, array=True)
+        err = np.max(np.abs(ife.extract() - ref) / (np.abs(ref) + 1e-12))
+        max_err = max(max_err, err)
+    assert max_err < rtol, f"Incremental features mismatch: {max_err}"
+    return max_err
+
+
+def bench(features: list, sensor: EmgSensor, n_preds: int):
+    """
+    Returns the average per-prediction time of LibEMG and of the incremental extractor.
+    """
+    fe = FeatureExtractor()
+    ife = IncrementalFeatureExtractor(features, sensor.window_size)
+    n_samples = sensor.window_size + n_preds * sensor.window_increment
+    data = np.random.randn(n_samples, np.prod(sensor.emg_shape)) * 1e-4
+    ife.update(data[: sensor.window_size])
+
+    t0 = time.perf_counter()
+    for i in range(n_preds):
+        start = i * sensor.window_increment
+        window = data[start : start + sensor.window_size].T[np.newaxis]
+        fe.extract_features(features, window, array=True)
+    t_libemg = (time.perf_counter() - t0) / n_preds
+
+    t0 = time.perf_counter()
+    for i in range(n_preds):
+        start = sensor.window_size + i * sensor.window_increment
+        ife.update(data[start : start + sensor.window_increment])
+        ife.extract()
+    t_inc = (time.perf_counter() - t0) / n_preds
+
+    return t_libemg, t_inc
+
+
+if __name__ == "__main__":
+    N_PREDS = 500
+
+    feature_sets = {
+        "TDPSD": FeatureExtractor().get_feature_groups()["TDPSD"],
+        "MAV": ["MAV"],
+        "TD": ["MAV", "RMS", "WL", "ZC", "SSC"],
+    }
+
+    for sensor_type in EmgSensorType:
+        sensor = EmgSensor(sensor_type, window_size_ms=200, window_inc_ms=50)
+        print(
+            f"===== {sensor_type.name}: window={sensor.window_size}, increment={sensor.window_increment}, {np.prod(sensor.emg_shape)} channels ====="
+        )
+        for name, features in feature_sets.items():
+            err = check_parity(features, sensor, 100)
+            t_libemg, t_inc = bench(features, sensor, N_PREDS)
+            print(
+                f"{name:>6} | max rel err: {err:.1e} | LibEMG: {1000*t_libemg:.3f} ms/pred | incremental: {1000*t_inc:.3f} ms/pred"
+            )
@@ -0,0 +1,62 @@
+import time
+
+import numpy as np
+
+from experiment.memory import Memory
+
+
+def legacy_append(memory: dict, data, targets, context, outcome, timestamp):
+    """
+    Previous `Memory.add_memories` behaviour: every field is re-stacked on each append.
+    """
+    if memory["data"] is None:
+        memory.update(
+            data=data,
+            targets=targets,
+            context=context,
+            outcome=list(outcome),
+            timestamps=list(timestamp),
+        )
+        return
+    memory["data"] = np.vstack((memory["data"], data))
+    memory["targets"] = np.vstack((memory["targets"], targets))
+    memory["context"] = np.vstack((memory["context"], context))
+    memory["outcome"].extend(outcome)
+    memory["timestamps"].extend(timestamp)
+
+
+def bench(n_memories: int, n_features: int, n_classes: int, legacy: bool):
+    """
+    Append `n_memories` single-row memories, the way the MemoryManager does for every Unity context packet.
+
+    Returns the average append time in seconds.
+    """
+    data = np.random.randn(n_memories, 1, n_features)
+    targets = np.eye(n_classes)[np.random.randint(0, n_classes, (n_memories, 1))]
+    context = np.random.randint(-1, n_classes, (n_memories, 1, 3))
+
+    if legacy:
+        memory = {"data": None}
+        t0 = time.perf_counter()
+        for i in range(n_memories):
+            legacy_append(memory, data[i], targets[i], context[i], ["P"], [float(i)])
+    else:
+        memory = Memory()
+        t0 = time.perf_counter()
+        for i in range(n_memories):
+            memory.add_memories(data[i], targets[i], context[i], ["P"], [float(i)])
+    return (time.perf_counter() - t0) / n_memories
+
+
+if __name__ == "__main__":
+    N_FEATURES = 6 * 8  # TDPSD, BioArmband
+    N_CLASSES = 8
+    LEGACY_MAX = 20_000  # Quadratic, too slow past this
+
+    for n in [10_000, 100_000]:
+        t_new = bench(n, N_FEATURES, N_CLASSES, False)
+        msg = f"{n:>7} memories | columnar: {1e6*t_new:.2f} us/append"
+        if n <= LEGACY_MAX:
+            t_legacy = bench(n, N_FEATURES, N_CLASSES, True)
+            msg += f" | vstack: {1e6*t_legacy:.2f} us/append"
+        print(msg)
@@ -0,0 +1,100 @@
+import copy
+import time
+from threading import Event, Lock, Thread
+
+import numpy as np
+
+from nfc_emg import models
+from nfc_emg.model_slots import ModelSlots
+
+N_FEATURES = 6  # TDPSD
+EMG_SHAPE = (8,)
+N_CLASSES = 8
+
+
+def make_model():
+    model = models.EmgCNN(N_FEATURES, EMG_SHAPE, N_CLASSES)
+    model.scaler.fit(np.random.randn(100, N_FEATURES * np.prod(EMG_SHAPE)))
+    return model.eval()
+
+
+def publish_locked(holder: dict, lock: Lock, stop: Event, period: float, swap_times):
+    """
+    Previous behaviour: deep copy the adapted model, then swap it in under the model lock.
+    """
+    model_to_adapt = copy.deepcopy(holder["model"])
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        new_model = copy.deepcopy(model_to_adapt)
+        with lock:
+            holder["model"] = new_model
+        swap_times.append(time.perf_counter() - t0)
+        time.sleep(period)
+
+
+def publish_slots(slots: ModelSlots, stop: Event, period: float, swap_times):
+    """
+    Load the adapted weights into the standby slot, then swap it in.
+    """
+    model_to_adapt = make_model()
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        slots.publish(model_to_adapt.state_dict())
+        swap_times.append(time.perf_counter() - t0)
+        time.sleep(period)
+
+
+def bench(mode: str, n_preds: int, publish_period: float):
+    """
+    Predict `n_preds` times back to back while another thread publishes new weights every `publish_period` seconds.
+
+    Returns the per-prediction latencies and the per-publish times in seconds
+    """
+    model = make_model()
+    holder = {"model": model}
+    lock = Lock()
+    slots = ModelSlots(model)
+
+    stop = Event()
+    swap_times = []
+    if mode == "lock":
+        worker = Thread(
+            target=publish_locked,
+            args=(holder, lock, stop, publish_period, swap_times),
+            daemon=True,
+        )
+    else:
+        worker = Thread(
+            target=publish_slots,
+            args=(slots, stop, publish_period, swap_times),
+            daemon=True,
+        )
+    worker.start()
+
+    features = np.random.randn(n_preds, 1, N_FEATURES * np.prod(EMG_SHAPE))
+    latencies = np.zeros(n_preds)
+    for i in range(n_preds):
+        t0 = time.perf_counter()
+        if mode == "lock":
+            with lock:
+                holder["model"].predict_proba(features[i])
+        else:
+            with slots.use() as m:
+                m.predict_proba(features[i])
+        latencies[i] = time.perf_counter() - t0
+
+    stop.set()
+    worker.join()
+    return latencies, np.array(swap_times)
+
+
+if __name__ == "__main__":
+    N_PREDS = 5000
+
+    for period in [0.1, 0.01, 0.0]:
+        for mode in ["lock", "slots"]:
+            lat, swaps = bench(mode, N_PREDS, period)
+            lat, swaps = 1000 * lat, 1000 * swaps
+            print(
+                f"publish every {1000*period:>5.0f} ms | {mode:>5} | pred p50: {np.percentile(lat, 50):.3f} ms | pred p99: {np.percentile(lat, 99):.3f} ms | publish avg: {np.mean(swaps):.3f} ms ({len(swaps)} publishes)"
+            )
@@ -0,0 +1,60 @@
+import os
+import time
+
+import numpy as np
+
+from nfc_emg import windowing, parallel_features
+from nfc_emg.features import FEATURE_BACKENDS
+from nfc_emg.sensors import EmgSensor, EmgSensorType
+
+import configs as g
+
+
+def make_windows(sensor: EmgSensor, n_recordings: int, rep_time: float):
+    """
+    Synthetic dataset of `n_recordings` recordings of `rep_time` seconds.
+    """
+    n_samples = int(rep_time * sensor.fs)
+    data = [
+        np.random.randn(n_samples, np.prod(sensor.emg_shape)).astype(np.float32)
+        for _ in range(n_recordings)
+    ]
+    return windowing.WindowedRecordings(
+        data,
+        [i % 8 for i in range(n_recordings)],
+        [i // 8 for i in range(n_recordings)],
+        sensor.window_size,
+        sensor.window_increment,
+    )
+
+
+if __name__ == "__main__":
+    N_RECORDINGS, REP_TIME = 9 * 5 * 8, 3  # 9 subjects, 5 reps, 8 classes
+
+    n_workers = [1]
+    while n_workers[-1] * 2 <= os.cpu_count():
+        n_workers.append(n_workers[-1] * 2)
+    if n_workers[-1] != os.cpu_count():
+        n_workers.append(os.cpu_count())
+
+    for sensor_type in [EmgSensorType.BioArmband, EmgSensorType.Emager]:
+        sensor = EmgSensor(sensor_type, window_size_ms=200, window_inc_ms=50)
+        windows = make_windows(sensor, N_RECORDINGS, REP_TIME)
+        print(f"===== {sensor_type.name}: {len(windows)} windows =====")
+
+        for backend in FEATURE_BACKENDS:
+            t0 = time.perf_counter()
+            ref = windowing.extract_features(g.FEATURES, windows, backend=backend)
+            t_serial = time.perf_counter() - t0
+            print(f"[{backend}] serial: {len(windows) / t_serial:.0f} windows/s")
+
+            for n in n_workers:
+                t0 = time.perf_counter()
+                feats = parallel_features.extract_features(
+                    g.FEATURES, windows, n, backend=backend
+                )
+                dt = time.perf_counter() - t0
+                assert np.array_equal(feats, ref), "Parallel features differ from serial"
+                print(
+                    f"[{backend}] {n:>3} workers: {len(windows) / dt:.0f} windows/s, speedup {t_serial / dt:.2f}x"
+                )
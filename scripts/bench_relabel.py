@@ -0,0 +1,70 @@
+import time
+
+import numpy as np
+from sklearn.semi_supervised import LabelSpreading
+
+from nfc_emg.relabel import IncrementalLabelSpreading
+
+
+def make_replay(n_rounds: int, n_per_round: int, n_classes: int, n_features: int):
+    """
+    Simulate adaptation rounds: clustered features, 70% within-context (P) samples with 10% label noise, the rest unlabeled (N).
+
+    Returns a list of (features, labels, true labels) per round
+    """
+    centers = np.random.randn(n_classes, n_features) * 0.2
+    rounds = []
+    for _ in range(n_rounds):
+        true = np.random.randint(0, n_classes, n_per_round)
+        feats = centers[true] + np.random.randn(n_per_round, n_features) * 0.1
+        labels = true.copy()
+        noisy = np.random.rand(n_per_round) < 0.1
+        labels[noisy] = np.random.randint(0, n_classes, np.count_nonzero(noisy))
+        labels[np.random.rand(n_per_round) > 0.7] = -1
+        rounds.append((feats, labels, true))
+    return rounds
+
+
+def replay(rounds: list, n_classes: int, max_anchors: int):
+    """
+    Run every round through sklearn's LabelSpreading (as adapt_manager did) and the incremental relabeler.
+    Both are given the same bounded anchor set, which is extended with the labeled samples of each round.
+    """
+    anchors = np.zeros((0, rounds[0][0].shape[1]))
+    anchor_labels = np.zeros(0, dtype=int)
+    anchor_ids = np.zeros(0, dtype=int)
+    next_id = 0
+
+    ils = IncrementalLabelSpreading(n_classes, n_neighbors=50, alpha=0.2)
+    for i, (feats, labels, true) in enumerate(rounds):
+        t0 = time.perf_counter()
+        ls = LabelSpreading(kernel="rbf", alpha=0.2)
+        ls.fit(np.vstack((anchors, feats)), np.append(anchor_labels, labels))
+        ref = ls.transduction_[len(anchors) :]
+        t_ls = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        if len(anchors) > 0:
+            ils.set_anchors(anchor_ids, anchors, anchor_labels)
+        out = ils.fit_predict(feats, labels)
+        t_ils = time.perf_counter() - t0
+
+        print(
+            f"round {i:>2} | anchors {len(anchors):>5} | LabelSpreading: {t_ls:6.3f} s, acc {np.mean(ref == true)*100:5.1f}% | incremental: {t_ils:6.3f} s, acc {np.mean(out == true)*100:5.1f}%, {ils.timings[-1]['n_iter']} iters | agreement {np.mean(out == ref)*100:5.1f}%"
+        )
+
+        p = labels >= 0
+        anchors = np.vstack((anchors, feats[p]))[-max_anchors:]
+        anchor_labels = np.append(anchor_labels, labels[p])[-max_anchors:]
+        anchor_ids = np.append(anchor_ids, next_id + np.arange(np.count_nonzero(p)))
+        anchor_ids = anchor_ids[-max_anchors:]
+        next_id += np.count_nonzero(p)
+
+
+if __name__ == "__main__":
+    N_CLASSES = 8
+    N_FEATURES = 6 * 8  # TDPSD, BioArmband
+
+    np.random.seed(310)
+    rounds = make_replay(15, 400, N_CLASSES, N_FEATURES)
+    replay(rounds, N_CLASSES, 5000)
@@ -0,0 +1,56 @@
+import time
+
+import numpy as np
+
+from nfc_emg import utils
+from nfc_emg.filtering import StreamingFilter
+from nfc_emg.sensors import EmgSensor, EmgSensorType
+
+
+def bench_whole_buffer(sensor: EmgSensor, buffer_len: int, n_preds: int):
+    """
+    Previous online path: re-filter the whole raw buffer on every prediction.
+    """
+    fi = utils.get_filter(sensor.fs, sensor.bandpass_freqs, sensor.notch_freq)
+    data = np.random.randn(buffer_len, np.prod(sensor.emg_shape))
+
+    t0 = time.perf_counter()
+    for _ in range(n_preds):
+        filtered = fi.filter(data)
+        filtered[-sensor.window_size :].T[np.newaxis]
+    return (time.perf_counter() - t0) / n_preds
+
+
+def bench_streaming(sensor: EmgSensor, buffer_len: int, n_preds: int):
+    """
+    Streaming path: only filter the new `window_increment` samples of each prediction.
+    """
+    fi = utils.get_filter(sensor.fs, sensor.bandpass_freqs, sensor.notch_freq)
+    sf = StreamingFilter(fi, buffer_len)
+    sf.process(np.random.randn(buffer_len, np.prod(sensor.emg_shape)))
+    new_data = np.random.randn(
+        n_preds, sensor.window_increment, np.prod(sensor.emg_shape)
+    )
+
+    t0 = time.perf_counter()
+    for i in range(n_preds):
+        sf.process(new_data[i])
+        sf.get_latest(sensor.window_size).T[np.newaxis]
+    return (time.perf_counter() - t0) / n_preds
+
+
+if __name__ == "__main__":
+    N_PREDS = 200
+
+    for sensor_type in [EmgSensorType.BioArmband, EmgSensorType.Emager]:
+        sensor = EmgSensor(sensor_type, window_size_ms=200, window_inc_ms=50)
+        print(
+            f"===== {sensor_type.name}: fs={sensor.fs}, {np.prod(sensor.emg_shape)} channels ====="
+        )
+        for mult in [1, 5, 25, 100]:
+            buffer_len = mult * sensor.window_size
+            t_whole = bench_whole_buffer(sensor, buffer_len, N_PREDS)
+            t_stream = bench_streaming(sensor, buffer_len, N_PREDS)
+            print(
+                f"buffer={buffer_len:>6} samples | whole buffer: {1000*t_whole:8.3f} ms/pred | streaming: {1000*t_stream:8.3f} ms/pred"
+            )
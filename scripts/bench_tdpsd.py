@@ -0,0 +1,53 @@
+import time
+
+import numpy as np
+
+from libemg.feature_extractor import FeatureExtractor
+
+from nfc_emg.features import TDPSD, extract_tdpsd
+from nfc_emg.sensors import EmgSensor, EmgSensorType
+
+
+def make_windows(sensor: EmgSensor, n_windows: int, scale: float):
+    """
+    Synthetic (N, C, W) windows of `sensor`, with amplitude `scale`.
+    """
+    n_channels = np.prod(sensor.emg_shape)
+    return scale * np.random.randn(n_windows, n_channels, sensor.window_size)
+
+
+def bench(sensor: EmgSensor, n_windows: int, repeats: int = 5):
+    """
+    Returns the (LibEMG, NumPy) throughputs in windows/s
+    """
+    windows = make_windows(sensor, n_windows, 1.0)
+    windows32 = windows.astype(np.float32)
+    fe = FeatureExtractor()
+
+    t_libemg, t_numpy = [], []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fe.extract_features(TDPSD, windows, array=True)
+        t_libemg.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        extract_tdpsd(windows32)
+        t_numpy.append(time.perf_counter() - t0)
+    return n_windows / min(t_libemg), n_windows / min(t_numpy)
+
+
+if __name__ == "__main__":
+    N_WINDOWS = 4096
+
+    for sensor_type in [
+        EmgSensorType.BioArmband,
+        EmgSensorType.MyoArmband,
+        EmgSensorType.Emager,
+    ]:
+        sensor = EmgSensor(sensor_type, window_size_ms=200, window_inc_ms=50)
+        libemg_rate, numpy_rate = bench(sensor, N_WINDOWS)
+        print(
+            f"{sensor_type.name} {sensor.emg_shape} x {sensor.window_size}: "
+            f"LibEMG {libemg_rate:.0f} windows/s | NumPy {numpy_rate:.0f} windows/s, "
+            f"speedup {numpy_rate / libemg_rate:.2f}x"
+        )
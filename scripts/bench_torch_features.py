@@ -0,0 +1,55 @@
+import time
+
+import numpy as np
+
+from nfc_emg.features import TDPSD, extract_batch
+from nfc_emg.models import EmgCNN, EmgWindowModel
+from nfc_emg.sensors import EmgSensor, EmgSensorType
+
+
+def make_windows(sensor: EmgSensor, n_windows: int, scale: float):
+    """
+    Synthetic (N, C, W) windows of `sensor`, with amplitude `scale`.
+    """
+    n_channels = np.prod(sensor.emg_shape)
+    return scale * np.random.randn(n_windows, n_channels, sensor.window_size)
+
+
+def bench(sensor: EmgSensor, n_windows: int, repeats: int = 5):
+    """
+    Time window-to-probabilities with NumPy features then `EmgCNN.predict_proba`, and with `EmgWindowModel`.
+
+    Returns the (NumPy + model, torch) throughputs in windows/s
+    """
+    windows = make_windows(sensor, n_windows, 1.0)
+    model = EmgCNN(len(TDPSD), sensor.emg_shape, 8).eval()
+    model.scaler.fit(extract_batch(TDPSD, windows, backend="numpy"))
+    window_model = EmgWindowModel(model, TDPSD).eval()
+
+    t_numpy, t_torch = [], []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        model.predict_proba(extract_batch(TDPSD, windows, backend="numpy"))
+        t_numpy.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        window_model.predict_proba(windows)
+        t_torch.append(time.perf_counter() - t0)
+    return n_windows / min(t_numpy), n_windows / min(t_torch)
+
+
+if __name__ == "__main__":
+    N_WINDOWS = 4096
+
+    for sensor_type in [
+        EmgSensorType.BioArmband,
+        EmgSensorType.MyoArmband,
+        EmgSensorType.Emager,
+    ]:
+        sensor = EmgSensor(sensor_type, window_size_ms=200, window_inc_ms=50)
+        numpy_rate, torch_rate = bench(sensor, N_WINDOWS)
+        print(
+            f"{sensor_type.name} {sensor.emg_shape} x {sensor.window_size}: "
+            f"NumPy + model {numpy_rate:.0f} windows/s | torch {torch_rate:.0f} windows/s, "
+            f"speedup {torch_rate / numpy_rate:.2f}x"
+        )
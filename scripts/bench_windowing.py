@@ -0,0 +1,99 @@
+import os
+import time
+import shutil
+import resource
+import tempfile
+import multiprocessing
+
+import numpy as np
+
+from libemg.feature_extractor import FeatureExtractor
+
+from nfc_emg import recordings, windowing
+from nfc_emg.sensors import EmgSensor, EmgSensorType
+
+import configs as g
+
+
+def make_dataset(sensor: EmgSensor, n_reps: int, n_classes: int, rep_time: float):
+    """
+    Write a synthetic subject as float32 binary recordings.
+
+    Returns the data directory
+    """
+    data_dir = tempfile.mkdtemp() + "/"
+    n_channels = np.prod(sensor.emg_shape)
+    n_samples = int(rep_time * sensor.fs)
+    files = []
+    for r in range(n_reps):
+        for c in range(n_classes):
+            name = recordings.get_recording_name(r, c)
+            data = np.random.randn(n_samples, n_channels)
+            recordings.write_recording(data_dir + name, data, sensor.fs, c, r)
+            files.append(
+                {
+                    "file": name,
+                    "class": c,
+                    "rep": r,
+                    "n_samples": n_samples,
+                    "n_channels": int(n_channels),
+                    "fs": sensor.fs,
+                    "dtype": "float32",
+                    "source_mtime": 0,
+                }
+            )
+    recordings.write_index(data_dir, files)
+    return data_dir
+
+
+def _bench_worker(data_dir, sensor, classes, reps, views, results):
+    # ru_maxrss is in KB on Linux
+    rss_start = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    t0 = time.perf_counter()
+    if views:
+        windows = recordings.get_windows(data_dir, classes, reps, sensor)
+        windowing.extract_features(g.FEATURES, windows)
+    else:
+        windows, _ = recordings.prepare_data(data_dir, classes, reps, sensor)
+        FeatureExtractor().extract_features(g.FEATURES, windows, array=True)
+    dt = time.perf_counter() - t0
+    rss_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put((dt, (rss_peak - rss_start) / 1e3))
+
+
+def bench(data_dir: str, sensor: EmgSensor, classes: list, reps: list, views: bool):
+    """
+    Window a dataset and extract TDPSD features, either from materialized windows or from chunked window views.
+
+    Each run is in a fresh process, so that its peak RSS, which includes the memory-mapped recordings, is not hidden
+    by a previous run.
+
+    Returns (time in s, peak RSS growth in MB)
+    """
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    p = ctx.Process(
+        target=_bench_worker, args=(data_dir, sensor, classes, reps, views, results)
+    )
+    p.start()
+    ret = results.get()
+    p.join()
+    return ret
+
+
+if __name__ == "__main__":
+    N_REPS, N_CLASSES, REP_TIME = 5, 8, 10
+
+    for sensor_type in [EmgSensorType.BioArmband, EmgSensorType.Emager]:
+        sensor = EmgSensor(sensor_type, window_size_ms=200, window_inc_ms=50)
+        data_dir = make_dataset(sensor, N_REPS, N_CLASSES, REP_TIME)
+        classes, reps = list(range(N_CLASSES)), list(range(N_REPS))
+        raw_mb = sum(os.path.getsize(data_dir + f) for f in os.listdir(data_dir)) / 1e6
+
+        t_mat, peak_mat = bench(data_dir, sensor, classes, reps, False)
+        t_view, peak_view = bench(data_dir, sensor, classes, reps, True)
+        print(
+            f"{sensor_type.name}: raw {raw_mb:.1f} MB | materialized: {t_mat:.2f} s, peak RSS +{peak_mat:.1f} MB "
+            f"| views: {t_view:.2f} s, peak RSS +{peak_view:.1f} MB"
+        )
+        shutil.rmtree(data_dir)
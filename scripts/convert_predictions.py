@@ -0,0 +1,67 @@
+import os
+import time
+import tempfile
+
+import numpy as np
+
+from nfc_emg import predlog
+from nfc_emg.sensors import EmgSensor
+
+import configs as g
+
+
+def convert_tree(base: str, n_channels: int):
+    """
+    Convert every `live_preds.csv` found under `base` to a binary `live_preds.bin` prediction log, next to it.
+    """
+    for root, _, files in os.walk(base):
+        if "live_preds.csv" not in files or "live_preds.bin" in files:
+            continue
+        csv_path = os.path.join(root, "live_preds.csv")
+        log_path = os.path.join(root, "live_preds.bin")
+
+        t0 = time.perf_counter()
+        n = predlog.convert_csv(csv_path, log_path, n_channels)
+        print(
+            f"{csv_path}: converted {n} predictions in {time.perf_counter() - t0:.2f} s"
+        )
+
+
+def bench_load(n_preds: int, sensor: EmgSensor, tmp_dir=tempfile.gettempdir()):
+    """
+    Compare loading a CSV predictions file with `np.loadtxt` vs memory-mapping the equivalent prediction log.
+    """
+    n_channels = np.prod(sensor.emg_shape)
+    csv_path = os.path.join(tmp_dir, "bench_preds.csv")
+    log_path = os.path.join(tmp_dir, "bench_preds.bin")
+
+    arr = np.random.randn(n_preds, 2 + n_channels * sensor.window_size)
+    arr[:, 0] = np.arange(n_preds) * 0.05
+    np.savetxt(csv_path, arr, delimiter=",", fmt="%.4f")
+
+    t0 = time.perf_counter()
+    np.loadtxt(csv_path, delimiter=",")
+    t_csv = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    predlog.convert_csv(csv_path, log_path, n_channels)
+    t_convert = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    windows = predlog.PredictionLog(log_path).windows
+    windows.sum()
+    t_log = time.perf_counter() - t0
+
+    os.remove(csv_path)
+    os.remove(log_path)
+    return t_csv, t_convert, t_log
+
+
+if __name__ == "__main__":
+    convert_tree("data/", np.prod(EmgSensor(g.SENSOR).emg_shape))
+
+    sensor = EmgSensor(g.SENSOR, window_size_ms=200, window_inc_ms=50)
+    t_csv, t_convert, t_log = bench_load(2000, sensor)
+    print(
+        f"2000 predictions | np.loadtxt: {t_csv:.2f} s | conversion: {t_convert:.2f} s | memmap + full read: {t_log:.3f} s"
+    )
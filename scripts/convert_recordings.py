@@ -0,0 +1,88 @@
+import os
+import time
+import tempfile
+
+import numpy as np
+
+from nfc_emg import datasets, recordings
+from nfc_emg.sensors import EmgSensor
+
+import configs as g
+
+
+def convert_tree(base: str, fs: float, dtype: str = "float32"):
+    """
+    Convert every directory of `R_<REP>_C_<ID>_EMG.csv` recordings found under `base` to binary recordings, next to them.
+    """
+    for root, _, files in os.walk(base):
+        if not any(recordings.CSV_PATTERN.fullmatch(f) for f in files):
+            continue
+        t0 = time.perf_counter()
+        n = recordings.convert_csv_dir(root, fs, dtype)
+        print(f"{root}: converted {n} recordings in {time.perf_counter() - t0:.2f} s")
+
+
+def sort_windows(windows: np.ndarray, labels: np.ndarray):
+    """
+    Sort windows (and their labels) by content, so that datasets loaded in a different recording order can be compared.
+    """
+    order = np.lexsort(windows.reshape(len(windows), -1).T[::-1])
+    return windows[order], labels[order]
+
+
+def bench_load(
+    sensor: EmgSensor,
+    n_reps: int,
+    n_classes: int,
+    rep_time: float,
+    tmp_dir=tempfile.gettempdir(),
+):
+    """
+    Compare loading and windowing a directory of CSV recordings with LibEMG vs the equivalent binary recordings,
+    checking that both give the same windows and labels.
+
+    Returns (CSV load time, float32 load time, int16 load time) in s
+    """
+    data_dir = tempfile.mkdtemp(dir=tmp_dir) + "/"
+    n_channels = np.prod(sensor.emg_shape)
+    n_samples = int(rep_time * sensor.fs)
+    for r in range(n_reps):
+        for c in range(n_classes):
+            data = np.random.randint(-1000, 1000, (n_samples, n_channels))
+            np.savetxt(f"{data_dir}R_{r}_C_{c}_EMG.csv", data, delimiter=",", fmt="%d")
+    classes, reps = list(range(n_classes)), list(range(n_reps))
+
+    t0 = time.perf_counter()
+    odh = datasets.get_offline_datahandler(data_dir, classes, reps)
+    csv_windows, csv_labels = datasets.prepare_data(odh, sensor)
+    t_csv = time.perf_counter() - t0
+    csv_windows, csv_labels = sort_windows(csv_windows, csv_labels)
+
+    times = []
+    for dtype in ["float32", "int16"]:
+        recordings.convert_csv_dir(data_dir, sensor.fs, dtype)
+        t0 = time.perf_counter()
+        windows, labels = recordings.prepare_data(data_dir, classes, reps, sensor)
+        times.append(time.perf_counter() - t0)
+
+        # The samples are integers, which both dtypes store losslessly
+        windows, labels = sort_windows(windows, labels)
+        assert windows.shape == csv_windows.shape
+        assert np.array_equal(windows, csv_windows), f"{dtype} windows differ"
+        assert np.array_equal(labels, csv_labels), f"{dtype} labels differ"
+
+    for f in os.listdir(data_dir):
+        os.remove(data_dir + f)
+    os.rmdir(data_dir)
+    return t_csv, *times
+
+
+if __name__ == "__main__":
+    sensor = EmgSensor(g.SENSOR, window_size_ms=200, window_inc_ms=50)
+    convert_tree("data/", sensor.fs)
+
+    t_csv, t_f32, t_i16 = bench_load(sensor, n_reps=5, n_classes=8, rep_time=3)
+    print(
+        f"5 reps x 8 classes | LibEMG CSV: {t_csv:.2f} s | float32: {t_f32:.3f} s ({t_csv / t_f32:.1f}x) "
+        f"| int16: {t_i16:.3f} s ({t_csv / t_i16:.1f}x)"
+    )
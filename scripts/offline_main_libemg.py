@@ -38,8 +38,9 @@ def __main():
     # elif paths.trial == paths.get_next_trial():
     #     paths.set_trial(paths.trial - 1)
 
-    gestures_cids = utils.get_cid_from_gid(paths.gestures, train_dir, GESTURE_IDS)
-    idle_id = utils.map_gid_to_cid(paths.gestures, train_dir)[1]
+    catalog = utils.GestureCatalog.get(paths.gestures, train_dir)
+    gestures_cids = catalog.get_cids(GESTURE_IDS)
+    idle_id = catalog.gid_to_cid[1]
     reps = utils.get_reps(train_dir)
 
     train_odh = datasets.get_offline_datahandler(train_dir, gestures_cids, reps)
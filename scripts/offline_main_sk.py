@@ -7,7 +7,6 @@ from sklearn.discriminant_analysis import LinearDiscriminantAnalysis
 from sklearn.neural_network import MLPClassifier
 
 from libemg.emg_classifier import EMGClassifier
-from libemg.feature_extractor import FeatureExtractor
 from libemg.offline_metrics import OfflineMetrics
 
 from nfc_emg import utils, datasets
@@ -32,23 +31,20 @@ def __main():
     train_dir = paths.get_train()
     test_dir = paths.get_test()
 
-    classes = utils.get_cid_from_gid(paths.gestures, train_dir, g.FUNCTIONAL_SET)
-    idle_cid = utils.map_gid_to_cid(paths.gestures, train_dir)[1]
+    catalog = utils.GestureCatalog.get(paths.gestures, train_dir)
+    classes = catalog.get_cids(g.FUNCTIONAL_SET)
+    idle_cid = catalog.gid_to_cid[1]
 
     scaler = StandardScaler()
 
-    train_odh = datasets.get_offline_datahandler(
-        train_dir, classes, utils.get_reps(train_dir)
+    train_data, train_labels, _ = datasets.get_features(
+        train_dir, classes, utils.get_reps(train_dir), sensor, g.FEATURES
     )
-    train_win, train_labels = datasets.prepare_data(train_odh, sensor)
-    train_data = FeatureExtractor().extract_features(g.FEATURES, train_win, array=True)
     train_data = scaler.fit_transform(train_data)
 
-    test_odh = datasets.get_offline_datahandler(
-        test_dir, classes, utils.get_reps(test_dir)
+    test_data, test_labels, _ = datasets.get_features(
+        test_dir, classes, utils.get_reps(test_dir), sensor, g.FEATURES
     )
-    test_win, test_labels = datasets.prepare_data(test_odh, sensor)
-    test_data = FeatureExtractor().extract_features(g.FEATURES, test_win, array=True)
     test_data = scaler.transform(test_data)
 
     # model = LinearDiscriminantAnalysis()
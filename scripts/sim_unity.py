@@ -29,6 +29,9 @@ if __name__ == "__main__":
 
                     pred = int(classification[0])
                     timestamp = classification[1]
+                    # Echo the sequence id back, like the Unity game does
+                    if len(classification) > 2:
+                        timestamp += f" #{classification[2]}"
 
                     if pred == -1:
                         # Rejected
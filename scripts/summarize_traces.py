@@ -0,0 +1,48 @@
+import os
+import time
+import tempfile
+
+from nfc_emg import tracing
+
+
+def summarize_tree(base: str):
+    """
+    Print the per-stage latency summary of every Game stage found under `base` with trace files.
+    """
+    for root, _, files in os.walk(base):
+        if not any(f.startswith("live_trace_") and f.endswith(".bin") for f in files):
+            continue
+        records = tracing.load_traces(os.path.join(root, "live_trace_*.bin"))
+        print(f"{root}: {len(records)} trace records")
+        for stage, stats in tracing.summarize(records).items():
+            print(
+                f"    {stage:>18} | n: {stats['n']:>6} | p50: {stats['p50']:8.3f} ms | p95: {stats['p95']:8.3f} ms | p99: {stats['p99']:8.3f} ms"
+            )
+
+
+def bench_overhead(n_records: int, tmp_dir=tempfile.gettempdir()):
+    """
+    Measure the cost of `Tracer.record`, enabled and disabled.
+
+    Returns the average time per record in seconds, (enabled, disabled)
+    """
+    path = os.path.join(tmp_dir, "bench_trace.bin")
+    times = []
+    for p in [path, None]:
+        tracer = tracing.Tracer(p)
+        t0 = time.perf_counter()
+        for i in range(n_records):
+            tracer.record(i, tracing.TraceStage.PREDICTED)
+        times.append((time.perf_counter() - t0) / n_records)
+        tracer.close()
+    os.remove(path)
+    return times
+
+
+if __name__ == "__main__":
+    summarize_tree("data/")
+
+    t_on, t_off = bench_overhead(100_000)
+    print(
+        f"Tracer.record overhead | enabled: {1e6*t_on:.2f} us | disabled: {1e6*t_off:.3f} us"
+    )
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from libemg.feature_extractor import FeatureExtractor
+
+from nfc_emg.features import TDPSD, extract_batch, extract_tdpsd
+from nfc_emg.sensors import EmgSensor, EmgSensorType
+
+SENSORS = [EmgSensorType.BioArmband, EmgSensorType.MyoArmband, EmgSensorType.Emager]
+# From raw ADC counts to volts
+SCALES = [1e3, 1.0, 1e-3, 1e-5]
+
+
+def make_windows(sensor_type: EmgSensorType, scale: float, n_windows: int = 128):
+    sensor = EmgSensor(sensor_type, window_size_ms=200, window_inc_ms=50)
+    n_channels = np.prod(sensor.emg_shape)
+    rng = np.random.default_rng(0)
+    return scale * rng.standard_normal((n_windows, n_channels, sensor.window_size))
+
+
+@pytest.mark.parametrize("sensor_type", SENSORS)
+@pytest.mark.parametrize("scale", SCALES)
+@pytest.mark.parametrize("features", [TDPSD] + [[f] for f in TDPSD])
+def test_tdpsd_matches_libemg(sensor_type, scale, features):
+    windows = make_windows(sensor_type, scale)
+    ref = FeatureExtractor().extract_features(features, windows, array=True)
+    feats = extract_tdpsd(windows, features)
+    assert feats.shape == ref.shape
+    np.testing.assert_allclose(feats, ref, rtol=1e-4, atol=1e-4)
+
+
+def test_tdpsd_float32_input():
+    windows = make_windows(EmgSensorType.BioArmband, 1.0)
+    np.testing.assert_array_equal(
+        extract_tdpsd(windows), extract_tdpsd(windows.astype(np.float32))
+    )
+
+
+def test_tdpsd_rejects_other_features():
+    with pytest.raises(ValueError):
+        extract_tdpsd(make_windows(EmgSensorType.MyoArmband, 1.0), ["MAV"])
+
+
+@pytest.mark.parametrize("sensor_type", SENSORS)
+def test_extract_batch_backends(sensor_type):
+    windows = make_windows(sensor_type, 1.0)
+    np.testing.assert_array_equal(
+        extract_batch(TDPSD, windows, backend="numpy"), extract_tdpsd(windows)
+    )
+    # Features which are not TDPSD fall back to LibEMG
+    for backend in ["libemg", "numpy"]:
+        np.testing.assert_array_equal(
+            extract_batch(["MAV", "WL"], windows, backend=backend),
+            FeatureExtractor().extract_features(["MAV", "WL"], windows, array=True),
+        )
+
+
+def test_extract_batch_unknown_backend():
+    with pytest.raises(ValueError):
+        extract_batch(TDPSD, make_windows(EmgSensorType.MyoArmband, 1.0), backend="x")
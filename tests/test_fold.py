@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+import torch
+
+from nfc_emg.features import TDPSD
+from nfc_emg.model_slots import ModelSlots
+from nfc_emg.models import EmgCNN, EmgMLP, fold_model
+from nfc_emg.sensors import EmgSensor, EmgSensorType
+
+SENSORS = [EmgSensorType.BioArmband, EmgSensorType.MyoArmband, EmgSensorType.Emager]
+
+
+def randomize(model: EmgCNN | EmgMLP):
+    """
+    Give the BatchNorm layers non-trivial statistics and affine parameters, like a trained model.
+    """
+    with torch.no_grad():
+        for m in model.modules():
+            if isinstance(m, torch.nn.modules.batchnorm._BatchNorm):
+                m.running_mean.normal_()
+                m.running_var.uniform_(0.5, 2)
+                m.weight.normal_()
+                m.bias.normal_()
+    return model
+
+
+def make_model(model_type: str, sensor_type: EmgSensorType):
+    torch.manual_seed(0)
+    emg_shape = EmgSensor(sensor_type).emg_shape
+    n_features = len(TDPSD) * int(np.prod(emg_shape))
+    if model_type == "CNN":
+        model = EmgCNN(len(TDPSD), emg_shape, 8)
+    else:
+        model = EmgMLP(n_features, 8)
+    rng = np.random.default_rng(0)
+    model.scaler.fit(3 + 2 * rng.standard_normal((1024, n_features)))
+    x = 3 + 2 * rng.standard_normal((256, n_features))
+    return randomize(model).eval(), x
+
+
+@pytest.mark.parametrize("sensor_type", SENSORS)
+@pytest.mark.parametrize("model_type", ["CNN", "MLP"])
+def test_folded_matches_model(sensor_type, model_type):
+    model, x = make_model(model_type, sensor_type)
+    folded = fold_model(model)
+    assert not any(
+        isinstance(m, (torch.nn.Dropout, torch.nn.modules.batchnorm._BatchNorm))
+        for m in folded.modules()
+    )
+    np.testing.assert_allclose(
+        folded.predict_proba(x), model.predict_proba(x), atol=1e-5
+    )
+    # MLPs fold the scaler into their first layer, CNNs keep it as an input transform
+    assert (folded.in_scale is None) == (model_type == "MLP")
+
+
+@pytest.mark.parametrize("model_type", ["CNN", "MLP"])
+def test_refold_in_place(model_type):
+    model, x = make_model(model_type, EmgSensorType.Emager)
+    folded = fold_model(model)
+    ptrs = [t.data_ptr() for t in [*folded.parameters(), *folded.buffers()]]
+
+    randomize(model)
+    assert fold_model(model, out=folded) is folded
+    assert ptrs == [t.data_ptr() for t in [*folded.parameters(), *folded.buffers()]]
+    np.testing.assert_allclose(
+        folded.predict_proba(x), model.predict_proba(x), atol=1e-5
+    )
+
+
+def test_model_slots_refold_on_swap():
+    model, x = make_model("CNN", EmgSensorType.BioArmband)
+    slots = ModelSlots(model, export=fold_model)
+    exported = list(slots.exported)
+
+    new_model = randomize(EmgCNN(len(TDPSD), model.emg_shape, 8)).eval()
+    new_model.scaler = model.scaler
+    slots.publish(new_model.state_dict())
+
+    assert slots.exported == exported
+    with slots.use() as active:
+        assert active is exported[1]
+        np.testing.assert_allclose(
+            active.predict_proba(x), new_model.predict_proba(x), atol=1e-5
+        )
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+import torch
+
+from nfc_emg.features import TDPSD, extract_batch
+from nfc_emg.models import EmgCNN, EmgMLP, EmgWindowModel
+from nfc_emg.sensors import EmgSensor, EmgSensorType
+from nfc_emg.torch_features import TorchFeatureExtractor
+
+SENSORS = [EmgSensorType.BioArmband, EmgSensorType.MyoArmband, EmgSensorType.Emager]
+GROUPS = [[f] for f in TorchFeatureExtractor.FEATURES] + [
+    TDPSD,
+    TorchFeatureExtractor.FEATURES,
+]
+
+
+def make_windows(sensor_type: EmgSensorType, scale: float, n_windows: int = 128):
+    sensor = EmgSensor(sensor_type, window_size_ms=200, window_inc_ms=50)
+    n_channels = np.prod(sensor.emg_shape)
+    rng = np.random.default_rng(0)
+    windows = scale * rng.standard_normal((n_windows, n_channels, sensor.window_size))
+    # Representable in float32, so that ZC and SSC counts are exact in both dtypes
+    return windows.astype(np.float32).astype(np.float64)
+
+
+@pytest.mark.parametrize("sensor_type", SENSORS)
+@pytest.mark.parametrize("scale", [1e3, 1.0, 1e-3])
+@pytest.mark.parametrize("dtype", [torch.float64, torch.float32])
+@pytest.mark.parametrize("features", GROUPS)
+def test_torch_features_match_numpy(sensor_type, scale, dtype, features):
+    windows = make_windows(sensor_type, scale)
+    ref = extract_batch(features, windows, backend="numpy")
+    feats = TorchFeatureExtractor(features)(torch.from_numpy(windows).to(dtype))
+    assert feats.dtype == dtype
+    np.testing.assert_allclose(feats.numpy(), ref, rtol=1e-4, atol=1e-4)
+
+
+@pytest.mark.parametrize("sensor_type", SENSORS)
+def test_torch_features_traced(sensor_type):
+    layer = TorchFeatureExtractor(TorchFeatureExtractor.FEATURES)
+    x = torch.from_numpy(make_windows(sensor_type, 1.0)).float()
+    traced = torch.jit.trace(layer, x[:4])
+    torch.testing.assert_close(traced(x), layer(x))
+
+
+def test_ssc_threshold():
+    windows = make_windows(EmgSensorType.MyoArmband, 1.0)
+    feature_dic = {"SSC_threshold": 0.5}
+    ref = extract_batch(["SSC"], windows, feature_dic)
+    feats = TorchFeatureExtractor(["SSC"], feature_dic)(torch.from_numpy(windows))
+    np.testing.assert_array_equal(feats.numpy(), ref)
+
+
+@pytest.mark.parametrize("sensor_type", SENSORS)
+@pytest.mark.parametrize("model_type", ["CNN", "MLP"])
+def test_window_model_matches_feature_model(sensor_type, model_type):
+    sensor = EmgSensor(sensor_type, window_size_ms=200, window_inc_ms=50)
+    windows = make_windows(sensor_type, 1.0)
+    if model_type == "CNN":
+        model = EmgCNN(len(TDPSD), sensor.emg_shape, 8).eval()
+    else:
+        model = EmgMLP(len(TDPSD) * int(np.prod(sensor.emg_shape)), 8).eval()
+
+    window_model = EmgWindowModel(model, TDPSD).eval()
+    window_model.fit_scaler(torch.from_numpy(windows).float())
+
+    ref = model.predict_proba(extract_batch(TDPSD, windows, backend="numpy"))
+    np.testing.assert_allclose(window_model.predict_proba(windows), ref, atol=1e-4)
+
+
+def test_unsupported_features():
+    assert not TorchFeatureExtractor.supports(["MAV", "HIST"])
+    with pytest.raises(ValueError):
+        TorchFeatureExtractor(["HIST"])